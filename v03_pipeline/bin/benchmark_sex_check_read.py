@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import time
+
+import hail as hl
+
+from v03_pipeline.lib.methods.qc_genotypes import select_qc_fields
+from v03_pipeline.lib.methods.sex_check import is_sex_check_site, x_contig_intervals
+
+
+def parts_bytes(path: str) -> int:
+    fs = hl.current_backend().fs
+    return sum(
+        f.size
+        for component in ['rows', 'entries']
+        for f in fs.ls(os.path.join(path, component, 'rows', 'parts'))
+    )
+
+
+def run(imported_callset_mt_path: str):
+    # Extracts the sex check sites of an imported callset as the QC genotypes
+    # step does, from the whole callset and from its chrX intervals.
+    #
+    # NB: partitions are of roughly equal size, so the bytes read are estimated
+    # from the fraction of partitions left after the interval filter.
+    total_bytes = parts_bytes(imported_callset_mt_path)
+    n_partitions = hl.read_matrix_table(imported_callset_mt_path).n_partitions()
+    reference_genome = hl.read_matrix_table(
+        imported_callset_mt_path,
+    ).locus.dtype.reference_genome
+    for name, intervals in [
+        ('whole genome', None),
+        ('chrX intervals', x_contig_intervals(reference_genome)),
+    ]:
+        mt = hl.read_matrix_table(imported_callset_mt_path, _intervals=intervals)
+        n_read_partitions = mt.n_partitions()
+        mt = select_qc_fields(mt)
+        start = time.perf_counter()
+        n_sites = mt.filter_rows(is_sex_check_site(mt)).count_rows()
+        elapsed = time.perf_counter() - start
+        print(
+            f'{name}: found {n_sites} sites reading {n_read_partitions} of '
+            f'{n_partitions} partitions, '
+            f'~{total_bytes * n_read_partitions / n_partitions / 1e9:.2f} of '
+            f'{total_bytes / 1e9:.2f} GB, in {elapsed:.1f}s',
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--imported-callset-mt-path',
+        required=True,
+    )
+    args, _ = parser.parse_known_args()
+    run(args.imported_callset_mt_path)
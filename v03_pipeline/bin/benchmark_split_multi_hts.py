@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import time
+import uuid
+
+import hail as hl
+
+from v03_pipeline.lib.misc.io import (
+    BIALLELIC,
+    import_callset,
+    select_relevant_fields,
+    split_multi_hts,
+)
+from v03_pipeline.lib.model import DatasetType, Env, ReferenceGenome
+
+
+def split_multi_hts_union_rows(mt: hl.MatrixTable) -> hl.MatrixTable:
+    # The previous implementation, splitting the biallelic and multiallelic
+    # rows separately and unioning them back together.
+    bi = mt.filter_rows(hl.len(mt.alleles) == BIALLELIC)
+    bi = bi.annotate_rows(a_index=1, was_split=False)
+    multi = mt.filter_rows(hl.len(mt.alleles) > BIALLELIC)
+    split = hl.split_multi_hts(multi)
+    return split.union_rows(bi)
+
+
+def run(callset_path: str, reference_genome: ReferenceGenome):
+    mt = import_callset(callset_path, reference_genome, DatasetType.SNV_INDEL)
+    mt = select_relevant_fields(mt, DatasetType.SNV_INDEL)
+    n_biallelic, n_rows = mt.aggregate_rows(
+        (hl.agg.count_where(hl.len(mt.alleles) == BIALLELIC), hl.agg.count()),
+    )
+    print(f'{n_biallelic} of {n_rows} rows are biallelic')
+    for split_fn in [split_multi_hts_union_rows, split_multi_hts]:
+        path = os.path.join(Env.HAIL_TMPDIR, f'{uuid.uuid4()}.mt')
+        start = time.perf_counter()
+        split_fn(mt).write(path)
+        elapsed = time.perf_counter() - start
+        split_mt = hl.read_matrix_table(path)
+        print(
+            f'{split_fn.__name__}: wrote {split_mt.count_rows()} rows in '
+            f'{split_mt.n_partitions()} partitions in {elapsed:.1f}s',
+        )
+        hl.current_backend().fs.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--callset-path',
+        required=True,
+    )
+    parser.add_argument(
+        '--reference-genome',
+        type=ReferenceGenome,
+        choices=list(ReferenceGenome),
+        default=ReferenceGenome.GRCh38,
+    )
+    args, _ = parser.parse_known_args()
+    run(args.callset_path, args.reference_genome)
@@ -6,13 +6,17 @@ import os
 
 import hail as hl
 
+from v03_pipeline.lib.misc.interval_bins import bin_intervals
 from v03_pipeline.lib.misc.io import write
 from v03_pipeline.lib.model import (
     DatasetType,
     ReferenceDatasetCollection,
     ReferenceGenome,
 )
-from v03_pipeline.lib.paths import valid_reference_dataset_collection_path
+from v03_pipeline.lib.paths import (
+    binned_interval_reference_dataset_collection_path,
+    valid_reference_dataset_collection_path,
+)
 from v03_pipeline.lib.reference_data.combine import join_hts, update_existing_joined_hts
 
 
@@ -45,6 +49,13 @@ def run(dataset_type: DatasetType, dataset: str | None):
     print(f'Uploading ht to {destination_path}')
     write(ht, destination_path)
 
+    binned_destination_path = binned_interval_reference_dataset_collection_path(
+        reference_genome,
+        dataset_type,
+    )
+    print(f'Uploading binned ht to {binned_destination_path}')
+    write(bin_intervals(hl.read_table(destination_path)), binned_destination_path)
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -3,6 +3,7 @@ from typing import Any
 import hail as hl
 
 from v03_pipeline.lib.annotations.enums import MITOTIP_PATHOGENICITIES
+from v03_pipeline.lib.misc.interval_bins import overlapping_intervals
 
 MITOTIP_PATHOGENICITIES_LOOKUP = hl.dict(
     hl.enumerate(MITOTIP_PATHOGENICITIES, index_first=False).extend(
@@ -14,7 +15,26 @@ MITOTIP_PATHOGENICITIES_LOOKUP = hl.dict(
 )
 
 
+def _n_ref_samples(
+    row: hl.StructExpression,
+    project_guid: str,
+) -> hl.Int32Expression:
+    # NB: the hom-ref samples may be stored as their complement, the no-calls,
+    # in which case they are counted against the project roster.
+    if 'no_call_samples' not in row or project_guid not in row.project_roster_sizes:
+        return row.ref_samples[project_guid].length()
+    return hl.or_else(
+        row.ref_samples[project_guid].length(),
+        row.project_roster_sizes[project_guid]
+        - row.heteroplasmic_samples[project_guid].length()
+        - row.homoplasmic_samples[project_guid].length()
+        - row.no_call_samples[project_guid].length(),
+    )
+
+
 def _AC_het(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
+    if 'sample_counts' in row:
+        return row.sample_counts.heteroplasmic_samples
     return sum(
         row.heteroplasmic_samples[project_guid].length()
         for project_guid in row.heteroplasmic_samples
@@ -22,6 +42,8 @@ def _AC_het(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
 
 
 def _AC_hom(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
+    if 'sample_counts' in row:
+        return row.sample_counts.homoplasmic_samples
     return sum(
         row.homoplasmic_samples[project_guid].length()
         for project_guid in row.homoplasmic_samples
@@ -29,9 +51,15 @@ def _AC_hom(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
 
 
 def _AN(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
+    if 'sample_counts' in row:
+        return (
+            row.sample_counts.ref_samples
+            + row.sample_counts.heteroplasmic_samples
+            + row.sample_counts.homoplasmic_samples
+        )
     return sum(
         (
-            row.ref_samples[project_guid].length()
+            _n_ref_samples(row, project_guid)
             + row.heteroplasmic_samples[project_guid].length()
             + row.homoplasmic_samples[project_guid].length()
         )
@@ -73,6 +101,8 @@ def high_constraint_region(
     interval_ht: hl.Table,
     **_: Any,
 ) -> hl.Expression:
+    if 'interval_bin' in ht.row:
+        return hl.len(overlapping_intervals(ht, interval_ht)) > 0
     return hl.is_defined(interval_ht[ht.locus])
 
 
@@ -90,8 +120,22 @@ def rsid(ht: hl.Table, **_: Any) -> hl.Expression:
     return ht.rsid.find(lambda x: hl.is_defined(x))
 
 
+def _project_roster_sizes(sample_lookup_ht: hl.Table) -> hl.StructExpression:
+    project_rosters = sample_lookup_ht.index_globals().project_rosters
+    return hl.Struct(
+        **{
+            project_guid: hl.len(project_rosters[project_guid])
+            for project_guid in project_rosters
+        },
+    )
+
+
 def gt_stats(ht: hl.Table, sample_lookup_ht: hl.Table, **_: Any) -> hl.Expression:
     row = sample_lookup_ht[ht.key]
+    if 'no_call_samples' in sample_lookup_ht.row:
+        row = row.annotate(
+            project_roster_sizes=_project_roster_sizes(sample_lookup_ht),
+        )
     return hl.Struct(
         AC_het=_AC_het(row),
         AF_het=hl.float32(_AC_het(row) / _AN(row)),
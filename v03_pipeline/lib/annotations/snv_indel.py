@@ -2,15 +2,40 @@ from typing import Any
 
 import hail as hl
 
+from v03_pipeline.lib.misc.interval_bins import overlapping_intervals
+
 N_ALT_REF = 0
 N_ALT_HET = 1
 N_ALT_HOM = 2
 
 
+def _n_ref_samples(
+    row: hl.StructExpression,
+    project_guid: str,
+) -> hl.Int32Expression:
+    # NB: the hom-ref samples may be stored as their complement, the no-calls,
+    # in which case they are counted against the project roster.
+    if 'no_call_samples' not in row or project_guid not in row.project_roster_sizes:
+        return row.ref_samples[project_guid].length()
+    return hl.or_else(
+        row.ref_samples[project_guid].length(),
+        row.project_roster_sizes[project_guid]
+        - row.het_samples[project_guid].length()
+        - row.hom_samples[project_guid].length()
+        - row.no_call_samples[project_guid].length(),
+    )
+
+
 def _AC(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
+    if 'sample_counts' in row:
+        return (
+            row.sample_counts.ref_samples * N_ALT_REF
+            + row.sample_counts.het_samples * N_ALT_HET
+            + row.sample_counts.hom_samples * N_ALT_HOM
+        )
     return sum(
         (
-            row.ref_samples[project_guid].length() * N_ALT_REF
+            _n_ref_samples(row, project_guid) * N_ALT_REF
             + row.het_samples[project_guid].length() * N_ALT_HET
             + row.hom_samples[project_guid].length() * N_ALT_HOM
         )
@@ -23,9 +48,15 @@ def _AF(row: hl.StructExpression) -> hl.Float32Expression:  # noqa: N802
 
 
 def _AN(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
+    if 'sample_counts' in row:
+        return 2 * (
+            row.sample_counts.ref_samples
+            + row.sample_counts.het_samples
+            + row.sample_counts.hom_samples
+        )
     return 2 * sum(
         (
-            row.ref_samples[project_guid].length()
+            _n_ref_samples(row, project_guid)
             + row.het_samples[project_guid].length()
             + row.hom_samples[project_guid].length()
         )
@@ -34,6 +65,8 @@ def _AN(row: hl.StructExpression) -> hl.Int32Expression:  # noqa: N802
 
 
 def _hom(row: hl.StructExpression) -> hl.Int32Expression:
+    if 'sample_counts' in row:
+        return row.sample_counts.hom_samples
     return sum(
         row.hom_samples[project_guid].length() for project_guid in row.hom_samples
     )
@@ -60,12 +93,26 @@ def DP(mt: hl.MatrixTable, **_: Any) -> hl.Expression:  # noqa: N802
     )
 
 
+def _project_roster_sizes(sample_lookup_ht: hl.Table) -> hl.StructExpression:
+    project_rosters = sample_lookup_ht.index_globals().project_rosters
+    return hl.Struct(
+        **{
+            project_guid: hl.len(project_rosters[project_guid])
+            for project_guid in project_rosters
+        },
+    )
+
+
 def gt_stats(
     ht: hl.Table,
     sample_lookup_ht: hl.Table,
     **_: Any,
 ) -> hl.Expression:
     row = sample_lookup_ht[ht.key]
+    if 'no_call_samples' in sample_lookup_ht.row:
+        row = row.annotate(
+            project_roster_sizes=_project_roster_sizes(sample_lookup_ht),
+        )
     return hl.Struct(
         AC=_AC(row),
         AN=_AN(row),
@@ -81,7 +128,7 @@ def gnomad_non_coding_constraint(
 ) -> hl.Expression:
     return hl.Struct(
         z_score=(
-            interval_ht.index(ht.locus, all_matches=True)
+            overlapping_intervals(ht, interval_ht)
             .filter(
                 lambda x: hl.is_defined(x.gnomad_non_coding_constraint['z_score']),
             )
@@ -97,10 +144,7 @@ def screen(
 ) -> hl.Expression:
     return hl.Struct(
         region_type_ids=(
-            interval_ht.index(
-                ht.locus,
-                all_matches=True,
-            ).flatmap(
+            overlapping_intervals(ht, interval_ht).flatmap(
                 lambda x: x.screen['region_type_ids'],
             )
         ),
@@ -3,6 +3,8 @@ import unittest
 import hail as hl
 
 from v03_pipeline.lib.annotations.snv_indel import gt_stats
+from v03_pipeline.lib.misc.sample_lookup import annotate_sample_counts
+from v03_pipeline.lib.model import DatasetType
 
 
 class SNVTest(unittest.TestCase):
@@ -56,14 +58,17 @@ class SNVTest(unittest.TestCase):
             ),
             key='id',
         )
-        ht = ht.select(gt_stats=gt_stats(ht, sample_lookup_ht))
-        self.assertCountEqual(
-            ht.collect(),
-            [
-                hl.Struct(id=0, gt_stats=hl.Struct(AC=6, AF=0.5, AN=12, hom=2)),
-                hl.Struct(
-                    id=1,
-                    gt_stats=hl.Struct(AC=0, AN=12, AF=0.0, hom=0),
-                ),
-            ],
-        )
+        for lookup_ht in [
+            sample_lookup_ht,
+            annotate_sample_counts(DatasetType.SNV_INDEL, sample_lookup_ht),
+        ]:
+            self.assertCountEqual(
+                ht.select(gt_stats=gt_stats(ht, lookup_ht)).collect(),
+                [
+                    hl.Struct(id=0, gt_stats=hl.Struct(AC=6, AF=0.5, AN=12, hom=2)),
+                    hl.Struct(
+                        id=1,
+                        gt_stats=hl.Struct(AC=0, AN=12, AF=0.0, hom=0),
+                    ),
+                ],
+            )
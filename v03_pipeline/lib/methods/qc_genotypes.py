@@ -0,0 +1,41 @@
+import hail as hl
+
+from v03_pipeline.lib.methods.relatedness import filter_and_ld_prune
+from v03_pipeline.lib.methods.sex_check import filter_to_x_contigs, is_sex_check_site
+
+
+def select_qc_fields(mt: hl.MatrixTable) -> hl.MatrixTable:
+    mt = mt.select_rows(
+        filters=mt.filters,
+        info=hl.struct(AF=mt.info.AF),
+    )
+    return mt.select_entries('GT')
+
+
+def extract_qc_genotypes(
+    mt: hl.MatrixTable,
+    gnomad_qc_ht: hl.Table | None,
+    x_contigs_mt: hl.MatrixTable | None = None,
+) -> hl.MatrixTable:
+    # The genotypes of the sites used by the sex and relatedness checks,
+    # extracted once so that neither check scans the full callset.
+    #
+    # The sex check sites are all on chrX, so they are extracted from
+    # x_contigs_mt, the callset read with only its chrX intervals, if given.
+    mt = select_qc_fields(mt)
+    relatedness_sites_ht = filter_and_ld_prune(mt, gnomad_qc_ht).rows().select()
+    relatedness_mt = mt.semi_join_rows(relatedness_sites_ht)
+    relatedness_mt = relatedness_mt.annotate_rows(
+        sex_check_site=is_sex_check_site(relatedness_mt),
+        relatedness_site=True,
+    )
+    sex_check_mt = select_qc_fields(
+        filter_to_x_contigs(mt if x_contigs_mt is None else x_contigs_mt),
+    )
+    sex_check_mt = sex_check_mt.filter_rows(is_sex_check_site(sex_check_mt))
+    sex_check_mt = sex_check_mt.anti_join_rows(relatedness_sites_ht)
+    sex_check_mt = sex_check_mt.annotate_rows(
+        sex_check_site=True,
+        relatedness_site=False,
+    )
+    return relatedness_mt.union_rows(sex_check_mt)
@@ -0,0 +1,48 @@
+import unittest
+
+import hail as hl
+
+from v03_pipeline.lib.methods.qc_genotypes import extract_qc_genotypes
+from v03_pipeline.lib.methods.relatedness import (
+    call_relatedness,
+    call_relatedness_on_qc_sites,
+)
+from v03_pipeline.lib.methods.sex_check import call_sex, x_contig_intervals
+
+TEST_SEX_AND_RELATEDNESS_CALLSET_MT = (
+    'v03_pipeline/var/test/callsets/sex_and_relatedness_1.mt'
+)
+
+
+class QCGenotypesTest(unittest.TestCase):
+    def test_extract_qc_genotypes(self):
+        mt = hl.read_matrix_table(TEST_SEX_AND_RELATEDNESS_CALLSET_MT)
+        qc_mt = extract_qc_genotypes(mt, None)
+        self.assertListEqual(list(qc_mt.entry), ['GT'])
+        self.assertLess(qc_mt.count_rows(), mt.count_rows())
+        self.assertCountEqual(
+            call_sex(qc_mt.filter_rows(qc_mt.sex_check_site)).collect(),
+            call_sex(mt).collect(),
+        )
+        self.assertCountEqual(
+            call_relatedness_on_qc_sites(
+                qc_mt.filter_rows(qc_mt.relatedness_site),
+            ).collect(),
+            call_relatedness(mt, None).collect(),
+        )
+
+    def test_extract_qc_genotypes_x_contigs(self):
+        mt = hl.read_matrix_table(TEST_SEX_AND_RELATEDNESS_CALLSET_MT)
+        x_contigs_mt = hl.read_matrix_table(
+            TEST_SEX_AND_RELATEDNESS_CALLSET_MT,
+            _intervals=x_contig_intervals(mt.locus.dtype.reference_genome),
+        )
+        qc_mt = extract_qc_genotypes(mt, None, x_contigs_mt)
+        self.assertEqual(
+            qc_mt.count_rows(),
+            extract_qc_genotypes(mt, None).count_rows(),
+        )
+        self.assertCountEqual(
+            call_sex(qc_mt.filter_rows(qc_mt.sex_check_site)).collect(),
+            call_sex(mt).collect(),
+        )
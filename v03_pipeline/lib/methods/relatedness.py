@@ -1,6 +1,14 @@
+import os
+import uuid
+
 import hail as hl
 from gnomad.sample_qc.pipeline import filter_rows_for_qc
 
+from v03_pipeline.lib.misc.pedigree import Family
+from v03_pipeline.lib.model import Env
+
+MAX_SAMPLES_PER_IBD_BATCH = 1000
+
 
 def filter_and_ld_prune(
     mt: hl.MatrixTable,
@@ -20,11 +28,48 @@ def filter_and_ld_prune(
     )
 
 
-def call_relatedness(
-    mt: hl.MatrixTable,  # NB: we've been remapped and subsetted upstream
-    gnomad_qc_ht: hl.Table | None,
-) -> hl.Table:
-    mt = filter_and_ld_prune(mt, gnomad_qc_ht)
+def family_relatedness_pairs(families: set[Family]) -> set[tuple[str, str]]:
+    # The pairs of samples that the relatedness check compares, those related
+    # by direct lineage or by the collateral lineage parsed from the pedigree.
+    pairs = set()
+    for family in families:
+        for sample in family.samples.values():
+            for other_id in [
+                sample.mother,
+                sample.father,
+                sample.maternal_grandmother,
+                sample.maternal_grandfather,
+                sample.paternal_grandmother,
+                sample.paternal_grandfather,
+                *sample.siblings,
+                *sample.half_siblings,
+                *sample.aunt_nephews,
+            ]:
+                if other_id:
+                    pairs.add(
+                        (
+                            min(sample.sample_id, other_id),
+                            max(sample.sample_id, other_id),
+                        ),
+                    )
+    return pairs
+
+
+def family_batches(families: set[Family]) -> list[set[str]]:
+    # Packs whole families into batches of samples, each batch is one
+    # identity_by_descent over all of its pairs.
+    batches = [set()]
+    for family in sorted(families, key=lambda family: family.family_guid):
+        if (
+            batches[-1]
+            and len(batches[-1]) + len(family.samples) > MAX_SAMPLES_PER_IBD_BATCH
+        ):
+            batches.append(set())
+        batches[-1] |= family.samples.keys()
+    return batches
+
+
+def identity_by_descent(mt: hl.MatrixTable) -> hl.Table:
     # NB: ibd did not work by default with my pip install of `hail` on an M1 MacOSX.
     # I had to build hail by source with the following:
     # - brew install lz4
@@ -38,3 +83,45 @@ def call_relatedness(
         ibd2=kin_ht.ibd.Z2,
         pi_hat=kin_ht.ibd.PI_HAT,
     )
+
+
+def call_relatedness(
+    mt: hl.MatrixTable,  # NB: we've been remapped and subsetted upstream
+    gnomad_qc_ht: hl.Table | None,
+    families: set[Family] | None = None,
+) -> hl.Table:
+    mt = filter_and_ld_prune(mt, gnomad_qc_ht)
+    if families is not None:
+        mt = mt.checkpoint(os.path.join(Env.HAIL_TMPDIR, f'{uuid.uuid4()}.mt'))
+    return call_relatedness_on_qc_sites(mt, families)
+
+
+def call_relatedness_on_qc_sites(
+    mt: hl.MatrixTable,  # NB: already filtered and ld pruned
+    families: set[Family] | None = None,
+) -> hl.Table:
+    if families is None:
+        return identity_by_descent(mt)
+
+    # Only the pairs within the families are compared, rather than every pair
+    # of samples in the callset.  The allele frequencies are those of the
+    # whole callset, so the estimate for a pair does not depend on the other
+    # samples it is computed alongside.
+    pairs = hl.literal(family_relatedness_pairs(families))
+    kin_hts = []
+    for batch in family_batches(families):
+        kin_ht = identity_by_descent(
+            mt.filter_cols(hl.literal(batch).contains(mt.s)),
+        )
+        kin_hts.append(
+            kin_ht.filter(
+                pairs.contains(
+                    hl.if_else(
+                        kin_ht.i < kin_ht.j,
+                        (kin_ht.i, kin_ht.j),
+                        (kin_ht.j, kin_ht.i),
+                    ),
+                ),
+            ),
+        )
+    return kin_hts[0].union(*kin_hts[1:])
@@ -2,7 +2,11 @@ import unittest
 
 import hail as hl
 
-from v03_pipeline.lib.methods.relatedness import call_relatedness
+from v03_pipeline.lib.methods.relatedness import (
+    call_relatedness,
+    family_relatedness_pairs,
+)
+from v03_pipeline.lib.misc.pedigree import Family
 
 TEST_SEX_AND_RELATEDNESS_CALLSET_MT = (
     'v03_pipeline/var/test/callsets/sex_and_relatedness_1.mt'
@@ -37,3 +41,55 @@ class RelatednessTest(unittest.TestCase):
                 ),
             ],
         )
+
+    def test_call_relatedness_within_families(self):
+        mt = hl.read_matrix_table(TEST_SEX_AND_RELATEDNESS_CALLSET_MT)
+        families = {
+            Family.parse(
+                'family_1',
+                [
+                    hl.Struct(
+                        s='ROS_006_18Y03226_D1',
+                        sex='F',
+                        maternal_s=None,
+                        paternal_s=None,
+                    ),
+                ],
+            ),
+            Family.parse(
+                'family_2',
+                [
+                    hl.Struct(
+                        s='ROS_007_19Y05939_D1',
+                        sex='F',
+                        maternal_s=None,
+                        paternal_s=None,
+                    ),
+                    hl.Struct(
+                        s='ROS_007_19Y05987_D1',
+                        sex='M',
+                        maternal_s='ROS_007_19Y05939_D1',
+                        paternal_s=None,
+                    ),
+                ],
+            ),
+        }
+        self.assertSetEqual(
+            family_relatedness_pairs(families),
+            {('ROS_007_19Y05939_D1', 'ROS_007_19Y05987_D1')},
+        )
+        # The related pair across the two families is not compared.
+        ht = call_relatedness(mt, None, families)
+        self.assertCountEqual(
+            ht.collect(),
+            [
+                hl.Struct(
+                    i='ROS_007_19Y05939_D1',
+                    j='ROS_007_19Y05987_D1',
+                    ibd0=0.0,
+                    ibd1=1.0,
+                    ibd2=0.0,
+                    pi_hat=0.5,
+                ),
+            ],
+        )
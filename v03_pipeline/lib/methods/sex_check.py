@@ -21,16 +21,53 @@ XY_FSTAT_THRESHOLD: float = (
 )
 
 
-def call_sex(mt: hl.MatrixTable) -> hl.Table:
-    # Filter to SNVs and biallelics
-    # NB: We should already have filtered biallelics, but just in case.
-    mt = mt.filter_rows(hl.is_snp(mt.alleles[0], mt.alleles[1]))
-
-    # Filter to PASS variants only (variants with empty or missing filter set)
-    mt = mt.filter_rows(
-        hl.is_missing(mt.filters) | (mt.filters.length() == 0),
-        keep=True,
+def is_sex_check_site(mt: hl.MatrixTable) -> hl.BooleanExpression:
+    return (
+        # `hl.impute_sex` only uses the non-PAR regions of chrX.
+        mt.locus.in_x_nonpar()
+        # Filter to SNVs and biallelics
+        # NB: We should already have filtered biallelics, but just in case.
+        & hl.is_snp(mt.alleles[0], mt.alleles[1])
+        # Filter to PASS variants only (variants with empty or missing filter set)
+        & (hl.is_missing(mt.filters) | (mt.filters.length() == 0))
     )
+
+
+def x_contig_intervals(reference_genome: hl.ReferenceGenome) -> list[hl.Interval]:
+    # The chrX intervals over the locus prefix of a callset's row key, to read
+    # only the partitions of the callset that overlap chrX.
+    point_type = hl.tstruct(locus=hl.tlocus(reference_genome))
+    return [
+        hl.Interval(
+            hl.Struct(locus=hl.Locus(contig, 1, reference_genome)),
+            hl.Struct(
+                locus=hl.Locus(
+                    contig,
+                    reference_genome.lengths[contig],
+                    reference_genome,
+                ),
+            ),
+            includes_end=True,
+            point_type=point_type,
+        )
+        for contig in reference_genome.x_contigs
+    ]
+
+
+def filter_to_x_contigs(mt: hl.MatrixTable) -> hl.MatrixTable:
+    reference_genome = mt.locus.dtype.reference_genome
+    return hl.filter_intervals(
+        mt,
+        [
+            hl.parse_locus_interval(contig, reference_genome=reference_genome)
+            for contig in reference_genome.x_contigs
+        ],
+    )
+
+
+def call_sex(mt: hl.MatrixTable) -> hl.Table:
+    mt = filter_to_x_contigs(mt)
+    mt = mt.filter_rows(is_sex_check_site(mt))
     impute_sex_ht = hl.impute_sex(
         mt.GT,
         male_threshold=XY_FSTAT_THRESHOLD,
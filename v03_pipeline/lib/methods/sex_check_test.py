@@ -3,7 +3,7 @@ from unittest.mock import patch
 
 import hail as hl
 
-from v03_pipeline.lib.methods.sex_check import call_sex
+from v03_pipeline.lib.methods.sex_check import call_sex, filter_to_x_contigs
 
 TEST_SEX_AND_RELATEDNESS_CALLSET_MT = (
     'v03_pipeline/var/test/callsets/sex_and_relatedness_1.mt'
@@ -77,3 +77,10 @@ class SexCheckTest(unittest.TestCase):
                 call_sex,
                 mt,
             )
+
+    def test_filter_to_x_contigs(self):
+        mt = hl.read_matrix_table(TEST_SEX_AND_RELATEDNESS_CALLSET_MT)
+        self.assertSetEqual(
+            set(filter_to_x_contigs(mt).locus.contig.collect()),
+            {'chrX'},
+        )
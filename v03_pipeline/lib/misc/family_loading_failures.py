@@ -4,104 +4,61 @@ import numpy as np
 from v03_pipeline.lib.misc.pedigree import Family, Relation, Sample
 from v03_pipeline.lib.model import Ploidy
 
-
-def passes_relatedness_check(
-    relatedness_check_lookup: dict[tuple[str, str], list],
-    sample_id: str,
-    other_id: str,
-    relation: Relation,
-) -> bool:
-    # No relationship to check, return true
-    if other_id is None:
-        return True
-    coefficients = relatedness_check_lookup.get(
-        (min(sample_id, other_id), max(sample_id, other_id)),
-    )
-    if not coefficients:
-        return False
-    return np.allclose(
-        coefficients,
-        relation.coefficients,
-        0.1,
-    )
-
-
-def passes_all_relatedness_checks(  # noqa: C901
-    relatedness_check_lookup: dict[tuple[str, str], list],
-    sample: Sample,
-) -> bool:
-    for parent_id in [sample.mother, sample.father]:
-        if not passes_relatedness_check(
-            relatedness_check_lookup,
-            sample.sample_id,
-            parent_id,
-            Relation.PARENT,
-        ):
-            return False
-
-    for grandparent_id in [
-        sample.maternal_grandmother,
-        sample.maternal_grandfather,
-        sample.paternal_grandmother,
-        sample.paternal_grandfather,
-    ]:
-        if not passes_relatedness_check(
-            relatedness_check_lookup,
-            sample.sample_id,
-            grandparent_id,
-            Relation.GRANDPARENT,
-        ):
-            return False
-
-    for sibling_id in sample.siblings:
-        if not passes_relatedness_check(
-            relatedness_check_lookup,
-            sample.sample_id,
-            sibling_id,
-            Relation.SIBLING,
-        ):
-            return False
-
-    for half_sibling_id in sample.half_siblings:
+RELATEDNESS_CHECK_RTOL = 0.1
+RELATEDNESS_CHECK_ATOL = 1e-08  # The `np.allclose` default
+
+
+def expected_relations(sample: Sample) -> list[tuple[str, list[Relation]]]:
+    # The relatives of the sample, each with the relations of which
+    # any one passes the check.
+    return [
+        *(
+            (parent_id, [Relation.PARENT])
+            for parent_id in [sample.mother, sample.father]
+        ),
+        *(
+            (grandparent_id, [Relation.GRANDPARENT])
+            for grandparent_id in [
+                sample.maternal_grandmother,
+                sample.maternal_grandfather,
+                sample.paternal_grandmother,
+                sample.paternal_grandfather,
+            ]
+        ),
+        *((sibling_id, [Relation.SIBLING]) for sibling_id in sample.siblings),
         # NB: A "half sibling" parsed from the pedigree may actually be a sibling, so we allow those
         # through as well.
-        if not passes_relatedness_check(
-            relatedness_check_lookup,
-            sample.sample_id,
-            half_sibling_id,
-            Relation.HALF_SIBLING,
-        ) and not passes_relatedness_check(
-            relatedness_check_lookup,
-            sample.sample_id,
-            half_sibling_id,
-            Relation.SIBLING,
-        ):
-            return False
-
-    for aunt_nephew_id in sample.aunt_nephews:
-        if not passes_relatedness_check(
-            relatedness_check_lookup,
-            sample.sample_id,
-            aunt_nephew_id,
-            Relation.AUNT_NEPHEW,
-        ):
-            return False
-    return True
-
-
-def build_relatedness_check_lookup(
+        *(
+            (half_sibling_id, [Relation.HALF_SIBLING, Relation.SIBLING])
+            for half_sibling_id in sample.half_siblings
+        ),
+        *(
+            (aunt_nephew_id, [Relation.AUNT_NEPHEW])
+            for aunt_nephew_id in sample.aunt_nephews
+        ),
+    ]
+
+
+def build_relatedness_check_arrays(
     relatedness_check_ht: hl.Table,
     remap_lookup: hl.dict,
-) -> dict[tuple[str, str], list]:
-    # Build relatedness check lookup
+) -> tuple[dict[tuple[str, str], int], np.ndarray]:
+    # The row of each pair, and the coefficients of all pairs as one array
+    # with a trailing row of NaNs standing in for the missing pairs.
     relatedness_check_ht = relatedness_check_ht.key_by(
         i=remap_lookup.get(relatedness_check_ht.i, relatedness_check_ht.i),
         j=remap_lookup.get(relatedness_check_ht.j, relatedness_check_ht.j),
     )
-    return {
-        (r.i, r.j): list(r.drop('i', 'j').values())
-        for r in relatedness_check_ht.collect()
-    }
+    rows = relatedness_check_ht.collect()
+    pair_idxs = {(r.i, r.j): idx for idx, r in enumerate(rows)}
+    n_coefficients = len(Relation.PARENT.coefficients)
+    coefficients = np.array(
+        [list(r.drop('i', 'j').values()) for r in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), n_coefficients)
+    return pair_idxs, np.vstack(
+        [coefficients, np.full((1, n_coefficients), np.nan)],
+    )
 
 
 def build_sex_check_lookup(
@@ -119,8 +76,11 @@ def build_sex_check_lookup(
 def get_families_failed_missing_samples(
     mt: hl.MatrixTable,
     families: set[Family],
+    callset_sample_ids: list[str] | None = None,
 ) -> set[Family]:
-    callset_samples = set(mt.cols().s.collect())
+    if callset_sample_ids is None:
+        callset_sample_ids = mt.s.collect()
+    callset_samples = set(callset_sample_ids)
     failed_families = set()
     for family in families:
         if len(family.samples.keys() - callset_samples) > 0:
@@ -133,17 +93,45 @@ def get_families_failed_relatedness_check(
     relatedness_check_ht: hl.Table,
     remap_lookup: hl.dict,
 ) -> set[Family]:
-    relatedness_check_lookup = build_relatedness_check_lookup(
+    pair_idxs, coefficients = build_relatedness_check_arrays(
         relatedness_check_ht,
         remap_lookup,
     )
-    failed_families = set()
-    for family in families:
+    # Assemble every expected (pair, relation) row, each belonging to a check
+    # of one relative, passing if any of its relations pass.
+    families = list(families)
+    check_family_idxs, row_check_idxs, row_pair_idxs, row_expected = [], [], [], []
+    for family_idx, family in enumerate(families):
         for sample in family.samples.values():
-            if not passes_all_relatedness_checks(relatedness_check_lookup, sample):
-                failed_families.add(family)
-                break
-    return failed_families
+            for other_id, relations in expected_relations(sample):
+                # No relationship to check
+                if other_id is None:
+                    continue
+                pair_idx = pair_idxs.get(
+                    (min(sample.sample_id, other_id), max(sample.sample_id, other_id)),
+                    -1,
+                )
+                for relation in relations:
+                    row_check_idxs.append(len(check_family_idxs))
+                    row_pair_idxs.append(pair_idx)
+                    row_expected.append(relation.coefficients)
+                check_family_idxs.append(family_idx)
+    observed = coefficients[np.array(row_pair_idxs, dtype=np.int64)]
+    expected = np.array(row_expected, dtype=np.float64).reshape(observed.shape)
+    # NB: equivalent to `np.allclose` per row, the NaNs of missing pairs fail.
+    row_passes = np.all(
+        np.abs(observed - expected)
+        <= RELATEDNESS_CHECK_ATOL + RELATEDNESS_CHECK_RTOL * np.abs(expected),
+        axis=1,
+    )
+    check_passes = np.zeros(len(check_family_idxs), dtype=bool)
+    np.logical_or.at(check_passes, np.array(row_check_idxs, dtype=np.int64), row_passes)
+    return {
+        families[family_idx]
+        for family_idx in np.unique(
+            np.array(check_family_idxs, dtype=np.int64)[~check_passes],
+        )
+    }
 
 
 def get_families_failed_sex_check(
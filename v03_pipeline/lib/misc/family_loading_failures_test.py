@@ -1,18 +1,19 @@
 import unittest
 
 import hail as hl
+import numpy as np
 
 from v03_pipeline.lib.misc.family_loading_failures import (
-    build_relatedness_check_lookup,
+    build_relatedness_check_arrays,
     build_sex_check_lookup,
-    passes_all_relatedness_checks,
+    get_families_failed_relatedness_check,
 )
-from v03_pipeline.lib.misc.pedigree import Sample
+from v03_pipeline.lib.misc.pedigree import Family, Sample
 from v03_pipeline.lib.model import Ploidy
 
 
 class FamilyLoadingFailuresTest(unittest.TestCase):
-    def test_build_relatedness_check_lookup(self):
+    def test_build_relatedness_check_arrays(self):
         ht = hl.Table.parallelize(
             [
                 {
@@ -34,19 +35,17 @@ class FamilyLoadingFailuresTest(unittest.TestCase):
             ),
             key=['i', 'j'],
         )
-        self.assertEqual(
-            build_relatedness_check_lookup(
-                ht,
-                hl.dict({'ROS_006_18Y03226_D1': 'remapped_id'}),
-            ),
-            {
-                ('remapped_id', 'ROS_007_19Y05939_D1'): [
-                    0.0,
-                    1.0,
-                    0.0,
-                    0.5,
-                ],
-            },
+        pair_idxs, coefficients = build_relatedness_check_arrays(
+            ht,
+            hl.dict({'ROS_006_18Y03226_D1': 'remapped_id'}),
+        )
+        self.assertDictEqual(
+            pair_idxs,
+            {('remapped_id', 'ROS_007_19Y05939_D1'): 0},
+        )
+        np.testing.assert_array_equal(
+            coefficients,
+            [[0.0, 1.0, 0.0, 0.5], [np.nan, np.nan, np.nan, np.nan]],
         )
 
     def test_build_sex_check_lookup(self):
@@ -77,55 +76,195 @@ class FamilyLoadingFailuresTest(unittest.TestCase):
             },
         )
 
-    def test_passes_all_relatedness_checks(self):
-        relatedness_check_lookup = {
-            # Parent
-            ('sample_1', 'sample_2'): [
-                0.0,
-                0.98,
-                0.0,
-                0.52,
+    def test_get_families_failed_relatedness_check_relations(self):
+        ht = hl.Table.parallelize(
+            [
+                # Parent
+                {
+                    'i': 'sample_1',
+                    'j': 'sample_2',
+                    'ibd0': 0.0,
+                    'ibd1': 0.98,
+                    'ibd2': 0.0,
+                    'pi_hat': 0.52,
+                },
+                # GrandParent
+                {
+                    'i': 'sample_1',
+                    'j': 'sample_3',
+                    'ibd0': 0.48,
+                    'ibd1': 0.52,
+                    'ibd2': 0.0,
+                    'pi_hat': 0.24,
+                },
+                # Half Sibling (but actually a hidden Sibling)
+                {
+                    'i': 'sample_1',
+                    'j': 'sample_4',
+                    'ibd0': 0.25,
+                    'ibd1': 0.5,
+                    'ibd2': 0.25,
+                    'pi_hat': 0.5,
+                },
+                # Sibling is actually a half sibling.
+                {
+                    'i': 'sample_6',
+                    'j': 'sample_7',
+                    'ibd0': 0.5,
+                    'ibd1': 0.5,
+                    'ibd2': 0.0,
+                    'pi_hat': 0.25,
+                },
             ],
-            # GrandParent
-            ('sample_1', 'sample_3'): [0.48, 0.52, 0, 0.24],
-            # Half Sibling (but actually a hidden Sibling)
-            ('sample_1', 'sample_4'): [0.25, 0.5, 0.25, 0.5],
-        }
-        sample = Sample(
-            sex=Ploidy.FEMALE,
-            sample_id='sample_1',
-            mother='sample_2',
-            paternal_grandfather='sample_3',
-            half_siblings=['sample_4'],
+            hl.tstruct(
+                i=hl.tstr,
+                j=hl.tstr,
+                ibd0=hl.tfloat,
+                ibd1=hl.tfloat,
+                ibd2=hl.tfloat,
+                pi_hat=hl.tfloat,
+            ),
+            key=['i', 'j'],
         )
-        self.assertTrue(
-            passes_all_relatedness_checks(relatedness_check_lookup, sample),
+        families = {
+            Family(
+                family_guid='family_1',
+                samples={
+                    'sample_1': Sample(
+                        sex=Ploidy.FEMALE,
+                        sample_id='sample_1',
+                        mother='sample_2',
+                        paternal_grandfather='sample_3',
+                        half_siblings=['sample_4'],
+                    ),
+                },
+            ),
+            # Defined grandparent missing in relatedness table
+            Family(
+                family_guid='family_2',
+                samples={
+                    'sample_1': Sample(
+                        sex=Ploidy.FEMALE,
+                        sample_id='sample_1',
+                        mother='sample_2',
+                        paternal_grandfather='sample_3',
+                        paternal_grandmother='sample_5',
+                    ),
+                },
+            ),
+            Family(
+                family_guid='family_3',
+                samples={
+                    'sample_6': Sample(
+                        sex=Ploidy.FEMALE,
+                        sample_id='sample_6',
+                        siblings=['sample_7'],
+                    ),
+                },
+            ),
+        }
+        self.assertSetEqual(
+            {
+                family.family_guid
+                for family in get_families_failed_relatedness_check(
+                    families,
+                    ht,
+                    hl.empty_dict(hl.tstr, hl.tstr),
+                )
+            },
+            {'family_2', 'family_3'},
         )
 
-        # Defined grandparent missing in relatedness table
-        sample = Sample(
-            sex=Ploidy.FEMALE,
-            sample_id='sample_1',
-            mother='sample_2',
-            paternal_grandfather='sample_3',
-            paternal_grandmother='sample_5',
-        )
-        self.assertFalse(
-            passes_all_relatedness_checks(relatedness_check_lookup, sample),
+    def test_get_families_failed_relatedness_check(self):
+        ht = hl.Table.parallelize(
+            [
+                # Parent
+                {
+                    'i': 'sample_1',
+                    'j': 'sample_2',
+                    'ibd0': 0.0,
+                    'ibd1': 0.98,
+                    'ibd2': 0.0,
+                    'pi_hat': 0.52,
+                },
+                # Half Sibling (but actually a hidden Sibling)
+                {
+                    'i': 'sample_1',
+                    'j': 'sample_4',
+                    'ibd0': 0.25,
+                    'ibd1': 0.5,
+                    'ibd2': 0.25,
+                    'pi_hat': 0.5,
+                },
+                # Sibling is actually a half sibling.
+                {
+                    'i': 'sample_5',
+                    'j': 'sample_6',
+                    'ibd0': 0.5,
+                    'ibd1': 0.5,
+                    'ibd2': 0,
+                    'pi_hat': 0.25,
+                },
+            ],
+            hl.tstruct(
+                i=hl.tstr,
+                j=hl.tstr,
+                ibd0=hl.tfloat,
+                ibd1=hl.tfloat,
+                ibd2=hl.tfloat,
+                pi_hat=hl.tfloat,
+            ),
+            key=['i', 'j'],
         )
-
-        # Sibling is actually a half sibling.
-        relatedness_check_lookup = {
-            **relatedness_check_lookup,
-            ('sample_1', 'sample_4'): [0.5, 0.5, 0, 0.25],
+        families = {
+            Family(
+                family_guid='family_1',
+                samples={
+                    'sample_1': Sample(
+                        sex=Ploidy.FEMALE,
+                        sample_id='sample_1',
+                        mother='sample_2',
+                        half_siblings=['sample_4'],
+                    ),
+                },
+            ),
+            # Defined grandparent missing in relatedness table
+            Family(
+                family_guid='family_2',
+                samples={
+                    'sample_3': Sample(
+                        sex=Ploidy.FEMALE,
+                        sample_id='sample_3',
+                        maternal_grandmother='sample_7',
+                    ),
+                },
+            ),
+            Family(
+                family_guid='family_3',
+                samples={
+                    'sample_5': Sample(
+                        sex=Ploidy.FEMALE,
+                        sample_id='sample_5',
+                        siblings=['sample_6'],
+                    ),
+                },
+            ),
+            # No relatives to check
+            Family(
+                family_guid='family_4',
+                samples={
+                    'sample_8': Sample(sex=Ploidy.MALE, sample_id='sample_8'),
+                },
+            ),
         }
-        sample = Sample(
-            sex=Ploidy.FEMALE,
-            sample_id='sample_1',
-            mother='sample_2',
-            paternal_grandfather='sample_3',
-            siblings=['sample_4'],
-        )
-        self.assertFalse(
-            passes_all_relatedness_checks(relatedness_check_lookup, sample),
+        self.assertSetEqual(
+            {
+                family.family_guid
+                for family in get_families_failed_relatedness_check(
+                    families,
+                    ht,
+                    hl.empty_dict(hl.tstr, hl.tstr),
+                )
+            },
+            {'family_2', 'family_3'},
         )
@@ -0,0 +1,67 @@
+import hail as hl
+
+INTERVAL_BIN_SIZE = int(1e4)
+
+
+def _bin_index(position: hl.Int32Expression) -> hl.Int32Expression:
+    return (position - 1) // INTERVAL_BIN_SIZE
+
+
+def _bin_locus(
+    locus: hl.LocusExpression,
+    bin_index: hl.Int32Expression,
+) -> hl.LocusExpression:
+    return hl.locus(
+        locus.contig,
+        bin_index * INTERVAL_BIN_SIZE + 1,
+        reference_genome=locus.dtype.reference_genome,
+    )
+
+
+def bin_intervals(interval_ht: hl.Table) -> hl.Table:
+    # Flattens a table keyed by interval into fixed width genome bins, keyed by
+    # the first locus of the bin, each holding the rows overlapping it.
+    ht = interval_ht.annotate(
+        bin_locus=hl.range(
+            _bin_index(interval_ht.interval.start.position),
+            _bin_index(interval_ht.interval.end.position) + 1,
+        ).map(lambda i: _bin_locus(interval_ht.interval.start, i)),
+    )
+    ht = ht.explode(ht.bin_locus)
+    ht = ht.group_by(ht.bin_locus).aggregate(
+        intervals=hl.sorted(
+            hl.agg.collect(ht.row.drop('bin_locus')),
+            key=lambda x: x.interval,
+        ),
+    )
+    return ht.rename({'bin_locus': 'locus'})
+
+
+def annotate_interval_bins(ht: hl.Table, interval_bins_ht: hl.Table) -> hl.Table:
+    # NB: hail cannot tell that the computed bin key is ordered, so the key
+    # order is asserted rather than sorted.  The bin of a locus is a
+    # non-decreasing function of it within a contig, so rows ordered by locus
+    # are also ordered by bin, and the rows keep their order through the
+    # ordered join, so they are still ordered by the original key.
+    key = list(ht.key)
+    ht = ht.annotate(
+        interval_bin_locus=_bin_locus(ht.locus, _bin_index(ht.locus.position)),
+    )
+    ht = ht._key_by_assert_sorted('interval_bin_locus')  # noqa: SLF001
+    ht = ht.annotate(
+        interval_bin=hl.or_else(
+            interval_bins_ht[ht.interval_bin_locus].intervals,
+            hl.empty_array(interval_bins_ht.intervals.dtype.element_type),
+        ),
+    )
+    ht = ht._key_by_assert_sorted(*key)  # noqa: SLF001
+    return ht.drop('interval_bin_locus')
+
+
+def overlapping_intervals(
+    ht: hl.Table,
+    interval_ht: hl.Table,
+) -> hl.ArrayExpression:
+    if 'interval_bin' in ht.row:
+        return ht.interval_bin.filter(lambda x: x.interval.contains(ht.locus))
+    return interval_ht.index(ht.locus, all_matches=True)
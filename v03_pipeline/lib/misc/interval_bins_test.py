@@ -0,0 +1,84 @@
+import unittest
+
+import hail as hl
+
+from v03_pipeline.lib.misc.interval_bins import (
+    annotate_interval_bins,
+    bin_intervals,
+    overlapping_intervals,
+)
+
+
+class IntervalBinsTest(unittest.TestCase):
+    def test_annotate_interval_bins(self) -> None:
+        interval_ht = hl.Table.parallelize(
+            [
+                {
+                    'interval': hl.Interval(
+                        hl.Locus('chr1', 5, 'GRCh38'),
+                        hl.Locus('chr1', 25000, 'GRCh38'),
+                    ),
+                    'x': 1,
+                },
+                {
+                    'interval': hl.Interval(
+                        hl.Locus('chr1', 9999, 'GRCh38'),
+                        hl.Locus('chr1', 10001, 'GRCh38'),
+                        includes_end=True,
+                    ),
+                    'x': 2,
+                },
+                {
+                    'interval': hl.Interval(
+                        hl.Locus('chr2', 1, 'GRCh38'),
+                        hl.Locus('chr2', 3, 'GRCh38'),
+                    ),
+                    'x': 3,
+                },
+            ],
+            hl.tstruct(interval=hl.tinterval(hl.tlocus('GRCh38')), x=hl.tint32),
+            key='interval',
+        )
+        interval_bins_ht = bin_intervals(interval_ht)
+        self.assertListEqual(
+            interval_bins_ht.aggregate(
+                hl.agg.collect((interval_bins_ht.locus, interval_bins_ht.intervals.x)),
+            ),
+            [
+                (hl.Locus('chr1', 1, 'GRCh38'), [1, 2]),
+                (hl.Locus('chr1', 10001, 'GRCh38'), [1, 2]),
+                (hl.Locus('chr1', 20001, 'GRCh38'), [1]),
+                (hl.Locus('chr2', 1, 'GRCh38'), [3]),
+            ],
+        )
+        ht = hl.Table.parallelize(
+            [
+                {'locus': hl.Locus(contig, position, 'GRCh38'), 'alleles': ['A', 'C']}
+                for contig, position in [
+                    ('chr1', 4),
+                    ('chr1', 10000),
+                    ('chr1', 10001),
+                    ('chr1', 25000),
+                    ('chr2', 2),
+                    ('chr3', 2),
+                ]
+            ],
+            hl.tstruct(locus=hl.tlocus('GRCh38'), alleles=hl.tarray(hl.tstr)),
+            key=['locus', 'alleles'],
+        )
+        binned_ht = annotate_interval_bins(ht, interval_bins_ht)
+        self.assertListEqual(list(binned_ht.key), ['locus', 'alleles'])
+        self.assertListEqual(
+            binned_ht.select(
+                x=hl.sorted(overlapping_intervals(binned_ht, interval_ht).x),
+            ).x.collect(),
+            ht.select(
+                x=hl.sorted(overlapping_intervals(ht, interval_ht).x),
+            ).x.collect(),
+        )
+        self.assertListEqual(
+            binned_ht.select(
+                x=overlapping_intervals(binned_ht, interval_ht).x,
+            ).x.collect(),
+            [[], [1, 2], [1, 2], [], [3], []],
+        )
@@ -1,15 +1,31 @@
+import fnmatch
+import hashlib
+import json
 import math
 import os
 import uuid
 
 import hail as hl
+from google.cloud import storage
 
 from v03_pipeline.lib.misc.gcnv import parse_gcnv_genes
+from v03_pipeline.lib.misc.partitions import (
+    coarsen_partition_intervals,
+    read_json,
+    write_json,
+)
+from v03_pipeline.lib.misc.staged_tables import (
+    commit_staged_table,
+    recover_staged_table,
+    staged_table_path,
+)
 from v03_pipeline.lib.model import DatasetType, Env, ReferenceGenome
 
 BIALLELIC = 2
 B_PER_MB = 1 << 20  # 1024 * 1024
 MB_PER_PARTITION = 128
+N_PARTITIONS_FOR_SIZE_ESTIMATE = 5
+PARTITIONS_PER_RESUMABLE_CHUNK = 100
 
 
 def does_file_exist(path: str) -> bool:
@@ -38,16 +54,175 @@ def file_size_bytes(path: str) -> int:
     return size_bytes
 
 
+def gcs_file_signatures(path: str) -> list[str]:
+    # NB: crc32c is stored for every object, md5 is missing for composite objects.
+    bucket_name, blob_pattern = path.removeprefix('gs://').split('/', 1)
+    blob_pattern = blob_pattern.rstrip('/')
+    return [
+        f'{blob.size}:{blob.crc32c}'
+        for blob in storage.Client().list_blobs(
+            bucket_name,
+            prefix=blob_pattern.split('*')[0],
+        )
+        if fnmatch.fnmatch(blob.name, blob_pattern)
+        or blob.name.startswith(f'{blob_pattern}/')
+    ]
+
+
+def local_file_signatures(path: str) -> list[str]:
+    signatures = []
+    for f in hl.hadoop_ls(path):
+        if f['is_dir']:
+            signatures.extend(local_file_signatures(f['path']))
+        else:
+            signatures.append(f'{f["size_bytes"]}:{f["modification_time"]}')
+    return signatures
+
+
+def callset_fingerprint(callset_path: str) -> str:
+    # Identifies a callset by the content of its files rather than by its path,
+    # so that a copy of a callset is recognised and a changed callset is not.
+    # NB: the signatures differ by filesystem.  Objects in gs:// are identified
+    # by their stored crc32c.  Local files have no stored checksum and are
+    # identified by size and mtime rather than read in full.  A local copy is
+    # only recognised if it keeps its mtimes, and a fingerprint never matches
+    # across filesystems.
+    signatures = (
+        gcs_file_signatures(callset_path)
+        if callset_path.startswith('gs://')
+        else local_file_signatures(callset_path)
+    )
+    if not signatures:
+        msg = f'No files found at {callset_path}'
+        raise FileNotFoundError(msg)
+    return hashlib.sha256(json.dumps(sorted(signatures)).encode('utf8')).hexdigest()
+
+
 def compute_hail_n_partitions(file_size_b: int) -> int:
     return math.ceil(file_size_b / B_PER_MB / MB_PER_PARTITION)
 
 
+def sampled_size_bytes(t: hl.Table | hl.MatrixTable) -> float:
+    # Writes evenly spaced partitions of the plan and scales their row count
+    # and bytes per row up to every partition.
+    n_partitions = t.n_partitions()
+    if not n_partitions:
+        return 0
+    step = max(n_partitions // N_PARTITIONS_FOR_SIZE_ESTIMATE, 1)
+    sampled_partitions = list(range(step // 2, n_partitions, step))[
+        :N_PARTITIONS_FOR_SIZE_ESTIMATE
+    ]
+    suffix = 'mt' if isinstance(t, hl.MatrixTable) else 'ht'
+    sample_path = os.path.join(Env.HAIL_TMPDIR, f'{uuid.uuid4()}.{suffix}')
+    t._filter_partitions(sampled_partitions).write(sample_path)  # noqa: SLF001
+    n_rows = (
+        hl.read_matrix_table(sample_path).count_rows()
+        if isinstance(t, hl.MatrixTable)
+        else hl.read_table(sample_path).count()
+    )
+    bytes_per_row = file_size_bytes(sample_path) / max(n_rows, 1)
+    hl.current_backend().fs.rmtree(sample_path)
+    estimated_n_rows = n_rows * n_partitions / len(sampled_partitions)
+    print(
+        f'Estimated {round(estimated_n_rows)} rows of {bytes_per_row:.0f} bytes '
+        f'from {len(sampled_partitions)} of {n_partitions} partitions',
+    )
+    return estimated_n_rows * bytes_per_row
+
+
+def estimate_hail_n_partitions(
+    t: hl.Table | hl.MatrixTable,
+    previous_path: str,
+) -> tuple[int, float]:
+    # Estimates the size of the table as that of its previous version, which
+    # is known from the file sizes on disk, or otherwise from a sample of the
+    # plan of the table being written.
+    estimated_size_b = (
+        file_size_bytes(previous_path)
+        if does_file_exist(os.path.join(previous_path, '_SUCCESS'))
+        else sampled_size_bytes(t)
+    )
+    return max(compute_hail_n_partitions(estimated_size_b), 1), estimated_size_b
+
+
+def split_rows(mt: hl.MatrixTable, moved: bool) -> hl.MatrixTable:
+    mt = mt.annotate_rows(
+        splits=mt.splits.filter(lambda split: (split.locus != mt.locus) == moved),
+    )
+    mt = mt.explode_rows(mt.splits)
+    mt = mt.key_rows_by()
+    mt = mt.annotate_rows(
+        locus=mt.splits.locus,
+        alleles=mt.splits.alleles,
+        a_index=mt.splits.a_index,
+        was_split=mt.splits.was_split,
+    ).drop('splits')
+    entries = {}
+    if 'GT' in mt.entry:
+        entries['GT'] = hl.if_else(
+            mt.was_split,
+            hl.downcode(mt.GT, mt.a_index),
+            mt.GT,
+        )
+    if 'AD' in mt.entry:
+        entries['AD'] = hl.if_else(
+            mt.was_split,
+            hl.or_missing(
+                hl.is_defined(mt.AD),
+                [hl.sum(mt.AD) - mt.AD[mt.a_index], mt.AD[mt.a_index]],
+            ),
+            mt.AD,
+        )
+    mt = mt.annotate_entries(**entries)
+    if moved:
+        return mt.key_rows_by('locus', 'alleles')
+    # NB: the rows keep their locus order but not their allele order, as a
+    # split allele may min-represent to alleles ordered before those of an
+    # earlier row at its locus, e.g. the AT>CT allele of AT>A,CT becomes A>C.
+    # Extending the asserted locus key only sorts the rows within each locus.
+    mt = mt._key_rows_by_assert_sorted('locus')  # noqa: SLF001
+    return mt.key_rows_by('locus', 'alleles')
+
+
 def split_multi_hts(mt: hl.MatrixTable) -> hl.MatrixTable:
-    bi = mt.filter_rows(hl.len(mt.alleles) == BIALLELIC)
-    bi = bi.annotate_rows(a_index=1, was_split=False)
-    multi = mt.filter_rows(hl.len(mt.alleles) > BIALLELIC)
-    split = hl.split_multi_hts(multi)
-    return split.union_rows(bi)
+    # Splits multiallelic rows as hl.split_multi_hts does, leaving biallelic
+    # rows as they are.  Biallelic rows and the split alleles that keep their
+    # locus are split together and stay in locus order, so are only sorted
+    # within each locus.  Only the min-represented alleles that move to a later
+    # locus are keyed by a shuffle.
+    #
+    # NB: GQ is carried over unchanged, as hl.split_multi_hts does in the
+    # absence of PL, which is not an entry field of any dataset type.
+    mt = mt.annotate_rows(
+        splits=hl.if_else(
+            hl.len(mt.alleles) == BIALLELIC,
+            [
+                hl.struct(
+                    locus=mt.locus,
+                    alleles=mt.alleles,
+                    a_index=1,
+                    was_split=False,
+                ),
+            ],
+            hl.sorted(
+                hl.range(1, hl.len(mt.alleles))
+                .filter(lambda i: mt.alleles[i] != '*')
+                .map(
+                    lambda i: hl.bind(
+                        lambda min_rep: hl.struct(
+                            locus=min_rep.locus,
+                            alleles=min_rep.alleles,
+                            a_index=i,
+                            was_split=True,
+                        ),
+                        hl.min_rep(mt.locus, [mt.alleles[0], mt.alleles[i]]),
+                    ),
+                ),
+                key=lambda split: hl.tuple([split.locus, split.alleles]),
+            ),
+        ),
+    )
+    return split_rows(mt, moved=False).union_rows(split_rows(mt, moved=True))
 
 
 def import_gcnv_bed_file(callset_path: str) -> hl.MatrixTable:
@@ -116,6 +291,18 @@ def import_vcf(
     )
 
 
+def vcf_shard_n_partitions(
+    callset_path: str,
+    reference_genome: ReferenceGenome,
+) -> list[int]:
+    # The partitions of an imported VCF are contiguous within each of its
+    # files, which are imported in path order.  Only the headers are read.
+    return [
+        import_vcf(f['path'], reference_genome).n_partitions()
+        for f in sorted(hl.hadoop_ls(callset_path), key=lambda f: f['path'])
+    ]
+
+
 def import_callset(
     callset_path: str,
     reference_genome: ReferenceGenome,
@@ -166,18 +353,198 @@ def import_pedigree(pedigree_path: str) -> hl.Table:
     )
 
 
+def replace_table(t: hl.Table | hl.MatrixTable, destination_path: str) -> None:
+    # NB: the table may read the previous version at its destination, so that
+    # is replaced by a staged table, whose files are moved rather than
+    # written a second time.
+    recover_staged_table(destination_path)
+    if does_file_exist(destination_path):
+        staged_path = staged_table_path(destination_path)
+        t.write(staged_path)
+        commit_staged_table(staged_path, destination_path)
+    else:
+        t.write(destination_path)
+
+
+def write_single_pass(
+    t: hl.Table | hl.MatrixTable,
+    destination_path: str,
+    keep_partitioning: bool,
+) -> hl.Table | hl.MatrixTable:
+    read_fn = hl.read_matrix_table if isinstance(t, hl.MatrixTable) else hl.read_table
+    recover_staged_table(destination_path)
+    if keep_partitioning:
+        n_partitions, estimated_size_b = t.n_partitions(), None
+    else:
+        n_partitions, estimated_size_b = estimate_hail_n_partitions(
+            t,
+            destination_path,
+        )
+        t = t.naive_coalesce(n_partitions)
+    replace_table(t, destination_path)
+    t = read_fn(destination_path)
+    actual_n_partitions = t.n_partitions()
+    actual_partition_size_mb = (
+        file_size_bytes(destination_path) / actual_n_partitions / B_PER_MB
+    )
+    if estimated_size_b is None:
+        print(
+            f'Kept {actual_n_partitions} partitions of '
+            f'{actual_partition_size_mb:.1f}MB in {destination_path}',
+        )
+    else:
+        print(
+            f'Estimated {n_partitions} partitions of '
+            f'{estimated_size_b / n_partitions / B_PER_MB:.1f}MB, '
+            f'wrote {actual_n_partitions} partitions of '
+            f'{actual_partition_size_mb:.1f}MB to {destination_path}',
+        )
+    return t
+
+
+def resumable_checkpoint_path(
+    destination_path: str,
+    input_paths: list[str],
+) -> str:
+    # NB: the checkpoint is found again by a retried write of the same inputs
+    # to the same destination, so it is named for both rather than randomly.
+    fingerprint = hashlib.sha256(
+        json.dumps([destination_path, *input_paths]).encode('utf8'),
+    ).hexdigest()
+    return os.path.join(Env.HAIL_TMPDIR, 'resumable', fingerprint)
+
+
+def inputs_fingerprint(paths: list[str]) -> str:
+    # Tables are identified by their metadata, which every write of a table
+    # replaces, other files by their contents and missing paths by name.
+    signatures = []
+    for path in paths:
+        metadata_path = os.path.join(path, 'metadata.json.gz')
+        if does_file_exist(metadata_path):
+            signatures.append(callset_fingerprint(metadata_path))
+        elif does_file_exist(path):
+            signatures.append(callset_fingerprint(path))
+        else:
+            signatures.append(path)
+    return hashlib.sha256(json.dumps(signatures).encode('utf8')).hexdigest()
+
+
+def checkpoint_resumable(
+    t: hl.Table | hl.MatrixTable,
+    destination_path: str,
+    input_paths: list[str],
+) -> tuple[hl.Table | hl.MatrixTable, str]:
+    # Writes the table in chunks of partitions, each recorded in a manifest
+    # once written, so that a retried write only writes the missing chunks.
+    read_fn = hl.read_matrix_table if isinstance(t, hl.MatrixTable) else hl.read_table
+    checkpoint_path = resumable_checkpoint_path(destination_path, input_paths)
+    manifest_path = os.path.join(checkpoint_path, 'manifest.json')
+    fingerprint = inputs_fingerprint([destination_path, *input_paths])
+    manifest = read_json(manifest_path) if does_file_exist(manifest_path) else None
+    # NB: the destination is replaced by a staged commit, so it is never part
+    # way through being overwritten and a finished checkpoint is also checked.
+    if manifest and manifest['inputs_fingerprint'] != fingerprint:
+        print(f'Inputs of {destination_path} changed, discarding written chunks')
+        hl.current_backend().fs.rmtree(checkpoint_path)
+        manifest = None
+    if not manifest:
+        manifest = {
+            'inputs_fingerprint': fingerprint,
+            'n_partitions': t.n_partitions(),
+            'n_chunks': max(
+                math.ceil(t.n_partitions() / PARTITIONS_PER_RESUMABLE_CHUNK),
+                1,
+            ),
+            'completed_chunks': [],
+        }
+    n_partitions, n_chunks = manifest['n_partitions'], manifest['n_chunks']
+    completed_chunks = set(manifest['completed_chunks'])
+    if completed_chunks:
+        print(
+            f'Resuming write to {destination_path}, '
+            f'{len(completed_chunks)} of {n_chunks} chunks already written',
+        )
+    # NB: every chunk is a job over the same plan, which would otherwise rerun
+    # any shuffle in it once per chunk.  The plan is materialized once, to
+    # disk rather than memory as it may be as large as the table.
+    missing_chunks = [i for i in range(n_chunks) if i not in completed_chunks]
+    if len(missing_chunks) > 1:
+        t = t.persist('DISK_ONLY')
+    for i in missing_chunks:
+        t._filter_partitions(  # noqa: SLF001
+            list(
+                range(
+                    i * PARTITIONS_PER_RESUMABLE_CHUNK,
+                    min((i + 1) * PARTITIONS_PER_RESUMABLE_CHUNK, n_partitions),
+                ),
+            ),
+        ).write(os.path.join(checkpoint_path, f'{i}.chunk'), overwrite=True)
+        completed_chunks.add(i)
+        write_json(
+            manifest_path,
+            {**manifest, 'completed_chunks': sorted(completed_chunks)},
+        )
+    if len(missing_chunks) > 1:
+        t.unpersist()
+    chunks = [
+        read_fn(os.path.join(checkpoint_path, f'{i}.chunk')) for i in range(n_chunks)
+    ]
+    if isinstance(t, hl.MatrixTable):
+        return hl.MatrixTable.union_rows(*chunks), checkpoint_path
+    return chunks[0].union(*chunks[1:]), checkpoint_path
+
+
 def write(
     t: hl.Table | hl.MatrixTable,
     destination_path: str,
+    single_pass: bool = False,
+    resumable: bool = False,
+    partition_intervals: list[hl.Interval] | None = None,
+    resumable_input_paths: list[str] | None = None,
 ) -> hl.Table | hl.MatrixTable:
+    # NB: a resumable write takes precedence over a single pass write.  Its
+    # checkpoint is a union of chunks that cannot be read with the partition
+    # intervals.  A single pass write of a table whose inputs are read with
+    # the partition intervals keeps their partitioning.
+    if resumable:
+        partition_intervals = None
+    elif single_pass:
+        return write_single_pass(
+            t,
+            destination_path,
+            keep_partitioning=bool(partition_intervals),
+        )
     suffix = 'mt' if isinstance(t, hl.MatrixTable) else 'ht'
     read_fn = hl.read_matrix_table if isinstance(t, hl.MatrixTable) else hl.read_table
     checkpoint_path = os.path.join(
         Env.HAIL_TMPDIR,
         f'{uuid.uuid4()}.{suffix}',
     )
-    # not using checkpoint to read/write here because the checkpoint codec is different, leading to a different on disk size.
-    t.write(checkpoint_path)
-    t = read_fn(checkpoint_path)
-    t = t.naive_coalesce(compute_hail_n_partitions(file_size_bytes(checkpoint_path)))
-    return t.write(destination_path, overwrite=True)
+    if resumable:
+        # NB: once every chunk is written, a retried write only rewrites the
+        # destination from them.
+        t, checkpoint_path = checkpoint_resumable(
+            t,
+            destination_path,
+            resumable_input_paths or [],
+        )
+    else:
+        # not using checkpoint to read/write here because the checkpoint codec is different, leading to a different on disk size.
+        t.write(checkpoint_path)
+        t = read_fn(checkpoint_path)
+    n_partitions = compute_hail_n_partitions(file_size_bytes(checkpoint_path))
+    if partition_intervals:
+        # NB: the shared intervals are merged down to the size of the table,
+        # so that a small table is not split into many near-empty partitions.
+        t = read_fn(
+            checkpoint_path,
+            _intervals=coarsen_partition_intervals(partition_intervals, n_partitions),
+        )
+    else:
+        t = t.naive_coalesce(n_partitions)
+    if resumable:
+        replace_table(t, destination_path)
+        hl.current_backend().fs.rmtree(checkpoint_path)
+    else:
+        t.write(destination_path, overwrite=True)
+    return read_fn(destination_path)
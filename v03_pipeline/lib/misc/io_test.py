@@ -1,6 +1,20 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest.mock import patch
 
-from v03_pipeline.lib.misc.io import compute_hail_n_partitions, file_size_bytes
+import hail as hl
+
+from v03_pipeline.lib.misc.io import (
+    callset_fingerprint,
+    compute_hail_n_partitions,
+    file_size_bytes,
+    resumable_checkpoint_path,
+    split_multi_hts,
+    write,
+)
+from v03_pipeline.lib.misc.partitions import read_json
 
 TEST_MITO_MT = 'v03_pipeline/var/test/callsets/mito_1.mt'
 TEST_SV_VCF = 'v03_pipeline/var/test/callsets/sv_1.vcf'
@@ -17,3 +31,262 @@ class IOTest(unittest.TestCase):
         self.assertEqual(compute_hail_n_partitions(23), 1)
         self.assertEqual(compute_hail_n_partitions(191310), 1)
         self.assertEqual(compute_hail_n_partitions(1913100000), 15)
+
+    def test_callset_fingerprint(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # A copy with the same content at a new path has the same fingerprint.
+            copy_path = os.path.join(temp_dir, 'redelivered', 'mito_1.mt')
+            shutil.copytree(TEST_MITO_MT, copy_path)
+            self.assertEqual(
+                callset_fingerprint(copy_path),
+                callset_fingerprint(TEST_MITO_MT),
+            )
+            self.assertNotEqual(
+                callset_fingerprint(copy_path),
+                callset_fingerprint(TEST_SV_VCF),
+            )
+
+            # Changed content at the same path does not.
+            fingerprint = callset_fingerprint(copy_path)
+            with open(os.path.join(copy_path, '_SUCCESS'), 'a') as f:
+                f.write('changed')
+            self.assertNotEqual(callset_fingerprint(copy_path), fingerprint)
+
+            # A missing callset has no fingerprint.
+            with self.assertRaises(FileNotFoundError):
+                callset_fingerprint(os.path.join(temp_dir, 'missing_*.vcf'))
+
+    def test_split_multi_hts(self) -> None:
+        mt = hl.MatrixTable.from_parts(
+            rows={
+                'locus': [
+                    hl.Locus('chr1', position, 'GRCh38') for position in range(1, 6)
+                ],
+                'alleles': [
+                    ['A', 'C'],
+                    ['A', 'C', 'T'],
+                    ['CAT', 'CAG', 'C'],
+                    ['G', 'T'],
+                    ['T', 'A'],
+                ],
+            },
+            cols={'s': ['sample_1']},
+            entries={
+                'GT': [
+                    [hl.Call([0, 1])],
+                    [hl.Call([1, 2])],
+                    [hl.Call([0, 1])],
+                    [hl.Call([0, 0])],
+                    [hl.Call([0, 1])],
+                ],
+                'AD': [[[5, 5]], [[0, 3, 4]], [[4, 6, 0]], [[10, 0]], [[3, 3]]],
+            },
+        ).key_rows_by('locus', 'alleles')
+        mt = split_multi_hts(mt)
+        self.assertListEqual(
+            mt.entries().select('a_index', 'was_split', 'GT', 'AD').collect(),
+            [
+                hl.Struct(
+                    locus=hl.Locus('chr1', position, 'GRCh38'),
+                    alleles=alleles,
+                    s='sample_1',
+                    a_index=a_index,
+                    was_split=was_split,
+                    GT=hl.Call(gt),
+                    AD=ad,
+                )
+                for position, alleles, a_index, was_split, gt, ad in [
+                    (1, ['A', 'C'], 1, False, [0, 1], [5, 5]),
+                    (2, ['A', 'C'], 1, True, [0, 1], [4, 3]),
+                    (2, ['A', 'T'], 2, True, [0, 1], [3, 4]),
+                    (3, ['CAT', 'C'], 2, True, [0, 0], [10, 0]),
+                    (4, ['G', 'T'], 1, False, [0, 0], [10, 0]),
+                    (5, ['T', 'A'], 1, False, [0, 1], [3, 3]),
+                    # The CAT>CAG allele is min-represented as T>G at position 5.
+                    (5, ['T', 'G'], 1, True, [0, 1], [4, 6]),
+                ]
+            ],
+        )
+
+    def test_split_multi_hts_same_locus(self) -> None:
+        # The AT>CT allele is min-represented as A>C, which sorts before the
+        # A>G row at the same locus.
+        mt = hl.MatrixTable.from_parts(
+            rows={
+                'locus': [hl.Locus('chr1', 1, 'GRCh38')] * 2,
+                'alleles': [['A', 'G'], ['AT', 'A', 'CT']],
+            },
+            cols={'s': ['sample_1']},
+            entries={
+                'GT': [[hl.Call([0, 1])], [hl.Call([1, 2])]],
+                'AD': [[[5, 5]], [[0, 3, 4]]],
+            },
+        ).key_rows_by('locus', 'alleles')
+        mt = split_multi_hts(mt)
+        self.assertListEqual(
+            mt.entries().select('a_index', 'was_split', 'GT', 'AD').collect(),
+            [
+                hl.Struct(
+                    locus=hl.Locus('chr1', 1, 'GRCh38'),
+                    alleles=alleles,
+                    s='sample_1',
+                    a_index=a_index,
+                    was_split=was_split,
+                    GT=hl.Call([0, 1]),
+                    AD=ad,
+                )
+                for alleles, a_index, was_split, ad in [
+                    (['A', 'C'], 2, True, [3, 4]),
+                    (['A', 'G'], 1, False, [5, 5]),
+                    (['AT', 'A'], 1, True, [4, 3]),
+                ]
+            ],
+        )
+
+    def test_write_single_pass(self) -> None:
+        table_write = hl.Table.write
+        written_paths = []
+
+        def recorded_write(t: hl.Table, path: str, **kwargs) -> None:
+            written_paths.append(path)
+            table_write(t, path, **kwargs)
+
+        with tempfile.TemporaryDirectory() as temp_dir, patch.object(
+            hl.Table,
+            'write',
+            recorded_write,
+        ):
+            destination_path = os.path.join(temp_dir, 'test.ht')
+            ht = hl.utils.range_table(100, n_partitions=10)
+            ht = ht.annotate(x=ht.idx * 2)
+
+            # Without a previous version, the size is estimated from a sample
+            # of the plan's partitions.
+            write(ht, destination_path, single_pass=True)
+            self.assertEqual(len(written_paths), 2)
+            self.assertEqual(written_paths[-1], destination_path)
+
+            # With a previous version, the table is written once, even when it
+            # reads its previous version, and committed over it.
+            written_paths.clear()
+            ht = hl.read_table(destination_path)
+            ht = ht.union(
+                hl.utils.range_table(200, n_partitions=10)
+                .filter(lambda row: row.idx >= 100)  # noqa: PLR2004
+                .annotate(x=0),
+            )
+            write(ht, destination_path, single_pass=True)
+            self.assertEqual(len(written_paths), 1)
+            self.assertTrue(written_paths[0].startswith(destination_path))
+            self.assertNotEqual(written_paths[0], destination_path)
+            self.assertFalse(os.path.exists(os.path.join(destination_path, '_staging')))
+            ht = hl.read_table(destination_path)
+            self.assertEqual(ht.n_partitions(), 1)
+            self.assertEqual(ht.count(), 200)
+            self.assertEqual(ht.aggregate(hl.agg.sum(ht.x)), 9900)
+
+    @patch('v03_pipeline.lib.misc.io.PARTITIONS_PER_RESUMABLE_CHUNK', 2)
+    def test_write_resumable(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            destination_path = os.path.join(temp_dir, 'test.ht')
+            ht = hl.utils.range_table(100, n_partitions=10)
+            ht = ht.annotate(x=ht.idx * 2)
+            checkpoint_path = resumable_checkpoint_path(destination_path, [])
+            table_write = hl.Table.write
+            written_paths = []
+
+            def recorded_write(t: hl.Table, path: str, **kwargs) -> None:
+                written_paths.append(os.path.basename(path))
+                table_write(t, path, **kwargs)
+
+            def killed_write(suffix: str):
+                def _write(t: hl.Table, path: str, **kwargs) -> None:
+                    if path.endswith(suffix):
+                        msg = 'Worker killed'
+                        raise RuntimeError(msg)
+                    recorded_write(t, path, **kwargs)
+
+                return _write
+
+            # The write dies part way through the chunks.
+            with (
+                patch.object(hl.Table, 'write', killed_write('3.chunk')),
+                self.assertRaises(
+                    RuntimeError,
+                ),
+            ):
+                write(ht, destination_path, resumable=True)
+            self.assertListEqual(written_paths, ['0.chunk', '1.chunk', '2.chunk'])
+            self.assertFalse(os.path.exists(destination_path))
+            manifest = read_json(os.path.join(checkpoint_path, 'manifest.json'))
+            self.assertEqual(manifest['n_partitions'], 10)
+            self.assertEqual(manifest['n_chunks'], 5)
+            self.assertListEqual(manifest['completed_chunks'], [0, 1, 2])
+
+            # The retried write, by a new table object over the same inputs,
+            # only writes the missing chunks and then dies writing the
+            # destination.
+            written_paths.clear()
+            ht = hl.utils.range_table(100, n_partitions=10)
+            ht = ht.annotate(x=ht.idx * 2)
+            with (
+                patch.object(hl.Table, 'write', killed_write('test.ht')),
+                self.assertRaises(
+                    RuntimeError,
+                ),
+            ):
+                write(ht, destination_path, resumable=True)
+            self.assertListEqual(written_paths, ['3.chunk', '4.chunk'])
+
+            # The final retry only writes the destination.
+            written_paths.clear()
+            with patch.object(hl.Table, 'write', recorded_write):
+                write(ht, destination_path, resumable=True)
+            self.assertListEqual(written_paths, ['test.ht'])
+            self.assertFalse(os.path.exists(checkpoint_path))
+            self.assertListEqual(
+                hl.read_table(destination_path).collect(),
+                ht.collect(),
+            )
+
+    @patch('v03_pipeline.lib.misc.io.PARTITIONS_PER_RESUMABLE_CHUNK', 5)
+    def test_write_resumable_changed_inputs(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            destination_path = os.path.join(temp_dir, 'test.ht')
+            input_path = os.path.join(temp_dir, 'input.ht')
+            hl.utils.range_table(100, n_partitions=10).write(input_path)
+            table_write = hl.Table.write
+            written_paths = []
+
+            def killed_write(t: hl.Table, path: str, **kwargs) -> None:
+                if path.endswith('test.ht'):
+                    msg = 'Worker killed'
+                    raise RuntimeError(msg)
+                written_paths.append(os.path.basename(path))
+                table_write(t, path, **kwargs)
+
+            # Every chunk is written before the write dies.
+            with (
+                patch.object(hl.Table, 'write', killed_write),
+                self.assertRaises(RuntimeError),
+            ):
+                write(
+                    hl.read_table(input_path),
+                    destination_path,
+                    resumable=True,
+                    resumable_input_paths=[input_path],
+                )
+            self.assertListEqual(written_paths, ['0.chunk', '1.chunk'])
+
+            # The finished chunks are discarded once the input is rewritten.
+            hl.utils.range_table(50, n_partitions=10).write(
+                input_path,
+                overwrite=True,
+            )
+            ht = write(
+                hl.read_table(input_path),
+                destination_path,
+                resumable=True,
+                resumable_input_paths=[input_path],
+            )
+            self.assertEqual(ht.count(), 50)
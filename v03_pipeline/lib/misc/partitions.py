@@ -0,0 +1,204 @@
+import itertools
+import json
+import os
+
+import hail as hl
+
+from v03_pipeline.lib.model import DatasetType, ReferenceGenome
+from v03_pipeline.lib.paths import partition_intervals_path
+
+
+def read_json(path: str) -> dict:
+    # NB: hadoop_open transparently (de)compresses paths ending in .gz
+    with hl.hadoop_open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: str, obj: dict) -> None:
+    with hl.hadoop_open(path, 'w') as f:
+        json.dump(obj, f)
+
+
+def table_spec_path(path: str) -> str:
+    return os.path.join(path, 'metadata.json.gz')
+
+
+def rows_spec_path(path: str) -> str:
+    return os.path.join(path, 'rows', 'metadata.json.gz')
+
+
+def partition_bounds(path: str) -> list[hl.Interval]:
+    key_type = hl.read_table(path).key.dtype
+    return [
+        hl.Interval(
+            key_type._convert_from_json_na(bound['start']),  # noqa: SLF001
+            key_type._convert_from_json_na(bound['end']),  # noqa: SLF001
+            bound['includeStart'],
+            bound['includeEnd'],
+            point_type=key_type,
+        )
+        for bound in read_json(rows_spec_path(path))['_jRangeBounds']
+    ]
+
+
+def partition_extents(
+    path: str,
+    keys_ht: hl.Table,
+) -> list[hl.Interval]:
+    # Extends the on-disk partition bounds so that they tile the key space
+    # spanned by the table and keys_ht: every key belongs to exactly one
+    # partition, keys that fall between two partitions belong to the later one.
+    bounds = partition_bounds(path)
+    key_type = keys_ht.key.dtype
+    lower, upper = hl.eval(
+        hl.bind(
+            lambda keys: (hl.sorted(keys)[0], hl.sorted(keys)[-1]),
+            hl.literal(
+                [
+                    bounds[0].start,
+                    bounds[-1].end,
+                    *keys_ht.head(1).key.collect(),
+                    *keys_ht.tail(1).key.collect(),
+                ],
+                dtype=hl.tarray(key_type),
+            ),
+        ),
+    )
+    extents = []
+    for i, bound in enumerate(bounds):
+        start, includes_start = (
+            (lower, True)
+            if i == 0
+            else (bounds[i - 1].end, not bounds[i - 1].includes_end)
+        )
+        end, includes_end = (
+            (upper, True) if i == len(bounds) - 1 else (bound.end, bound.includes_end)
+        )
+        extents.append(
+            hl.Interval(start, end, includes_start, includes_end, point_type=key_type),
+        )
+    return extents
+
+
+def touched_partition_indices(
+    extents: list[hl.Interval],
+    keys_ht: hl.Table,
+) -> list[int]:
+    # NB: hl.binary_search is limited to numeric arrays, so partitions are
+    # searched by global position and ties within a locus broken by the full key.
+    ends = hl.literal(
+        [extent.end for extent in extents],
+        hl.tarray(keys_ht.key.dtype),
+    )
+    includes_ends = hl.literal([extent.includes_end for extent in extents])
+    end_positions = ends.map(lambda end: end.locus.global_position())
+
+    def is_past_end(i: hl.Int32Expression) -> hl.BooleanExpression:
+        return (i < len(extents) - 1) & (
+            (hl.sorted([ends[i], keys_ht.key])[0] != keys_ht.key)
+            | ((ends[i] == keys_ht.key) & ~includes_ends[i])
+        )
+
+    partition_idx = hl.bind(
+        lambda i: hl.if_else(is_past_end(i), i + 1, i),
+        hl.min(
+            hl.binary_search(end_positions, keys_ht.locus.global_position()),
+            len(extents) - 1,
+        ),
+    )
+    return sorted(keys_ht.aggregate(hl.agg.collect_as_set(partition_idx)))
+
+
+def partition_intervals_type(reference_genome: ReferenceGenome) -> hl.HailType:
+    return hl.tarray(hl.tinterval(hl.tstruct(locus=hl.tlocus(reference_genome.value))))
+
+
+def compute_partition_intervals(
+    ht: hl.Table,
+    n_partitions: int,
+    reference_genome: ReferenceGenome,
+) -> list[hl.Interval]:
+    # Splits the genome at the loci hail would repartition ht at, the intervals
+    # are over the locus prefix of the key and span every contig, so that a
+    # table read with them keeps all of its rows.
+    rg = reference_genome.hl_reference
+    point_type = hl.tstruct(locus=hl.tlocus(reference_genome.value))
+    new_partitions = ht._calculate_new_partitions(n_partitions)  # noqa: SLF001
+    boundaries = [
+        hl.Struct(locus=hl.Locus(rg.contigs[0], 1, reference_genome.value)),
+        *sorted(
+            {hl.Struct(locus=interval.start.locus) for interval in new_partitions[1:]},
+            key=lambda point: point.locus.global_position(),
+        ),
+        hl.Struct(
+            locus=hl.Locus(
+                rg.contigs[-1],
+                rg.lengths[rg.contigs[-1]],
+                reference_genome.value,
+            ),
+        ),
+    ]
+    return [
+        hl.Interval(
+            start,
+            end,
+            includes_start=True,
+            includes_end=end == boundaries[-1],
+            point_type=point_type,
+        )
+        for start, end in itertools.pairwise(boundaries)
+        if start != end
+    ]
+
+
+def coarsen_partition_intervals(
+    intervals: list[hl.Interval],
+    n_partitions: int,
+) -> list[hl.Interval]:
+    # Merges runs of adjacent intervals so that a table smaller than the one
+    # they were computed from is read with n_partitions partitions, each of
+    # which still starts and ends at one of the shared boundaries.
+    n_partitions = max(n_partitions, 1)
+    if n_partitions >= len(intervals):
+        return intervals
+    step = len(intervals) / n_partitions
+    runs = [
+        intervals[round(i * step) : round((i + 1) * step)] for i in range(n_partitions)
+    ]
+    return [
+        hl.Interval(
+            run[0].start,
+            run[-1].end,
+            includes_start=run[0].includes_start,
+            includes_end=run[-1].includes_end,
+            point_type=run[0].point_type,
+        )
+        for run in runs
+    ]
+
+
+def write_partition_intervals(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+    intervals: list[hl.Interval],
+) -> None:
+    interval_type = partition_intervals_type(reference_genome)
+    write_json(
+        partition_intervals_path(reference_genome, dataset_type),
+        {'intervals': interval_type._convert_to_json(intervals)},  # noqa: SLF001
+    )
+
+
+def read_partition_intervals(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+) -> list[hl.Interval] | None:
+    # The v03 tables of a dataset type share these partition intervals, so that
+    # joins between them and the callsets read with them need no shuffle.
+    path = partition_intervals_path(reference_genome, dataset_type)
+    if not hl.hadoop_exists(path):
+        return None
+    interval_type = partition_intervals_type(reference_genome)
+    return interval_type._convert_from_json_na(  # noqa: SLF001
+        read_json(path)['intervals'],
+    )
@@ -0,0 +1,110 @@
+import itertools
+import os
+import tempfile
+import unittest
+
+import hail as hl
+
+from v03_pipeline.lib.misc.partitions import (
+    coarsen_partition_intervals,
+    compute_partition_intervals,
+    partition_extents,
+    touched_partition_indices,
+)
+from v03_pipeline.lib.model import ReferenceGenome
+
+
+class PartitionsTest(unittest.TestCase):
+    def test_compute_partition_intervals(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.ht')
+            ht = hl.utils.range_table(100, n_partitions=10)
+            ht = ht.annotate(
+                locus=hl.locus(
+                    hl.if_else(ht.idx < 50, 'chr1', 'chr2'),  # noqa: PLR2004
+                    ht.idx + 1,
+                    reference_genome='GRCh38',
+                ),
+                alleles=['A', 'C'],
+            )
+            ht = ht.key_by('locus', 'alleles')
+            ht.write(path)
+            intervals = compute_partition_intervals(
+                hl.read_table(path),
+                4,
+                ReferenceGenome.GRCh38,
+            )
+            self.assertEqual(len(intervals), 4)
+            self.assertEqual(
+                intervals[0].start,
+                hl.Struct(locus=hl.Locus('chr1', 1, 'GRCh38')),
+            )
+            rg = hl.get_reference('GRCh38')
+            self.assertEqual(
+                intervals[-1].end,
+                hl.Struct(
+                    locus=hl.Locus(
+                        rg.contigs[-1],
+                        rg.lengths[rg.contigs[-1]],
+                        'GRCh38',
+                    ),
+                ),
+            )
+            self.assertTrue(intervals[-1].includes_end)
+            self.assertTrue(
+                all(
+                    interval.end == next_interval.start
+                    for interval, next_interval in itertools.pairwise(intervals)
+                ),
+            )
+            ht = hl.read_table(path, _intervals=intervals)
+            self.assertEqual(ht.n_partitions(), 4)
+            self.assertEqual(ht.count(), 100)
+
+            # A smaller table is read with fewer partitions over the same
+            # boundaries.
+            coarsened_intervals = coarsen_partition_intervals(intervals, 2)
+            self.assertListEqual(
+                [(interval.start, interval.end) for interval in coarsened_intervals],
+                [
+                    (intervals[0].start, intervals[1].end),
+                    (intervals[2].start, intervals[3].end),
+                ],
+            )
+            self.assertTrue(coarsened_intervals[-1].includes_end)
+            self.assertListEqual(coarsen_partition_intervals(intervals, 8), intervals)
+            ht = hl.read_table(path, _intervals=coarsened_intervals)
+            self.assertEqual(ht.n_partitions(), 2)
+            self.assertEqual(ht.count(), 100)
+
+    def test_touched_partition_indices(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.ht')
+            ht = hl.utils.range_table(100, n_partitions=10)
+            ht = ht.annotate(
+                locus=hl.locus('chr1', ht.idx + 1, reference_genome='GRCh38'),
+                alleles=['A', 'C'],
+            )
+            ht.key_by('locus', 'alleles').write(path)
+            keys_ht = hl.Table.parallelize(
+                [
+                    {'locus': hl.Locus('chr1', 16, 'GRCh38'), 'alleles': ['A', 'C']},
+                    {'locus': hl.Locus('chr1', 56, 'GRCh38'), 'alleles': ['A', 'G']},
+                    {'locus': hl.Locus('chr1', 151, 'GRCh38'), 'alleles': ['A', 'C']},
+                ],
+                hl.tstruct(
+                    locus=hl.tlocus('GRCh38'),
+                    alleles=hl.tarray(hl.tstr),
+                ),
+                key=['locus', 'alleles'],
+            )
+            extents = partition_extents(path, keys_ht)
+            self.assertEqual(len(extents), 10)
+            self.assertEqual(
+                extents[-1].end.locus,
+                hl.Locus('chr1', 151, 'GRCh38'),
+            )
+            self.assertListEqual(
+                touched_partition_indices(extents, keys_ht),
+                [1, 5, 9],
+            )
@@ -1,6 +1,25 @@
+from collections.abc import Callable
+
 import hail as hl
 
 
+def has_sparse_entries(ht: hl.Table) -> bool:
+    # Sparse entries hold only the entries of carriers, each tagged with
+    # its index into the global sample ids, rather than one per sample.
+    return 'entries' in ht.row and 'sample_idx' in ht.entries.dtype.element_type
+
+
+def sparsify_entries(
+    ht: hl.Table,
+    sample_entries_filter_fn: Callable[[hl.StructExpression], hl.BooleanExpression],
+) -> hl.Table:
+    return ht.annotate(
+        entries=hl.enumerate(ht.entries)
+        .filter(lambda x: hl.or_else(sample_entries_filter_fn(x[1]), False))
+        .map(lambda x: x[1].annotate(sample_idx=hl.int32(x[0]))),
+    )
+
+
 def globalize_sample_ids(ht: hl.Table) -> hl.Table:
     row = ht.take(1)
     ht = ht.annotate_globals(
@@ -33,14 +52,64 @@ def filter_callset_entries(
 ) -> hl.Table:
     # Removes sample id calls that have been re-called.
     sample_ids = sample_subset_ht.aggregate(hl.agg.collect_as_set(sample_subset_ht.s))
-    ht = deglobalize_sample_ids(ht)
-    ht = ht.annotate(
-        entries=(ht.entries.filter(lambda e: ~hl.set(sample_ids).contains(e.s))),
+    # NB: the positions of the kept samples are computed once from the globals,
+    # so that rows are filtered by index rather than by sample id.
+    current_sample_ids = hl.eval(ht.sample_ids)
+    kept_sample_idxs = [
+        i for i, s in enumerate(current_sample_ids) if s not in sample_ids
+    ]
+    if len(kept_sample_idxs) == len(current_sample_ids):
+        return ht
+    if has_sparse_entries(ht):
+        # The kept samples are re-indexed in order, and rows left with
+        # no entries are dropped rather than padded.
+        new_sample_idxs = {old_i: new_i for new_i, old_i in enumerate(kept_sample_idxs)}
+        sample_idx_mapping = hl.literal(
+            [new_sample_idxs.get(i) for i in range(len(current_sample_ids))],
+            hl.tarray(hl.tint32),
+        )
+        ht = ht.annotate(
+            entries=ht.entries.filter(
+                lambda e: hl.is_defined(sample_idx_mapping[e.sample_idx]),
+            ).map(lambda e: e.annotate(sample_idx=sample_idx_mapping[e.sample_idx])),
+        )
+        ht = ht.filter(hl.len(ht.entries) > 0)
+    else:
+        ht = ht.annotate(
+            entries=hl.literal(kept_sample_idxs, hl.tarray(hl.tint32)).map(
+                lambda i: ht.entries[i],
+            ),
+        )
+    return ht.annotate_globals(
+        sample_ids=hl.literal(
+            [current_sample_ids[i] for i in kept_sample_idxs],
+            hl.tarray(hl.tstr),
+        ),
     )
-    return globalize_sample_ids(ht)
+
+
+def _join_sparse_entries_hts(ht: hl.Table, callset_ht: hl.Table) -> hl.Table:
+    ht = ht.join(callset_ht, 'outer')
+    empty_entries = hl.empty_array(ht.entries_1.dtype.element_type)
+    ht = ht.select(
+        filters=hl.or_else(ht.filters_1, ht.filters),
+        entries=hl.or_else(ht.entries, empty_entries).extend(
+            hl.or_else(
+                ht.entries_1.map(
+                    lambda e: e.annotate(
+                        sample_idx=e.sample_idx + hl.len(ht.sample_ids),
+                    ),
+                ),
+                empty_entries,
+            ),
+        ),
+    )
+    return ht.transmute_globals(sample_ids=ht.sample_ids.extend(ht.sample_ids_1))
 
 
 def join_entries_hts(ht: hl.Table, callset_ht: hl.Table) -> hl.Table:
+    if has_sparse_entries(callset_ht):
+        return _join_sparse_entries_hts(ht, callset_ht)
     ht = ht.join(callset_ht, 'outer')
     ht_empty_entries = ht.sample_ids.map(
         lambda _: hl.missing(ht.entries_1.dtype.element_type),
@@ -7,6 +7,7 @@ from v03_pipeline.lib.misc.sample_entries import (
     filter_callset_entries,
     globalize_sample_ids,
     join_entries_hts,
+    sparsify_entries,
 )
 
 
@@ -326,3 +327,102 @@ class SampleEntriesTest(unittest.TestCase):
                 ),
             ],
         )
+
+    def test_sparse_entries(self) -> None:
+        entries_ht = hl.Table.parallelize(
+            [
+                {
+                    'id': 0,
+                    'filters': set(),
+                    'entries': [
+                        hl.Struct(a=1, sample_idx=1),
+                        hl.Struct(a=2, sample_idx=2),
+                    ],
+                },
+                {
+                    'id': 1,
+                    'filters': {'HIGH_SR_BACKGROUND'},
+                    'entries': [
+                        hl.Struct(a=3, sample_idx=0),
+                    ],
+                },
+            ],
+            hl.tstruct(
+                id=hl.tint32,
+                filters=hl.tset(hl.tstr),
+                entries=hl.tarray(hl.tstruct(a=hl.tint32, sample_idx=hl.tint32)),
+            ),
+            key='id',
+            globals=hl.Struct(sample_ids=['a', 'b', 'c']),
+        )
+        callset_ht = hl.Table.parallelize(
+            [
+                {
+                    'id': 1,
+                    'filters': set(),
+                    'entries': [hl.Struct(a=0), hl.Struct(a=4)],
+                },
+                {
+                    'id': 2,
+                    'filters': set(),
+                    'entries': [hl.Struct(a=5), hl.Struct(a=hl.missing(hl.tint32))],
+                },
+            ],
+            hl.tstruct(
+                id=hl.tint32,
+                filters=hl.tset(hl.tstr),
+                entries=hl.tarray(hl.tstruct(a=hl.tint32)),
+            ),
+            key='id',
+            globals=hl.Struct(sample_ids=['b', 'd']),
+        )
+        callset_ht = sparsify_entries(callset_ht, lambda e: e.a > 0)
+        ht = filter_callset_entries(
+            entries_ht,
+            hl.Table.parallelize(
+                [{'s': 'b'}, {'s': 'd'}],
+                hl.tstruct(s=hl.tstr),
+                key='s',
+            ),
+        )
+        self.assertEqual(hl.eval(ht.sample_ids), ['a', 'c'])
+        self.assertListEqual(
+            ht.collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    filters=set(),
+                    entries=[hl.Struct(a=2, sample_idx=1)],
+                ),
+                hl.Struct(
+                    id=1,
+                    filters={'HIGH_SR_BACKGROUND'},
+                    entries=[hl.Struct(a=3, sample_idx=0)],
+                ),
+            ],
+        )
+        ht = join_entries_hts(ht, callset_ht)
+        self.assertEqual(hl.eval(ht.sample_ids), ['a', 'c', 'b', 'd'])
+        self.assertListEqual(
+            ht.collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    filters=set(),
+                    entries=[hl.Struct(a=2, sample_idx=1)],
+                ),
+                hl.Struct(
+                    id=1,
+                    filters=set(),
+                    entries=[
+                        hl.Struct(a=3, sample_idx=0),
+                        hl.Struct(a=4, sample_idx=3),
+                    ],
+                ),
+                hl.Struct(
+                    id=2,
+                    filters=set(),
+                    entries=[hl.Struct(a=5, sample_idx=2)],
+                ),
+            ],
+        )
@@ -18,9 +18,16 @@ def remap_sample_ids(
     mt: hl.MatrixTable,
     project_remap_ht: hl.Table,
     ignore_missing_samples_when_remapping: bool,
+    callset_sample_ids: list[str] | None = None,
+    collected_remap: list[hl.Struct] | None = None,
 ) -> hl.MatrixTable:
+    # NB: the checks run against the localized sample ids of the callset and
+    # rows of the remap table, pass them in to avoid collecting them once more.
     mt = vcf_remap(mt)
-    collected_remap = project_remap_ht.collect()
+    if callset_sample_ids is None:
+        callset_sample_ids = mt.s.collect()
+    if collected_remap is None:
+        collected_remap = project_remap_ht.collect()
     s_dups = [k for k, v in Counter([r.s for r in collected_remap]).items() if v > 1]
     seqr_dups = [
         k for k, v in Counter([r.seqr_id for r in collected_remap]).items() if v > 1
@@ -30,24 +37,27 @@ def remap_sample_ids(
         msg = f'Duplicate s or seqr_id entries in remap file were found. Duplicate s:{s_dups}. Duplicate seqr_id:{seqr_dups}.'
         raise ValueError(msg)
 
-    missing_samples = project_remap_ht.anti_join(mt.cols()).collect()
+    callset_samples = set(callset_sample_ids)
+    missing_samples = [r for r in collected_remap if r.s not in callset_samples]
     remap_count = len(collected_remap)
 
     if len(missing_samples) != 0:
         message = (
-            f'Only {project_remap_ht.semi_join(mt.cols()).count()} out of {remap_count} '
+            f'Only {remap_count - len(missing_samples)} out of {remap_count} '
             'remap IDs matched IDs in the variant callset.\n'
             f"IDs that aren't in the callset: {missing_samples}\n"
-            f'All callset sample IDs:{mt.s.collect()}'
+            f'All callset sample IDs:{callset_sample_ids}'
         )
         if ignore_missing_samples_when_remapping:
             print(message)
         else:
             raise MatrixTableSampleSetError(message, missing_samples)
 
-    mt = mt.annotate_cols(**project_remap_ht[mt.s])
-    remap_expr = hl.cond(hl.is_missing(mt.seqr_id), mt.s, mt.seqr_id)
-    mt = mt.annotate_cols(seqr_id=remap_expr, vcf_id=mt.s)
+    remap_lookup = hl.dict({r.s: r.seqr_id for r in collected_remap})
+    mt = mt.annotate_cols(
+        seqr_id=hl.coalesce(remap_lookup.get(mt.s), mt.s),
+        vcf_id=mt.s,
+    )
     mt = mt.key_cols_by(s=mt.seqr_id)
     print(f'Remapped {remap_count} sample ids...')
     return mt
@@ -55,29 +65,32 @@ def remap_sample_ids(
 
 def subset_samples(
     mt: hl.MatrixTable,
-    sample_subset_ht: hl.Table,
+    sample_subset: set[str],
     ignore_missing_samples_when_subsetting: bool,
+    callset_sample_ids: list[str] | None = None,
 ) -> hl.MatrixTable:
-    subset_count = sample_subset_ht.count()
-    anti_join_ht = sample_subset_ht.anti_join(mt.cols())
-    anti_join_ht_count = anti_join_ht.count()
+    # NB: the checks run against the localized sample ids of the callset,
+    # pass them in to avoid collecting them once more.
+    if callset_sample_ids is None:
+        callset_sample_ids = mt.s.collect()
+    subset_count = len(sample_subset)
+    missing_samples = sorted(sample_subset - set(callset_sample_ids))
     if subset_count == 0:
         message = '0 sample ids found the subset HT, something is probably wrong.'
         raise MatrixTableSampleSetError(message, [])
 
-    if anti_join_ht_count != 0:
-        missing_samples = anti_join_ht.s.collect()
+    if len(missing_samples) != 0:
         message = (
-            f'Only {subset_count - anti_join_ht_count} out of {subset_count} '
+            f'Only {subset_count - len(missing_samples)} out of {subset_count} '
             f'subsetting-table IDs matched IDs in the variant callset.\n'
             f"IDs that aren't in the callset: {missing_samples}\n"
-            f'All callset sample IDs:{mt.s.collect()}'
+            f'All callset sample IDs:{callset_sample_ids}'
         )
         if (
-            subset_count > anti_join_ht_count
+            subset_count > len(missing_samples)
         ) and ignore_missing_samples_when_subsetting:
             print(message)
         else:
             raise MatrixTableSampleSetError(message, missing_samples)
     print(f'Subsetted to {subset_count} sample ids')
-    return mt.semi_join_cols(sample_subset_ht)
+    return mt.filter_cols(hl.literal(sample_subset).contains(mt.s))
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+
+import hail as hl
+
+from v03_pipeline.lib.misc.sample_ids import (
+    MatrixTableSampleSetError,
+    remap_sample_ids,
+    subset_samples,
+)
+
+
+def _mt_from_sample_ids(sample_ids: list[str]) -> hl.MatrixTable:
+    mt = hl.utils.range_matrix_table(n_rows=2, n_cols=len(sample_ids))
+    mt = mt.annotate_cols(s=hl.literal(sample_ids)[mt.col_idx])
+    return mt.key_cols_by('s')
+
+
+def _remap_ht(remap: dict[str, str]) -> hl.Table:
+    return hl.Table.parallelize(
+        [{'s': s, 'seqr_id': seqr_id} for s, seqr_id in remap.items()],
+        hl.tstruct(s=hl.tstr, seqr_id=hl.tstr),
+        key='s',
+    )
+
+
+class SampleIdsTest(unittest.TestCase):
+    def test_remap_sample_ids(self) -> None:
+        mt = _mt_from_sample_ids(['sample_1', 'sample_2'])
+        remap_ht = _remap_ht({'sample_1': 'seqr_1'})
+        mt = remap_sample_ids(mt, remap_ht, False)
+        self.assertListEqual(mt.s.collect(), ['seqr_1', 'sample_2'])
+        self.assertListEqual(mt.vcf_id.collect(), ['sample_1', 'sample_2'])
+
+    def test_remap_sample_ids_collected(self) -> None:
+        # Sample ids and remap rows that are passed in are not collected again.
+        mt = _mt_from_sample_ids(['sample_1', 'sample_2'])
+        remap_ht = _remap_ht({'sample_1': 'seqr_1'})
+        collected_remap = remap_ht.collect()
+        with (
+            patch.object(hl.Table, 'collect', side_effect=AssertionError),
+            patch.object(hl.expr.Expression, 'collect', side_effect=AssertionError),
+        ):
+            mt = remap_sample_ids(
+                mt,
+                remap_ht,
+                False,
+                ['sample_1', 'sample_2'],
+                collected_remap,
+            )
+        self.assertListEqual(mt.s.collect(), ['seqr_1', 'sample_2'])
+
+    def test_remap_sample_ids_missing_samples(self) -> None:
+        mt = _mt_from_sample_ids(['sample_1', 'sample_2'])
+        remap_ht = _remap_ht({'sample_1': 'seqr_1', 'sample_3': 'seqr_3'})
+        with self.assertRaises(MatrixTableSampleSetError) as cm:
+            remap_sample_ids(mt, remap_ht, False)
+        self.assertListEqual(
+            cm.exception.missing_samples,
+            [hl.Struct(s='sample_3', seqr_id='seqr_3')],
+        )
+        self.assertIn(
+            'Only 1 out of 2 remap IDs matched IDs in the variant callset.',
+            str(cm.exception),
+        )
+
+        # The missing samples may be ignored.
+        mt = remap_sample_ids(mt, remap_ht, True)
+        self.assertListEqual(mt.s.collect(), ['seqr_1', 'sample_2'])
+
+    def test_remap_sample_ids_duplicates(self) -> None:
+        mt = _mt_from_sample_ids(['sample_1', 'sample_2'])
+        remap_ht = _remap_ht({'sample_1': 'seqr_1', 'sample_2': 'seqr_1'})
+        with self.assertRaises(ValueError):
+            remap_sample_ids(mt, remap_ht, True)
+
+    def test_subset_samples(self) -> None:
+        mt = _mt_from_sample_ids(['sample_1', 'sample_2', 'sample_3'])
+        mt = subset_samples(mt, {'sample_1', 'sample_3'}, False)
+        self.assertListEqual(mt.s.collect(), ['sample_1', 'sample_3'])
+
+    def test_subset_samples_missing_samples(self) -> None:
+        mt = _mt_from_sample_ids(['sample_1', 'sample_2'])
+        with self.assertRaises(MatrixTableSampleSetError) as cm:
+            subset_samples(mt, {'sample_1', 'sample_4', 'sample_3'}, False)
+        self.assertListEqual(cm.exception.missing_samples, ['sample_3', 'sample_4'])
+        self.assertIn(
+            'Only 1 out of 3 subsetting-table IDs matched IDs in the variant callset.',
+            str(cm.exception),
+        )
+
+        # The missing samples may be ignored, so long as any sample matches.
+        subset_mt = subset_samples(mt, {'sample_1', 'sample_3'}, True)
+        self.assertListEqual(subset_mt.s.collect(), ['sample_1'])
+        with self.assertRaises(MatrixTableSampleSetError):
+            subset_samples(mt, {'sample_3'}, True)
+
+        # An empty subset is always an error.
+        with self.assertRaises(MatrixTableSampleSetError):
+            subset_samples(mt, set(), True)
@@ -1,17 +1,190 @@
+import functools
+
 import hail as hl
 
 from v03_pipeline.lib.model import DatasetType
 
 
+def has_indexed_sample_ids(sample_lookup_ht: hl.Table) -> bool:
+    # When present, per-project sample ids are stored once in the globals
+    # and the rows hold sets of int32 indices into them rather than strings.
+    return 'project_sample_ids' in sample_lookup_ht.globals
+
+
+def has_sample_counts(sample_lookup_ht: hl.Table) -> bool:
+    # When present, each row also holds the number of samples in each of
+    # the sample lookup fields summed over every project, so that the
+    # gt_stats do not have to re-sum the per-project sets.
+    return 'sample_counts' in sample_lookup_ht.row
+
+
+def has_no_call_samples(sample_lookup_ht: hl.Table) -> bool:
+    # When present, a project's hom-ref samples may instead be stored as the
+    # complement: the samples with none of the genotypes in the sample lookup
+    # fields.  For each row and project exactly one of `ref_samples` and
+    # `no_call_samples` is defined, the hom-ref samples then being the project
+    # roster less the samples in every other set.
+    return 'no_call_samples' in sample_lookup_ht.row
+
+
+def decoded_ref_samples(
+    dataset_type: DatasetType,
+    sample_lookup_ht: hl.Table,
+    project_guid: str,
+) -> hl.SetExpression:
+    ref_samples = sample_lookup_ht.ref_samples[project_guid]
+    if (
+        not has_no_call_samples(sample_lookup_ht)
+        or project_guid not in sample_lookup_ht.project_rosters
+    ):
+        return ref_samples
+    return hl.or_else(
+        ref_samples,
+        functools.reduce(
+            lambda sample_ids, field: sample_ids.difference(
+                sample_lookup_ht[field][project_guid],
+            ),
+            [
+                *(
+                    field
+                    for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+                    if field != 'ref_samples'
+                ),
+                'no_call_samples',
+            ],
+            sample_lookup_ht.project_rosters[project_guid],
+        ),
+    )
+
+
+def updated_sample_counts(
+    dataset_type: DatasetType,
+    sample_counts: hl.StructExpression,
+    previous_sample_ids: dict[str, hl.SetExpression | None],
+    sample_ids: dict[str, hl.SetExpression],
+) -> hl.StructExpression:
+    # Applies the change in size of a single project's sets to the running
+    # totals, rather than recomputing them over every project.
+    def n_samples(sample_ids: hl.SetExpression | None) -> hl.Int32Expression:
+        return hl.or_else(hl.len(sample_ids), 0) if sample_ids is not None else 0
+
+    return hl.Struct(
+        **{
+            field: (
+                hl.or_else(sample_counts[field], 0)
+                + n_samples(sample_ids[field])
+                - n_samples(previous_sample_ids[field])
+            )
+            for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+        },
+    )
+
+
+def get_project_sample_ids(
+    sample_lookup_ht: hl.Table,
+    project_guid: str,
+) -> list[str]:
+    if project_guid not in sample_lookup_ht.project_sample_ids.dtype.fields:
+        return []
+    return hl.eval(sample_lookup_ht.project_sample_ids[project_guid])
+
+
+def add_project_sample_ids(
+    sample_lookup_ht: hl.Table,
+    sample_subset_ht: hl.Table,
+    project_guid: str,
+) -> hl.Table:
+    # NB: the project sample ids are append only, so that a sample keeps its
+    # index when it is removed and re-added, and no rows need to be re-indexed.
+    project_sample_ids = get_project_sample_ids(sample_lookup_ht, project_guid)
+    sample_ids = sample_subset_ht.aggregate(hl.agg.collect_as_set(sample_subset_ht.s))
+    return sample_lookup_ht.annotate_globals(
+        project_sample_ids=sample_lookup_ht.project_sample_ids.annotate(
+            **{
+                project_guid: hl.literal(
+                    [
+                        *project_sample_ids,
+                        *sorted(sample_ids - set(project_sample_ids)),
+                    ],
+                    hl.tarray(hl.tstr),
+                ),
+            },
+        ),
+    )
+
+
+def sample_id_set(
+    sample_lookup_ht: hl.Table,
+    sample_ids: set[str],
+    project_guid: str,
+) -> hl.SetExpression:
+    if not has_indexed_sample_ids(sample_lookup_ht):
+        return hl.literal(sample_ids, hl.tset(hl.tstr))
+    return hl.literal(
+        {
+            i
+            for i, sample_id in enumerate(
+                get_project_sample_ids(sample_lookup_ht, project_guid),
+            )
+            if sample_id in sample_ids
+        },
+        hl.tset(hl.tint32),
+    )
+
+
+def set_project_roster(
+    sample_lookup_ht: hl.Table,
+    sample_subset_ht: hl.Table,
+    project_guid: str,
+) -> hl.Table:
+    # NB: every row of the project stored as no-calls is relative to the
+    # project's latest load, as earlier loads are decoded when it is reloaded.
+    sample_ids = sample_subset_ht.aggregate(hl.agg.collect_as_set(sample_subset_ht.s))
+    return sample_lookup_ht.annotate_globals(
+        project_rosters=sample_lookup_ht.project_rosters.annotate(
+            **{project_guid: sample_id_set(sample_lookup_ht, sample_ids, project_guid)},
+        ),
+    )
+
+
 def compute_callset_sample_lookup_ht(
     dataset_type: DatasetType,
     mt: hl.MatrixTable,
+    project_sample_ids: list[str] | None = None,
+    no_call_samples: bool = False,
 ) -> hl.Table:
+    mt = mt.annotate_cols(
+        sample_id=(
+            mt.s
+            if project_sample_ids is None
+            else hl.dict(
+                {sample_id: i for i, sample_id in enumerate(project_sample_ids)},
+            )[mt.s]
+        ),
+    )
     return mt.select_rows(
         **{
-            field: hl.agg.filter(genotype_filter_fn(mt), hl.agg.collect_as_set(mt.s))
+            field: hl.agg.filter(
+                genotype_filter_fn(mt),
+                hl.agg.collect_as_set(mt.sample_id),
+            )
             for field, genotype_filter_fn in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns.items()
         },
+        **(
+            {
+                'no_call_samples': hl.agg.filter(
+                    ~hl.any(
+                        [
+                            hl.or_else(genotype_filter_fn(mt), False)
+                            for genotype_filter_fn in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns.values()
+                        ],
+                    ),
+                    hl.agg.collect_as_set(mt.sample_id),
+                ),
+            }
+            if no_call_samples
+            else {}
+        ),
     ).rows()
 
 
@@ -23,18 +196,58 @@ def filter_callset_sample_ids(
 ) -> hl.Table:
     if hl.eval(~sample_lookup_ht.updates.project_guid.contains(project_guid)):
         return sample_lookup_ht
-    sample_ids = sample_subset_ht.aggregate(hl.agg.collect_as_set(sample_subset_ht.s))
+    sample_ids = sample_id_set(
+        sample_lookup_ht,
+        sample_subset_ht.aggregate(hl.agg.collect_as_set(sample_subset_ht.s)),
+        project_guid,
+    )
+    # NB: the project's hom-ref samples are decoded, as the roster they are
+    # relative to is about to be replaced.
+    previous_sample_ids = {
+        field: sample_lookup_ht[field][project_guid]
+        for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+    }
+    previous_sample_ids['ref_samples'] = decoded_ref_samples(
+        dataset_type,
+        sample_lookup_ht,
+        project_guid,
+    )
+    sample_ids = {
+        field: previous_sample_ids[field].difference(sample_ids)
+        for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+    }
     return sample_lookup_ht.select(
         **{
             field: sample_lookup_ht[field].annotate(
-                **{
-                    project_guid: sample_lookup_ht[field][project_guid].difference(
-                        sample_ids,
-                    ),
-                },
+                **{project_guid: sample_ids[field]},
             )
             for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
         },
+        **(
+            {
+                'no_call_samples': sample_lookup_ht.no_call_samples.annotate(
+                    **{
+                        project_guid: hl.missing(
+                            sample_lookup_ht.no_call_samples[project_guid].dtype,
+                        ),
+                    },
+                ),
+            }
+            if has_no_call_samples(sample_lookup_ht)
+            else {}
+        ),
+        **(
+            {
+                'sample_counts': updated_sample_counts(
+                    dataset_type,
+                    sample_lookup_ht.sample_counts,
+                    previous_sample_ids,
+                    sample_ids,
+                ),
+            }
+            if has_sample_counts(sample_lookup_ht)
+            else {}
+        ),
     )
 
 
@@ -44,27 +257,228 @@ def join_sample_lookup_hts(
     callset_sample_lookup_ht: hl.Table,
     project_guid: str,
 ) -> hl.Table:
+    return join_project_sample_lookup_hts(
+        dataset_type,
+        sample_lookup_ht,
+        {project_guid: callset_sample_lookup_ht},
+    )
+
+
+def join_project_sample_lookup_hts(
+    dataset_type: DatasetType,
+    sample_lookup_ht: hl.Table,
+    callset_sample_lookup_hts: dict[str, hl.Table],
+) -> hl.Table:
+    # The callset sample lookups of every project are zipped together so that
+    # the sample lookup table is joined against once, however many projects
+    # are being loaded.
+    callset_sample_lookup_ht = hl.Table.multi_way_zip_join(
+        [ht.select_globals() for ht in callset_sample_lookup_hts.values()],
+        'callset_samples',
+        'callset_globals',
+    ).select_globals()
+    callset_sample_lookup_ht = callset_sample_lookup_ht.select(
+        callset_samples=hl.Struct(
+            **{
+                project_guid: callset_sample_lookup_ht.callset_samples[i]
+                for i, project_guid in enumerate(callset_sample_lookup_hts)
+            },
+        ),
+    )
     sample_lookup_ht = sample_lookup_ht.join(callset_sample_lookup_ht, 'outer')
     first_field_name = next(
         iter(dataset_type.sample_lookup_table_fields_and_genotype_filter_fns.keys()),
     )
-    empty_entry = hl.Struct(
-        **{
-            project_guid: hl.empty_set(hl.tstr)
-            for project_guid in sample_lookup_ht[first_field_name].dtype.fields
-        },
+    # NB: sample ids are either strings or int32 indices, depending on the encoding.
+    sample_id_type = sample_lookup_ht.callset_samples.dtype.types[0][
+        first_field_name
+    ].element_type
+    fields = {
+        field: hl.or_else(
+            sample_lookup_ht[field],
+            hl.Struct(
+                **{
+                    project_guid: hl.empty_set(sample_id_type)
+                    for project_guid in sample_lookup_ht[field].dtype.fields
+                },
+            ),
+        )
+        for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+    }
+    if has_no_call_samples(sample_lookup_ht):
+        fields['no_call_samples'] = hl.or_else(
+            sample_lookup_ht.no_call_samples,
+            hl.Struct(
+                **{
+                    project_guid: hl.missing(hl.tset(sample_id_type))
+                    for project_guid in sample_lookup_ht.no_call_samples.dtype.fields
+                },
+            ),
+        )
+    if has_sample_counts(sample_lookup_ht):
+        fields['sample_counts'] = sample_lookup_ht.sample_counts
+    for project_guid in callset_sample_lookup_hts:
+        callset_samples = sample_lookup_ht.callset_samples[project_guid]
+        previous_sample_ids = {
+            field: sample_lookup_ht[field].get(project_guid)
+            for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+        }
+        sample_ids = {
+            field: sample_lookup_ht[field]
+            .get(project_guid, hl.empty_set(sample_id_type))
+            .union(callset_samples[field])
+            for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+        }
+        for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns:
+            fields[field] = fields[field].annotate(**{project_guid: sample_ids[field]})
+        if has_no_call_samples(sample_lookup_ht):
+            # The no-calls are stored instead of the hom-ref samples only when
+            # they are fewer, and only when every sample of the project in the
+            # row is from this callset, as the no-calls are relative to its roster.
+            is_no_call_encoded = hl.is_defined(callset_samples) & (
+                hl.len(callset_samples.no_call_samples)
+                < hl.len(sample_ids['ref_samples'])
+            )
+            for previous in previous_sample_ids.values():
+                if previous is not None:
+                    is_no_call_encoded &= hl.or_else(hl.len(previous), 0) == 0
+            fields['ref_samples'] = fields['ref_samples'].annotate(
+                **{
+                    project_guid: hl.or_missing(
+                        ~is_no_call_encoded,
+                        sample_ids['ref_samples'],
+                    ),
+                },
+            )
+            fields['no_call_samples'] = fields['no_call_samples'].annotate(
+                **{
+                    project_guid: hl.or_missing(
+                        is_no_call_encoded,
+                        callset_samples.no_call_samples,
+                    ),
+                },
+            )
+        if has_sample_counts(sample_lookup_ht):
+            fields['sample_counts'] = updated_sample_counts(
+                dataset_type,
+                fields['sample_counts'],
+                previous_sample_ids,
+                sample_ids,
+            )
+    return sample_lookup_ht.select(**fields)
+
+
+def annotate_sample_counts(
+    dataset_type: DatasetType,
+    sample_lookup_ht: hl.Table,
+) -> hl.Table:
+    return sample_lookup_ht.annotate(
+        sample_counts=hl.Struct(
+            **{
+                field: hl.int32(
+                    sum(
+                        (
+                            decoded_ref_samples(
+                                dataset_type,
+                                sample_lookup_ht,
+                                project_guid,
+                            )
+                            if field == 'ref_samples'
+                            else sample_lookup_ht[field][project_guid]
+                        ).length()
+                        for project_guid in sample_lookup_ht[field]
+                    ),
+                )
+                for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+            },
+        ),
     )
-    return sample_lookup_ht.select(
+
+
+def index_sample_ids(
+    dataset_type: DatasetType,
+    sample_lookup_ht: hl.Table,
+) -> hl.Table:
+    # Converts a table storing sets of sample id strings to one storing
+    # sets of indices into per-project sample ids held in the globals.
+    fields = [
+        *dataset_type.sample_lookup_table_fields_and_genotype_filter_fns,
+        *(['no_call_samples'] if has_no_call_samples(sample_lookup_ht) else []),
+    ]
+    project_guids = list(sample_lookup_ht[fields[0]].dtype.fields)
+    project_sample_ids = sample_lookup_ht.aggregate(
+        hl.struct(
+            **{
+                project_guid: hl.agg.explode(
+                    hl.agg.collect_as_set,
+                    hl.flatten(
+                        [
+                            hl.or_else(
+                                hl.array(sample_lookup_ht[field][project_guid]),
+                                hl.empty_array(hl.tstr),
+                            )
+                            for field in fields
+                        ],
+                    ),
+                )
+                for project_guid in project_guids
+            },
+        ),
+    )
+    project_rosters = (
+        hl.eval(sample_lookup_ht.project_rosters)
+        if has_no_call_samples(sample_lookup_ht)
+        else hl.Struct()
+    )
+    project_sample_ids = {
+        project_guid: sorted(
+            project_sample_ids[project_guid] | project_rosters.get(project_guid, set()),
+        )
+        for project_guid in project_guids
+    }
+    project_sample_indices = hl.literal(
+        hl.Struct(
+            **{
+                project_guid: {sample_id: i for i, sample_id in enumerate(sample_ids)}
+                for project_guid, sample_ids in project_sample_ids.items()
+            },
+        ),
+        hl.tstruct(
+            **{
+                project_guid: hl.tdict(hl.tstr, hl.tint32)
+                for project_guid in project_guids
+            },
+        ),
+    )
+    sample_lookup_ht = sample_lookup_ht.annotate(
         **{
-            field: hl.or_else(sample_lookup_ht[field], empty_entry).annotate(
+            field: hl.Struct(
                 **{
-                    project_guid: (
-                        sample_lookup_ht[field]
-                        .get(project_guid, hl.empty_set(hl.tstr))
-                        .union(sample_lookup_ht[f'{field}_1'])
-                    ),
+                    project_guid: sample_lookup_ht[field][project_guid].map(
+                        project_sample_indices[project_guid].get,
+                    )
+                    for project_guid in project_guids
                 },
             )
-            for field in dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
+            for field in fields
         },
     )
+    if has_no_call_samples(sample_lookup_ht):
+        sample_lookup_ht = sample_lookup_ht.annotate_globals(
+            project_rosters=hl.Struct(
+                **{
+                    project_guid: sample_lookup_ht.project_rosters[project_guid].map(
+                        project_sample_indices[project_guid].get,
+                    )
+                    for project_guid in project_rosters
+                },
+            ),
+        )
+    return sample_lookup_ht.annotate_globals(
+        project_sample_ids=hl.literal(
+            hl.Struct(**project_sample_ids),
+            hl.tstruct(
+                **{project_guid: hl.tarray(hl.tstr) for project_guid in project_guids},
+            ),
+        ),
+    )
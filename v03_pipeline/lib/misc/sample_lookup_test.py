@@ -2,10 +2,16 @@ import unittest
 
 import hail as hl
 
+from v03_pipeline.lib.annotations.snv_indel import gt_stats
 from v03_pipeline.lib.misc.sample_lookup import (
+    add_project_sample_ids,
+    annotate_sample_counts,
     compute_callset_sample_lookup_ht,
     filter_callset_sample_ids,
+    index_sample_ids,
+    join_project_sample_lookup_hts,
     join_sample_lookup_hts,
+    set_project_roster,
 )
 from v03_pipeline.lib.model import DatasetType
 
@@ -480,3 +486,479 @@ class SampleLookupTest(unittest.TestCase):
                 ),
             ],
         )
+
+    def test_index_sample_ids(self) -> None:
+        sample_lookup_ht = hl.Table.parallelize(
+            [
+                {
+                    'id': 0,
+                    'ref_samples': hl.Struct(project_1=set()),
+                    'het_samples': hl.Struct(project_1={'b', 'd', 'f'}),
+                    'hom_samples': hl.Struct(project_1={'e'}),
+                },
+                {
+                    'id': 1,
+                    'ref_samples': hl.Struct(project_1={'f'}),
+                    'het_samples': hl.Struct(project_1={'a'}),
+                    'hom_samples': hl.Struct(project_1=set()),
+                },
+            ],
+            hl.tstruct(
+                id=hl.tint32,
+                ref_samples=hl.tstruct(project_1=hl.tset(hl.tstr)),
+                het_samples=hl.tstruct(project_1=hl.tset(hl.tstr)),
+                hom_samples=hl.tstruct(project_1=hl.tset(hl.tstr)),
+            ),
+            key='id',
+            globals=hl.Struct(
+                updates=hl.set([hl.Struct(callset='abc', project_guid='project_1')]),
+            ),
+        )
+        sample_lookup_ht = index_sample_ids(DatasetType.SNV_INDEL, sample_lookup_ht)
+        self.assertEqual(
+            hl.eval(sample_lookup_ht.project_sample_ids),
+            hl.Struct(project_1=['a', 'b', 'd', 'e', 'f']),
+        )
+        self.assertListEqual(
+            sample_lookup_ht.collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    ref_samples=hl.Struct(project_1=set()),
+                    het_samples=hl.Struct(project_1={1, 2, 4}),
+                    hom_samples=hl.Struct(project_1={3}),
+                ),
+                hl.Struct(
+                    id=1,
+                    ref_samples=hl.Struct(project_1={4}),
+                    het_samples=hl.Struct(project_1={0}),
+                    hom_samples=hl.Struct(project_1=set()),
+                ),
+            ],
+        )
+
+        samples_ht = hl.Table.parallelize(
+            [{'s': 'd'}, {'s': 'e'}, {'s': 'f'}, {'s': 'g'}],
+            hl.tstruct(s=hl.tstr),
+            key='s',
+        )
+        sample_lookup_ht = filter_callset_sample_ids(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            samples_ht,
+            'project_1',
+        )
+        sample_lookup_ht = add_project_sample_ids(
+            sample_lookup_ht,
+            samples_ht,
+            'project_1',
+        )
+        self.assertEqual(
+            hl.eval(sample_lookup_ht.project_sample_ids),
+            hl.Struct(project_1=['a', 'b', 'd', 'e', 'f', 'g']),
+        )
+        mt = hl.MatrixTable.from_parts(
+            rows={'id': [1, 2]},
+            cols={'s': ['d', 'e', 'f', 'g']},
+            entries={
+                'GT': [
+                    [
+                        hl.Call([0, 0]),
+                        hl.Call([0, 1]),
+                        hl.Call([1, 1]),
+                        hl.Call([0, 1]),
+                    ],
+                    [
+                        hl.Call([0, 1]),
+                        hl.Call([0, 0]),
+                        hl.Call([0, 0]),
+                        hl.Call([0, 0]),
+                    ],
+                ],
+            },
+        ).key_rows_by('id')
+        callset_sample_lookup_ht = compute_callset_sample_lookup_ht(
+            DatasetType.SNV_INDEL,
+            mt,
+            hl.eval(sample_lookup_ht.project_sample_ids.project_1),
+        )
+        sample_lookup_ht = join_sample_lookup_hts(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            callset_sample_lookup_ht,
+            'project_1',
+        )
+        self.assertListEqual(
+            sample_lookup_ht.collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    ref_samples=hl.Struct(project_1=set()),
+                    het_samples=hl.Struct(project_1={1}),
+                    hom_samples=hl.Struct(project_1=set()),
+                ),
+                hl.Struct(
+                    id=1,
+                    ref_samples=hl.Struct(project_1={2}),
+                    het_samples=hl.Struct(project_1={0, 3, 5}),
+                    hom_samples=hl.Struct(project_1={4}),
+                ),
+                hl.Struct(
+                    id=2,
+                    ref_samples=hl.Struct(project_1={3, 4, 5}),
+                    het_samples=hl.Struct(project_1={2}),
+                    hom_samples=hl.Struct(project_1=set()),
+                ),
+            ],
+        )
+
+    def test_sample_counts(self) -> None:
+        sample_lookup_ht = hl.Table.parallelize(
+            [
+                {
+                    'id': 0,
+                    'ref_samples': hl.Struct(project_1={'a'}, project_2={'x'}),
+                    'het_samples': hl.Struct(project_1={'b', 'c'}, project_2=set()),
+                    'hom_samples': hl.Struct(project_1=set(), project_2={'y'}),
+                },
+                {
+                    'id': 1,
+                    'ref_samples': hl.Struct(project_1=set(), project_2=set()),
+                    'het_samples': hl.Struct(project_1={'a'}, project_2={'x', 'y'}),
+                    'hom_samples': hl.Struct(project_1={'b'}, project_2=set()),
+                },
+            ],
+            hl.tstruct(
+                id=hl.tint32,
+                ref_samples=hl.tstruct(
+                    project_1=hl.tset(hl.tstr),
+                    project_2=hl.tset(hl.tstr),
+                ),
+                het_samples=hl.tstruct(
+                    project_1=hl.tset(hl.tstr),
+                    project_2=hl.tset(hl.tstr),
+                ),
+                hom_samples=hl.tstruct(
+                    project_1=hl.tset(hl.tstr),
+                    project_2=hl.tset(hl.tstr),
+                ),
+            ),
+            key='id',
+            globals=hl.Struct(
+                updates=hl.set(
+                    [
+                        hl.Struct(callset='abc', project_guid='project_1'),
+                        hl.Struct(callset='abc', project_guid='project_2'),
+                    ],
+                ),
+            ),
+        )
+        sample_lookup_ht = annotate_sample_counts(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+        )
+        self.assertListEqual(
+            sample_lookup_ht.sample_counts.collect(),
+            [
+                hl.Struct(ref_samples=2, het_samples=2, hom_samples=1),
+                hl.Struct(ref_samples=0, het_samples=3, hom_samples=1),
+            ],
+        )
+        samples_ht = hl.Table.parallelize(
+            [{'s': 'b'}, {'s': 'c'}],
+            hl.tstruct(s=hl.tstr),
+            key='s',
+        )
+        sample_lookup_ht = filter_callset_sample_ids(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            samples_ht,
+            'project_1',
+        )
+        callset_sample_lookup_ht = hl.Table.parallelize(
+            [
+                {
+                    'id': 0,
+                    'ref_samples': {'b'},
+                    'het_samples': set(),
+                    'hom_samples': {'c'},
+                },
+                {
+                    'id': 2,
+                    'ref_samples': set(),
+                    'het_samples': {'b', 'c'},
+                    'hom_samples': set(),
+                },
+            ],
+            hl.tstruct(
+                id=hl.tint32,
+                ref_samples=hl.tset(hl.tstr),
+                het_samples=hl.tset(hl.tstr),
+                hom_samples=hl.tset(hl.tstr),
+            ),
+            key='id',
+        )
+        sample_lookup_ht = join_sample_lookup_hts(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            callset_sample_lookup_ht,
+            'project_1',
+        )
+        self.assertListEqual(
+            sample_lookup_ht.sample_counts.collect(),
+            [
+                hl.Struct(ref_samples=3, het_samples=0, hom_samples=2),
+                hl.Struct(ref_samples=0, het_samples=3, hom_samples=0),
+                hl.Struct(ref_samples=0, het_samples=2, hom_samples=0),
+            ],
+        )
+        self.assertListEqual(
+            sample_lookup_ht.sample_counts.collect(),
+            annotate_sample_counts(
+                DatasetType.SNV_INDEL,
+                sample_lookup_ht,
+            ).sample_counts.collect(),
+        )
+
+    def test_no_call_samples(self) -> None:
+        sample_lookup_ht = hl.Table.parallelize(
+            [],
+            hl.tstruct(
+                id=hl.tint32,
+                ref_samples=hl.tstruct(),
+                het_samples=hl.tstruct(),
+                hom_samples=hl.tstruct(),
+                no_call_samples=hl.tstruct(),
+            ),
+            key='id',
+            globals=hl.Struct(
+                updates=hl.empty_set(hl.tstruct(callset=hl.tstr, project_guid=hl.tstr)),
+                project_rosters=hl.Struct(),
+            ),
+        )
+        mt = hl.MatrixTable.from_parts(
+            rows={'id': [0, 1, 2]},
+            cols={'s': ['a', 'b', 'c', 'd']},
+            entries={
+                'GT': [
+                    [
+                        hl.Call([0, 0]),
+                        hl.Call([0, 0]),
+                        hl.Call([0, 0]),
+                        hl.missing(hl.tcall),
+                    ],
+                    [
+                        hl.Call([0, 1]),
+                        hl.Call([0, 0]),
+                        hl.Call([0, 0]),
+                        hl.Call([0, 0]),
+                    ],
+                    [
+                        hl.missing(hl.tcall),
+                        hl.missing(hl.tcall),
+                        hl.missing(hl.tcall),
+                        hl.Call([1, 1]),
+                    ],
+                ],
+            },
+        ).key_rows_by('id')
+        sample_lookup_ht = set_project_roster(sample_lookup_ht, mt.cols(), 'project_1')
+        sample_lookup_ht = join_sample_lookup_hts(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            compute_callset_sample_lookup_ht(
+                DatasetType.SNV_INDEL,
+                mt,
+                no_call_samples=True,
+            ),
+            'project_1',
+        )
+        sample_lookup_ht = sample_lookup_ht.annotate_globals(
+            updates={hl.Struct(callset='abc', project_guid='project_1')},
+        )
+        self.assertListEqual(
+            sample_lookup_ht.collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    ref_samples=hl.Struct(project_1=None),
+                    het_samples=hl.Struct(project_1=set()),
+                    hom_samples=hl.Struct(project_1=set()),
+                    no_call_samples=hl.Struct(project_1={'d'}),
+                ),
+                hl.Struct(
+                    id=1,
+                    ref_samples=hl.Struct(project_1=None),
+                    het_samples=hl.Struct(project_1={'a'}),
+                    hom_samples=hl.Struct(project_1=set()),
+                    no_call_samples=hl.Struct(project_1=set()),
+                ),
+                hl.Struct(
+                    id=2,
+                    ref_samples=hl.Struct(project_1=set()),
+                    het_samples=hl.Struct(project_1=set()),
+                    hom_samples=hl.Struct(project_1={'d'}),
+                    no_call_samples=hl.Struct(project_1=None),
+                ),
+            ],
+        )
+        self.assertListEqual(
+            sample_lookup_ht.select(
+                gt_stats=gt_stats(sample_lookup_ht, sample_lookup_ht),
+            ).gt_stats.collect(),
+            [
+                hl.Struct(AC=0, AN=6, AF=0.0, hom=0),
+                hl.Struct(AC=1, AN=8, AF=0.125, hom=0),
+                hl.Struct(AC=2, AN=2, AF=1.0, hom=1),
+            ],
+        )
+
+        # Reloading samples of the project decodes its hom-ref samples.
+        samples_ht = hl.Table.parallelize(
+            [{'s': 'a'}, {'s': 'b'}],
+            hl.tstruct(s=hl.tstr),
+            key='s',
+        )
+        sample_lookup_ht = filter_callset_sample_ids(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            samples_ht,
+            'project_1',
+        )
+        self.assertListEqual(
+            sample_lookup_ht.select('ref_samples', 'no_call_samples').collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    ref_samples=hl.Struct(project_1={'c'}),
+                    no_call_samples=hl.Struct(project_1=None),
+                ),
+                hl.Struct(
+                    id=1,
+                    ref_samples=hl.Struct(project_1={'c', 'd'}),
+                    no_call_samples=hl.Struct(project_1=None),
+                ),
+                hl.Struct(
+                    id=2,
+                    ref_samples=hl.Struct(project_1=set()),
+                    no_call_samples=hl.Struct(project_1=None),
+                ),
+            ],
+        )
+
+    def test_join_project_sample_lookup_hts(self) -> None:
+        sample_lookup_ht = hl.Table.parallelize(
+            [
+                {
+                    'id': 0,
+                    'ref_samples': hl.Struct(project_1={'a'}),
+                    'het_samples': hl.Struct(project_1=set()),
+                    'hom_samples': hl.Struct(project_1={'b'}),
+                },
+            ],
+            hl.tstruct(
+                id=hl.tint32,
+                ref_samples=hl.tstruct(project_1=hl.tset(hl.tstr)),
+                het_samples=hl.tstruct(project_1=hl.tset(hl.tstr)),
+                hom_samples=hl.tstruct(project_1=hl.tset(hl.tstr)),
+            ),
+            key='id',
+        )
+        sample_lookup_ht = annotate_sample_counts(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+        )
+        callset_sample_lookup_hts = {
+            project_guid: hl.Table.parallelize(
+                rows,
+                hl.tstruct(
+                    id=hl.tint32,
+                    ref_samples=hl.tset(hl.tstr),
+                    het_samples=hl.tset(hl.tstr),
+                    hom_samples=hl.tset(hl.tstr),
+                ),
+                key='id',
+            )
+            for project_guid, rows in [
+                (
+                    'project_1',
+                    [
+                        {
+                            'id': 1,
+                            'ref_samples': {'c'},
+                            'het_samples': set(),
+                            'hom_samples': set(),
+                        },
+                    ],
+                ),
+                (
+                    'project_2',
+                    [
+                        {
+                            'id': 0,
+                            'ref_samples': set(),
+                            'het_samples': {'d'},
+                            'hom_samples': set(),
+                        },
+                        {
+                            'id': 2,
+                            'ref_samples': {'d'},
+                            'het_samples': set(),
+                            'hom_samples': set(),
+                        },
+                    ],
+                ),
+            ]
+        }
+        batched_ht = join_project_sample_lookup_hts(
+            DatasetType.SNV_INDEL,
+            sample_lookup_ht,
+            callset_sample_lookup_hts,
+        )
+        sequential_ht = sample_lookup_ht
+        for project_guid, callset_sample_lookup_ht in callset_sample_lookup_hts.items():
+            sequential_ht = join_sample_lookup_hts(
+                DatasetType.SNV_INDEL,
+                sequential_ht,
+                callset_sample_lookup_ht,
+                project_guid,
+            )
+        self.assertListEqual(batched_ht.collect(), sequential_ht.collect())
+        self.assertListEqual(
+            batched_ht.collect(),
+            [
+                hl.Struct(
+                    id=0,
+                    ref_samples=hl.Struct(project_1={'a'}, project_2=set()),
+                    het_samples=hl.Struct(project_1=set(), project_2={'d'}),
+                    hom_samples=hl.Struct(project_1={'b'}, project_2=set()),
+                    sample_counts=hl.Struct(
+                        ref_samples=1,
+                        het_samples=1,
+                        hom_samples=1,
+                    ),
+                ),
+                hl.Struct(
+                    id=1,
+                    ref_samples=hl.Struct(project_1={'c'}, project_2=set()),
+                    het_samples=hl.Struct(project_1=set(), project_2=set()),
+                    hom_samples=hl.Struct(project_1=set(), project_2=set()),
+                    sample_counts=hl.Struct(
+                        ref_samples=1,
+                        het_samples=0,
+                        hom_samples=0,
+                    ),
+                ),
+                hl.Struct(
+                    id=2,
+                    ref_samples=hl.Struct(project_1=set(), project_2={'d'}),
+                    het_samples=hl.Struct(project_1=set(), project_2=set()),
+                    hom_samples=hl.Struct(project_1=set(), project_2=set()),
+                    sample_counts=hl.Struct(
+                        ref_samples=1,
+                        het_samples=0,
+                        hom_samples=0,
+                    ),
+                ),
+            ],
+        )
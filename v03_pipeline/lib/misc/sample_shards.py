@@ -0,0 +1,47 @@
+import hail as hl
+
+
+def shard_samples(mt: hl.MatrixTable, samples_per_shard: int) -> hl.Table:
+    # Localizes the entries into one array field per block of samples, so that
+    # reading the entries of a block does not decode the entries of the others.
+    # The globals hold the columns of each shard and the shard of each sample.
+    sample_ids = mt.s.collect()
+    shard_starts = range(0, len(sample_ids), samples_per_shard)
+    ht = mt.localize_entries('entries', 'cols')
+    ht = ht.select(
+        *mt.row_value,
+        **{
+            f'entries_{i}': ht.entries[start : start + samples_per_shard]
+            for i, start in enumerate(shard_starts)
+        },
+    )
+    ht = ht.annotate_globals(
+        col_key=list(mt.col_key),
+        col_shards=[
+            ht.cols[start : start + samples_per_shard] for start in shard_starts
+        ],
+        sample_shards={s: i // samples_per_shard for i, s in enumerate(sample_ids)},
+    )
+    return ht.drop('cols')
+
+
+def read_sample_shards(path: str, sample_ids: set[str]) -> hl.MatrixTable:
+    # Reads the samples of the shards holding any of sample_ids, only the
+    # entries of those shards are decoded.
+    ht = hl.read_table(path)
+    sample_shards = hl.eval(ht.sample_shards)
+    # NB: the first shard stands in when none of the samples are in the
+    # callset, so that the missing samples are reported when subsetting.
+    shard_idxs = sorted(
+        {sample_shards[s] for s in sample_ids if s in sample_shards},
+    ) or [0]
+    ht = ht.select(
+        *(field for field in ht.row_value if not field.startswith('entries_')),
+        entries=hl.flatten([ht[f'entries_{i}'] for i in shard_idxs]),
+    )
+    ht = ht.annotate_globals(
+        cols=hl.flatten([ht.col_shards[i] for i in shard_idxs]),
+    )
+    col_key = hl.eval(ht.col_key)
+    ht = ht.drop('col_key', 'col_shards', 'sample_shards')
+    return ht._unlocalize_entries('entries', 'cols', col_key)  # noqa: SLF001
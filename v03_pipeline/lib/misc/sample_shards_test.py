@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import hail as hl
+
+from v03_pipeline.lib.misc.sample_shards import read_sample_shards, shard_samples
+
+
+class SampleShardsTest(unittest.TestCase):
+    def test_shard_and_read_samples(self) -> None:
+        mt = hl.utils.range_matrix_table(n_rows=4, n_cols=5)
+        mt = mt.annotate_rows(filters=hl.set([hl.str(mt.row_idx)]))
+        mt = mt.annotate_cols(s=hl.str(mt.col_idx))
+        mt = mt.key_cols_by('s')
+        mt = mt.annotate_entries(x=mt.row_idx * 10 + mt.col_idx)
+        ht = shard_samples(mt, 2)
+        self.assertDictEqual(
+            hl.eval(ht.sample_shards),
+            {'0': 0, '1': 0, '2': 1, '3': 1, '4': 2},
+        )
+        self.assertListEqual(
+            list(ht.row_value),
+            ['filters', 'entries_0', 'entries_1', 'entries_2'],
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'sample_shards.ht')
+            ht.write(path)
+
+            mt = read_sample_shards(path, {'1', '4', 'missing_sample'})
+            self.assertListEqual(mt.s.collect(), ['0', '1', '4'])
+            self.assertListEqual(mt.col_idx.collect(), [0, 1, 4])
+            self.assertListEqual(
+                mt.x.collect(),
+                [x + row_idx * 10 for row_idx in range(4) for x in [0, 1, 4]],
+            )
+            self.assertListEqual(
+                mt.filters.collect(),
+                [{str(row_idx)} for row_idx in range(4)],
+            )
+
+            # Samples missing from the callset fall back to the first shard.
+            mt = read_sample_shards(path, {'missing_sample'})
+            self.assertListEqual(mt.s.collect(), ['0', '1'])
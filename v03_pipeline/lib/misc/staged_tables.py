@@ -0,0 +1,215 @@
+import functools
+import os
+import shutil
+import uuid
+
+import hail as hl
+from google.cloud import storage
+
+from v03_pipeline.lib.misc.partitions import (
+    read_json,
+    rows_spec_path,
+    table_spec_path,
+    write_json,
+)
+from v03_pipeline.lib.model import Env
+
+JOURNAL_FILE = '_journal.json'
+STAGING_DIR = '_staging'
+
+
+@functools.cache
+def gcs_client() -> storage.Client:
+    return storage.Client()
+
+
+def gcs_blob(path: str) -> storage.Blob:
+    bucket_name, blob_name = path.removeprefix('gs://').split('/', 1)
+    return gcs_client().bucket(bucket_name).blob(blob_name)
+
+
+def list_files(path: str) -> list[str]:
+    # The paths of the files under path, relative to it.
+    if path.startswith('gs://'):
+        bucket_name, prefix = path.removeprefix('gs://').split('/', 1)
+        prefix = f'{prefix.rstrip("/")}/'
+        return [
+            blob.name.removeprefix(prefix)
+            for blob in gcs_client().list_blobs(bucket_name, prefix=prefix)
+        ]
+    return [
+        os.path.relpath(os.path.join(root, file_name), path)
+        for root, _, file_names in os.walk(path)
+        for file_name in file_names
+    ]
+
+
+def move_file(src_path: str, dst_path: str) -> None:
+    # NB: a file that is already moved is skipped, so that an interrupted
+    # commit may be repeated.
+    if src_path.startswith('gs://'):
+        src_blob, dst_blob = gcs_blob(src_path), gcs_blob(dst_path)
+        if not src_blob.exists():
+            return
+        src_blob.bucket.copy_blob(src_blob, dst_blob.bucket, dst_blob.name)
+        src_blob.delete()
+        return
+    if not os.path.exists(src_path):
+        return
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    os.replace(src_path, dst_path)
+
+
+def remove_file(path: str) -> None:
+    if path.startswith('gs://'):
+        blob = gcs_blob(path)
+        if blob.exists():
+            blob.delete()
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def remove_tree(path: str) -> None:
+    if path.startswith('gs://'):
+        for file_path in list_files(path):
+            remove_file(os.path.join(path, file_path))
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def staged_table_path(destination_path: str) -> str:
+    # NB: staged beside the files it replaces, so that committing it moves
+    # files within a bucket rather than copying them across buckets.
+    suffix = os.path.splitext(destination_path.rstrip('/'))[1]
+    return os.path.join(destination_path, STAGING_DIR, f'{uuid.uuid4()}{suffix}')
+
+
+def commit_order(file_path: str) -> tuple[bool, bool, bool, str]:
+    # The manifests are moved after the files they refer to, the table
+    # manifest and success marker last of all.
+    return (
+        file_path == '_SUCCESS',
+        file_path == 'metadata.json.gz',
+        os.path.basename(file_path) == 'metadata.json.gz',
+        file_path,
+    )
+
+
+def has_pending_commit(destination_path: str) -> bool:
+    return hl.hadoop_exists(os.path.join(destination_path, JOURNAL_FILE))
+
+
+def commit_staged_table(
+    staged_path: str,
+    destination_path: str,
+    kept_files: list[str] | None = None,
+) -> None:
+    # Replaces the table at destination_path with the table staged at
+    # staged_path, keeping only the kept_files of the destination that the
+    # staged manifests still refer to.
+    #
+    # NB: the journal is the commit point.  It lists every file to move and
+    # remove and is written in a single write, so that a commit interrupted
+    # after it is completed by recover_staged_table rather than leaving a
+    # table with mismatched manifests.
+    staged_files = sorted(list_files(staged_path), key=commit_order)
+    replaced_files = set(staged_files) | set(kept_files or [])
+    write_json(
+        os.path.join(destination_path, JOURNAL_FILE),
+        {
+            'staged_path': staged_path,
+            'staged_files': staged_files,
+            'removed_files': sorted(
+                file_path
+                for file_path in list_files(destination_path)
+                if file_path not in replaced_files
+                and file_path != JOURNAL_FILE
+                and not file_path.startswith(f'{STAGING_DIR}/')
+            ),
+        },
+    )
+    recover_staged_table(destination_path)
+
+
+def recover_staged_table(destination_path: str) -> None:
+    # Completes a commit interrupted after its journal was written, and
+    # discards a table staged without being committed.
+    journal_path = os.path.join(destination_path, JOURNAL_FILE)
+    if hl.hadoop_exists(journal_path):
+        journal = read_json(journal_path)
+        for file_path in journal['staged_files']:
+            move_file(
+                os.path.join(journal['staged_path'], file_path),
+                os.path.join(destination_path, file_path),
+            )
+        for file_path in journal['removed_files']:
+            remove_file(os.path.join(destination_path, file_path))
+        remove_file(journal_path)
+    remove_tree(os.path.join(destination_path, STAGING_DIR))
+
+
+def write_touched_partitions(
+    ht: hl.Table,
+    destination_path: str,
+    extents: list[hl.Interval],
+    touched_partition_idxs: list[int],
+) -> bool:
+    # Replaces the touched partitions of the table at destination_path with
+    # the rows of ht.  The new partitions are staged with manifests that refer
+    # to them and to the untouched partition files, which are kept in place.
+    #
+    # Returns False without modifying destination_path if the new partitions
+    # cannot be spliced into the existing table (e.g. the row type changed).
+    checkpoint_path = os.path.join(Env.HAIL_TMPDIR, f'{uuid.uuid4()}.ht')
+    staged_path = staged_table_path(destination_path)
+    ht.write(checkpoint_path)
+    hl.read_table(
+        checkpoint_path,
+        _intervals=[extents[i] for i in touched_partition_idxs],
+    ).write(staged_path)
+    remove_tree(checkpoint_path)
+
+    table_spec = read_json(table_spec_path(destination_path))
+    rows_spec = read_json(rows_spec_path(destination_path))
+    staged_table_spec = read_json(table_spec_path(staged_path))
+    staged_rows_spec = read_json(rows_spec_path(staged_path))
+    if (
+        table_spec['table_type'] != staged_table_spec['table_type']
+        or any(
+            rows_spec[field] != staged_rows_spec[field]
+            for field in ['_key', '_codecSpec', '_indexSpec']
+        )
+        or len(staged_rows_spec['_partFiles']) != len(touched_partition_idxs)
+    ):
+        remove_tree(staged_path)
+        return False
+
+    partition_counts = table_spec['components']['partition_counts']['counts']
+    staged_partition_counts = staged_table_spec['components']['partition_counts'][
+        'counts'
+    ]
+    for staged_i, i in enumerate(touched_partition_idxs):
+        rows_spec['_partFiles'][i] = staged_rows_spec['_partFiles'][staged_i]
+        rows_spec['_jRangeBounds'][i] = staged_rows_spec['_jRangeBounds'][staged_i]
+        partition_counts[i] = staged_partition_counts[staged_i]
+    write_json(rows_spec_path(staged_path), rows_spec)
+    write_json(
+        table_spec_path(staged_path),
+        {**staged_table_spec, 'components': table_spec['components']},
+    )
+
+    # NB: part file names are unique, so the files of a kept partition are
+    # those that contain its name (the part file, its index and checksums).
+    kept_part_files = set(rows_spec['_partFiles']) - set(
+        staged_rows_spec['_partFiles'],
+    )
+    commit_staged_table(
+        staged_path,
+        destination_path,
+        kept_files=[
+            file_path
+            for file_path in list_files(destination_path)
+            if any(part_file in file_path for part_file in kept_part_files)
+        ],
+    )
+    return True
@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hail as hl
+
+from v03_pipeline.lib.misc import staged_tables
+from v03_pipeline.lib.misc.partitions import (
+    partition_extents,
+    read_json,
+    rows_spec_path,
+    touched_partition_indices,
+)
+from v03_pipeline.lib.misc.staged_tables import (
+    commit_staged_table,
+    has_pending_commit,
+    recover_staged_table,
+    staged_table_path,
+    write_touched_partitions,
+)
+
+
+def part_file_names(path: str) -> set[str]:
+    # NB: local hail tables carry hidden checksum files beside their parts.
+    return {
+        file_name
+        for file_name in os.listdir(os.path.join(path, 'rows', 'parts'))
+        if not file_name.startswith('.')
+    }
+
+
+class StagedTablesTest(unittest.TestCase):
+    def test_commit_staged_table(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            destination_path = os.path.join(temp_dir, 'test.ht')
+            hl.utils.range_table(10, n_partitions=2).write(destination_path)
+            staged_path = staged_table_path(destination_path)
+            hl.utils.range_table(20, n_partitions=3).write(staged_path)
+            commit_staged_table(staged_path, destination_path)
+            self.assertFalse(has_pending_commit(destination_path))
+            self.assertFalse(
+                os.path.exists(os.path.join(destination_path, '_staging')),
+            )
+            ht = hl.read_table(destination_path)
+            self.assertEqual(ht.n_partitions(), 3)
+            self.assertEqual(ht.count(), 20)
+            self.assertEqual(
+                len(part_file_names(destination_path)),
+                3,
+            )
+
+    def test_recover_staged_table(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            destination_path = os.path.join(temp_dir, 'test.ht')
+            hl.utils.range_table(10, n_partitions=2).write(destination_path)
+
+            # A table staged without being committed is discarded.
+            staged_path = staged_table_path(destination_path)
+            hl.utils.range_table(20, n_partitions=3).write(staged_path)
+            recover_staged_table(destination_path)
+            self.assertFalse(os.path.exists(staged_path))
+            self.assertEqual(hl.read_table(destination_path).count(), 10)
+
+            # A commit interrupted after its journal is rolled forward.
+            staged_path = staged_table_path(destination_path)
+            hl.utils.range_table(20, n_partitions=3).write(staged_path)
+            move_file = staged_tables.move_file
+            moved_files = []
+
+            def interrupted_move_file(src_path: str, dst_path: str) -> None:
+                if len(moved_files) == 3:  # noqa: PLR2004
+                    raise RuntimeError
+                moved_files.append(src_path)
+                move_file(src_path, dst_path)
+
+            with self.assertRaises(RuntimeError), patch.object(
+                staged_tables,
+                'move_file',
+                interrupted_move_file,
+            ):
+                commit_staged_table(staged_path, destination_path)
+            self.assertTrue(has_pending_commit(destination_path))
+            recover_staged_table(destination_path)
+            self.assertFalse(has_pending_commit(destination_path))
+            ht = hl.read_table(destination_path)
+            self.assertEqual(ht.n_partitions(), 3)
+            self.assertEqual(ht.count(), 20)
+
+    def test_write_touched_partitions(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.ht')
+            ht = hl.utils.range_table(100, n_partitions=10)
+            ht = ht.annotate(
+                locus=hl.locus('chr1', ht.idx + 1, reference_genome='GRCh38'),
+                alleles=['A', 'C'],
+                x=ht.idx,
+            )
+            ht = ht.key_by('locus', 'alleles').select('idx', 'x')
+            ht = ht.annotate_globals(updates=hl.set(['a']))
+            ht.write(path)
+            part_files = read_json(rows_spec_path(path))['_partFiles']
+
+            keys_ht = hl.Table.parallelize(
+                [
+                    {'locus': hl.Locus('chr1', 16, 'GRCh38'), 'alleles': ['A', 'C']},
+                    {'locus': hl.Locus('chr1', 56, 'GRCh38'), 'alleles': ['A', 'G']},
+                    {'locus': hl.Locus('chr1', 151, 'GRCh38'), 'alleles': ['A', 'C']},
+                ],
+                hl.tstruct(
+                    locus=hl.tlocus('GRCh38'),
+                    alleles=hl.tarray(hl.tstr),
+                ),
+                key=['locus', 'alleles'],
+            )
+            extents = partition_extents(path, keys_ht)
+            touched_partition_idxs = touched_partition_indices(extents, keys_ht)
+            ht = hl.read_table(
+                path,
+                _intervals=[extents[i] for i in touched_partition_idxs],
+            )
+            ht = ht.union(
+                keys_ht.annotate(idx=keys_ht.locus.position - 1, x=-1),
+            ).distinct()
+            ht = ht.annotate(x=ht.x + 1000)
+            ht = ht.annotate_globals(updates=ht.updates.add('b'))
+
+            # A commit interrupted part way through is completed on recovery.
+            move_file = staged_tables.move_file
+            moved_files = []
+
+            def interrupted_move_file(src_path: str, dst_path: str) -> None:
+                if len(moved_files) == 2:  # noqa: PLR2004
+                    raise RuntimeError
+                moved_files.append(src_path)
+                move_file(src_path, dst_path)
+
+            with self.assertRaises(RuntimeError), patch.object(
+                staged_tables,
+                'move_file',
+                interrupted_move_file,
+            ):
+                write_touched_partitions(ht, path, extents, touched_partition_idxs)
+            recover_staged_table(path)
+
+            new_part_files = read_json(rows_spec_path(path))['_partFiles']
+            self.assertListEqual(
+                [
+                    part_file == new_part_file
+                    for part_file, new_part_file in zip(
+                        part_files,
+                        new_part_files,
+                        strict=True,
+                    )
+                ],
+                [True, False, True, True, True, False, True, True, True, False],
+            )
+            self.assertSetEqual(part_file_names(path), set(new_part_files))
+            ht = hl.read_table(path)
+            self.assertEqual(ht.count(), 102)
+            self.assertEqual(hl.eval(ht.updates), {'a', 'b'})
+            self.assertListEqual(
+                ht.filter(ht.x >= 999).idx.collect(),  # noqa: PLR2004
+                [
+                    *range(10, 20),
+                    *range(50, 56),
+                    55,
+                    *range(56, 60),
+                    *range(90, 100),
+                    150,
+                ],
+            )
@@ -2,7 +2,10 @@ import hail as hl
 
 from v03_pipeline.lib.model import ReferenceGenome, SampleType
 
+MIN_PARTITIONS_FOR_SAMPLED_VALIDATION = 100
 MIN_ROWS_PER_CONTIG = 100
+SAMPLED_PARTITION_FRACTION = 0.02
+SAMPLED_VALIDATION_MARGIN = 3
 SAMPLE_TYPE_MATCH_THRESHOLD = 0.3
 
 
@@ -10,12 +13,11 @@ class SeqrValidationError(Exception):
     pass
 
 
-def validate_expected_contig_frequency(
-    mt: hl.MatrixTable,
+def check_expected_contig_frequency(
+    rows_per_contig: dict[str, int],
     reference_genome: ReferenceGenome,
     min_rows_per_contig: int = MIN_ROWS_PER_CONTIG,
 ) -> None:
-    rows_per_contig = mt.aggregate_rows(hl.agg.counter(mt.locus.contig))
     missing_contigs = (
         reference_genome.standard_contigs
         - reference_genome.optional_contigs
@@ -35,28 +37,15 @@ def validate_expected_contig_frequency(
             raise SeqrValidationError(msg)
 
 
-def validate_sample_type(
-    mt: hl.MatrixTable,
-    coding_and_noncoding_variants_ht: hl.Table,
+def check_sample_type(
+    coding_fraction: float,
+    noncoding_fraction: float,
     reference_genome: ReferenceGenome,
     sample_type: SampleType,
     sample_type_match_threshold: float = SAMPLE_TYPE_MATCH_THRESHOLD,
 ) -> None:
-    coding_variants_ht = coding_and_noncoding_variants_ht.filter(
-        coding_and_noncoding_variants_ht.coding,
-    )
-    has_coding = (
-        mt.semi_join_rows(coding_variants_ht).count_rows() / coding_variants_ht.count()
-        >= sample_type_match_threshold
-    )
-    noncoding_variants_ht = coding_and_noncoding_variants_ht.filter(
-        coding_and_noncoding_variants_ht.noncoding,
-    )
-    has_noncoding = (
-        mt.semi_join_rows(noncoding_variants_ht).count_rows()
-        / noncoding_variants_ht.count()
-        >= sample_type_match_threshold
-    )
+    has_coding = coding_fraction >= sample_type_match_threshold
+    has_noncoding = noncoding_fraction >= sample_type_match_threshold
     if not has_coding and not has_noncoding:
         msg = f"Genome version validation error: dataset specified as {reference_genome.value} but doesn't contain the expected number of common {reference_genome.value} variants"
         raise SeqrValidationError(msg)
@@ -69,3 +58,170 @@ def validate_sample_type(
     if has_noncoding and has_coding and sample_type != SampleType.WGS:
         msg = 'Sample type validation error: dataset sample-type is specified as WES but appears to be WGS because it contains many common non-coding variants'
         raise SeqrValidationError(msg)
+
+
+def coding_and_noncoding_totals(
+    coding_and_noncoding_variants_ht: hl.Table,
+) -> tuple[int, int]:
+    # The cached query table stores its totals in its globals, tables written
+    # before they were added are counted instead.
+    if {'n_coding', 'n_noncoding'} <= set(coding_and_noncoding_variants_ht.globals):
+        return hl.eval(
+            (
+                coding_and_noncoding_variants_ht.n_coding,
+                coding_and_noncoding_variants_ht.n_noncoding,
+            ),
+        )
+    return coding_and_noncoding_variants_ht.aggregate(
+        (
+            hl.agg.count_where(coding_and_noncoding_variants_ht.coding),
+            hl.agg.count_where(coding_and_noncoding_variants_ht.noncoding),
+        ),
+    )
+
+
+def validate_expected_contig_frequency(
+    mt: hl.MatrixTable,
+    reference_genome: ReferenceGenome,
+    min_rows_per_contig: int = MIN_ROWS_PER_CONTIG,
+) -> None:
+    rows_per_contig = mt.aggregate_rows(hl.agg.counter(mt.locus.contig))
+    check_expected_contig_frequency(
+        rows_per_contig,
+        reference_genome,
+        min_rows_per_contig,
+    )
+
+
+def validate_sample_type(
+    mt: hl.MatrixTable,
+    coding_and_noncoding_variants_ht: hl.Table,
+    reference_genome: ReferenceGenome,
+    sample_type: SampleType,
+    sample_type_match_threshold: float = SAMPLE_TYPE_MATCH_THRESHOLD,
+) -> None:
+    validate_callset(
+        mt,
+        coding_and_noncoding_variants_ht,
+        reference_genome,
+        sample_type,
+        min_rows_per_contig=None,
+        sample_type_match_threshold=sample_type_match_threshold,
+    )
+
+
+def validate_callset(
+    mt: hl.MatrixTable,
+    coding_and_noncoding_variants_ht: hl.Table,
+    reference_genome: ReferenceGenome,
+    sample_type: SampleType,
+    min_rows_per_contig: int | None = MIN_ROWS_PER_CONTIG,
+    sample_type_match_threshold: float = SAMPLE_TYPE_MATCH_THRESHOLD,
+) -> None:
+    # Computes the statistics of every validation in a single pass over the
+    # callset rows, the contig frequency is not checked if min_rows_per_contig
+    # is None.
+    stats = callset_validation_stats(mt, coding_and_noncoding_variants_ht)
+    if min_rows_per_contig is not None:
+        check_expected_contig_frequency(
+            stats.rows_per_contig,
+            reference_genome,
+            min_rows_per_contig,
+        )
+    n_coding, n_noncoding = coding_and_noncoding_totals(
+        coding_and_noncoding_variants_ht,
+    )
+    check_sample_type(
+        stats.n_coding / n_coding,
+        stats.n_noncoding / n_noncoding,
+        reference_genome,
+        sample_type,
+        sample_type_match_threshold,
+    )
+
+
+def callset_validation_stats(
+    mt: hl.MatrixTable,
+    coding_and_noncoding_variants_ht: hl.Table,
+) -> hl.Struct:
+    variant = coding_and_noncoding_variants_ht[mt.row_key]
+    return mt.aggregate_rows(
+        hl.struct(
+            rows_per_contig=hl.agg.counter(mt.locus.contig),
+            n_coding=hl.agg.count_where(variant.coding),
+            n_noncoding=hl.agg.count_where(variant.noncoding),
+        ),
+    )
+
+
+def sampled_partition_indices(
+    shard_n_partitions: list[int],
+    sampled_partition_fraction: float = SAMPLED_PARTITION_FRACTION,
+) -> list[int]:
+    # Evenly spaced within each shard of the callset, so that the sample is the
+    # same on every run.  A shard too small for the spacing contributes its
+    # middle partition, so that every shard is sampled.
+    if sum(shard_n_partitions) < MIN_PARTITIONS_FOR_SAMPLED_VALIDATION:
+        return []
+    step = max(round(1 / sampled_partition_fraction), 1)
+    indices = []
+    offset = 0
+    for n_partitions in shard_n_partitions:
+        if n_partitions:
+            indices.extend(
+                offset + i
+                for i in (
+                    range(step // 2, n_partitions, step)
+                    if n_partitions > step // 2
+                    else [n_partitions // 2]
+                )
+            )
+        offset += n_partitions
+    return indices
+
+
+def validate_sampled_callset(
+    sampled_mt: hl.MatrixTable,
+    sampled_fraction: float,
+    coding_and_noncoding_variants_ht: hl.Table,
+    reference_genome: ReferenceGenome,
+    sample_type: SampleType,
+    min_rows_per_contig: int = MIN_ROWS_PER_CONTIG,
+) -> None:
+    # Estimates the validation statistics of the callset from a sample of its
+    # partitions and fails only when an estimate is clearly outside of the
+    # thresholds, the full callset validation remains authoritative.  A contig
+    # missing from the sample may lie between the sampled partitions, so the
+    # expected contigs are checked for their minimum rows in total.
+    stats = callset_validation_stats(sampled_mt, coding_and_noncoding_variants_ht)
+    expected_contigs = (
+        reference_genome.standard_contigs - reference_genome.optional_contigs
+    )
+    estimated_rows = (
+        sum(
+            count
+            for contig, count in stats.rows_per_contig.items()
+            if contig in expected_contigs
+        )
+        / sampled_fraction
+    )
+    min_rows = len(expected_contigs) * min_rows_per_contig
+    if estimated_rows < min_rows / SAMPLED_VALIDATION_MARGIN:
+        msg = f'Expected contigs have an estimated {round(estimated_rows)} rows, which is lower than expected minimum count {min_rows}.'
+        raise SeqrValidationError(msg)
+    n_coding, n_noncoding = coding_and_noncoding_totals(
+        coding_and_noncoding_variants_ht,
+    )
+    coding_fraction = stats.n_coding / sampled_fraction / n_coding
+    noncoding_fraction = stats.n_noncoding / sampled_fraction / n_noncoding
+    if all(
+        fraction >= SAMPLE_TYPE_MATCH_THRESHOLD * SAMPLED_VALIDATION_MARGIN
+        or fraction <= SAMPLE_TYPE_MATCH_THRESHOLD / SAMPLED_VALIDATION_MARGIN
+        for fraction in [coding_fraction, noncoding_fraction]
+    ):
+        check_sample_type(
+            coding_fraction,
+            noncoding_fraction,
+            reference_genome,
+            sample_type,
+        )
@@ -4,8 +4,11 @@ import hail as hl
 
 from v03_pipeline.lib.misc.validation import (
     SeqrValidationError,
+    sampled_partition_indices,
+    validate_callset,
     validate_expected_contig_frequency,
     validate_sample_type,
+    validate_sampled_callset,
 )
 from v03_pipeline.lib.model import ReferenceGenome, SampleType
 
@@ -236,3 +239,142 @@ class ValidationTest(unittest.TestCase):
             ReferenceGenome.GRCh38,
             SampleType.WGS,
         )
+
+    def test_validate_callset(self) -> None:
+        mt = _mt_from_contigs(ReferenceGenome.GRCh38.standard_contigs)
+        coding_and_noncoding_variants_ht = hl.Table.parallelize(
+            [
+                {
+                    'locus': hl.Locus(
+                        contig=contig,
+                        position=1,
+                        reference_genome='GRCh38',
+                    ),
+                    'coding': contig == 'chr1',
+                    'noncoding': contig == 'chr2',
+                }
+                for contig in ['chr1', 'chr2']
+            ],
+            hl.tstruct(
+                locus=hl.tlocus('GRCh38'),
+                coding=hl.tbool,
+                noncoding=hl.tbool,
+            ),
+            key='locus',
+        )
+        self.assertIsNone(
+            validate_callset(
+                mt,
+                coding_and_noncoding_variants_ht,
+                ReferenceGenome.GRCh38,
+                SampleType.WGS,
+                min_rows_per_contig=1,
+            ),
+        )
+        self.assertRaisesRegex(
+            SeqrValidationError,
+            'which is lower than expected minimum count',
+            validate_callset,
+            mt,
+            coding_and_noncoding_variants_ht,
+            ReferenceGenome.GRCh38,
+            SampleType.WGS,
+            min_rows_per_contig=2,
+        )
+
+        # The totals stored in the globals are used in place of counting.
+        self.assertRaisesRegex(
+            SeqrValidationError,
+            'specified as WGS but appears to be WES',
+            validate_callset,
+            mt,
+            coding_and_noncoding_variants_ht.annotate_globals(
+                n_coding=1,
+                n_noncoding=10,
+            ),
+            ReferenceGenome.GRCh38,
+            SampleType.WGS,
+            min_rows_per_contig=1,
+        )
+
+    def test_sampled_partition_indices(self) -> None:
+        self.assertListEqual(sampled_partition_indices([10]), [])
+        self.assertListEqual(sampled_partition_indices([200]), [25, 75, 125, 175])
+        self.assertListEqual(
+            sampled_partition_indices([200], sampled_partition_fraction=0.5),
+            list(range(1, 200, 2)),
+        )
+        # A shard smaller than the spacing is still sampled.
+        self.assertListEqual(
+            sampled_partition_indices([190, 10, 0, 20]),
+            [25, 75, 125, 175, 195, 210],
+        )
+
+    def test_validate_sampled_callset(self) -> None:
+        mt = _mt_from_contigs(ReferenceGenome.GRCh38.standard_contigs)
+        coding_and_noncoding_variants_ht = hl.Table.parallelize(
+            [
+                {
+                    'locus': hl.Locus(
+                        contig=contig,
+                        position=1,
+                        reference_genome='GRCh38',
+                    ),
+                    'coding': contig == 'chr1',
+                    'noncoding': contig == 'chr2',
+                }
+                for contig in ['chr1', 'chr2']
+            ],
+            hl.tstruct(
+                locus=hl.tlocus('GRCh38'),
+                coding=hl.tbool,
+                noncoding=hl.tbool,
+            ),
+            key='locus',
+        ).annotate_globals(n_coding=4, n_noncoding=4)
+
+        # A quarter of the callset, with every estimate clearly a WGS callset.
+        self.assertIsNone(
+            validate_sampled_callset(
+                mt,
+                0.25,
+                coding_and_noncoding_variants_ht,
+                ReferenceGenome.GRCh38,
+                SampleType.WGS,
+                min_rows_per_contig=1,
+            ),
+        )
+        self.assertRaisesRegex(
+            SeqrValidationError,
+            'specified as WES but appears to be WGS',
+            validate_sampled_callset,
+            mt,
+            0.25,
+            coding_and_noncoding_variants_ht,
+            ReferenceGenome.GRCh38,
+            SampleType.WES,
+            min_rows_per_contig=1,
+        )
+        self.assertRaisesRegex(
+            SeqrValidationError,
+            'Expected contigs have an estimated 92 rows',
+            validate_sampled_callset,
+            mt,
+            0.25,
+            coding_and_noncoding_variants_ht,
+            ReferenceGenome.GRCh38,
+            SampleType.WGS,
+            min_rows_per_contig=20,
+        )
+
+        # Estimates near the threshold are left to the full validation.
+        self.assertIsNone(
+            validate_sampled_callset(
+                mt,
+                1,
+                coding_and_noncoding_variants_ht,
+                ReferenceGenome.GRCh38,
+                SampleType.WES,
+                min_rows_per_contig=1,
+            ),
+        )
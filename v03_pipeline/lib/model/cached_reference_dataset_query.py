@@ -96,7 +96,23 @@ def gnomad_coding_and_noncoding_variants(
             >= CONSEQUENCE_TERM_RANK_LOOKUP['downstream_gene_variant']
         ),
     )
-    return ht.filter(ht.coding | ht.noncoding)
+    ht = ht.filter(ht.coding | ht.noncoding)
+    # NB: stored so that callset validation never counts the table.  The counts
+    # are left unlocalized, so they are computed when the table is written,
+    # but in their own pass over the query: writing the table re-reads the
+    # filtered contig of the source table once more to aggregate its globals.
+    # That pass is paid once per cached query rather than once per callset.
+    totals = ht.aggregate(
+        hl.struct(
+            n_coding=hl.agg.count_where(ht.coding),
+            n_noncoding=hl.agg.count_where(ht.noncoding),
+        ),
+        _localize=False,
+    )
+    return ht.annotate_globals(
+        n_coding=totals.n_coding,
+        n_noncoding=totals.n_noncoding,
+    )
 
 
 def high_af_variants(
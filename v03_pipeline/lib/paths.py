@@ -41,6 +41,21 @@ def _v03_reference_data_prefix(
     )
 
 
+def binned_interval_reference_dataset_collection_path(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+) -> str:
+    return os.path.join(
+        _v03_reference_data_prefix(
+            ReferenceDatasetCollection.INTERVAL.access_control,
+            reference_genome,
+        ),
+        dataset_type.value,
+        'reference_datasets',
+        f'{ReferenceDatasetCollection.INTERVAL.value}_binned.ht',
+    )
+
+
 def family_table_path(
     reference_genome: ReferenceGenome,
     dataset_type: DatasetType,
@@ -60,7 +75,7 @@ def family_table_path(
 def imported_callset_path(
     reference_genome: ReferenceGenome,
     dataset_type: DatasetType,
-    callset_path: str,
+    callset_fingerprint: str,
 ) -> str:
     return os.path.join(
         _v03_pipeline_prefix(
@@ -69,7 +84,23 @@ def imported_callset_path(
             dataset_type,
         ),
         'imported_callsets',
-        f'{hashlib.sha256(callset_path.encode("utf8")).hexdigest()}.mt',
+        f'{callset_fingerprint}.mt',
+    )
+
+
+def imported_callset_sample_shards_path(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+    callset_fingerprint: str,
+) -> str:
+    return os.path.join(
+        _v03_pipeline_prefix(
+            Env.LOADING_DATASETS,
+            reference_genome,
+            dataset_type,
+        ),
+        'imported_callsets',
+        f'{callset_fingerprint}_sample_shards.ht',
     )
 
 
@@ -90,6 +121,20 @@ def metadata_for_run_path(
     )
 
 
+def partition_intervals_path(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+) -> str:
+    return os.path.join(
+        _v03_pipeline_prefix(
+            Env.HAIL_SEARCH_DATA,
+            reference_genome,
+            dataset_type,
+        ),
+        'partition_intervals.json',
+    )
+
+
 def project_table_path(
     reference_genome: ReferenceGenome,
     dataset_type: DatasetType,
@@ -106,6 +151,40 @@ def project_table_path(
     )
 
 
+def project_relatedness_check_table_path(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+    callset_path: str,
+    project_guid: str,
+) -> str:
+    return os.path.join(
+        _v03_pipeline_prefix(
+            Env.LOADING_DATASETS,
+            reference_genome,
+            dataset_type,
+        ),
+        'relatedness_check',
+        project_guid,
+        f'{hashlib.sha256(callset_path.encode("utf8")).hexdigest()}.ht',
+    )
+
+
+def qc_genotypes_path(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+    callset_path: str,
+) -> str:
+    return os.path.join(
+        _v03_pipeline_prefix(
+            Env.LOADING_DATASETS,
+            reference_genome,
+            dataset_type,
+        ),
+        'qc_genotypes',
+        f'{hashlib.sha256(callset_path.encode("utf8")).hexdigest()}.mt',
+    )
+
+
 def relatedness_check_table_path(
     reference_genome: ReferenceGenome,
     dataset_type: DatasetType,
@@ -224,3 +303,17 @@ def variant_annotations_table_path(
         ),
         'annotations.ht',
     )
+
+
+def variant_annotations_keys_table_path(
+    reference_genome: ReferenceGenome,
+    dataset_type: DatasetType,
+) -> str:
+    return os.path.join(
+        _v03_pipeline_prefix(
+            Env.HAIL_SEARCH_DATA,
+            reference_genome,
+            dataset_type,
+        ),
+        'annotations_keys.ht',
+    )
@@ -8,16 +8,22 @@ from v03_pipeline.lib.model import (
     ReferenceGenome,
 )
 from v03_pipeline.lib.paths import (
+    binned_interval_reference_dataset_collection_path,
     family_table_path,
     imported_callset_path,
+    imported_callset_sample_shards_path,
     metadata_for_run_path,
+    partition_intervals_path,
+    project_relatedness_check_table_path,
     project_table_path,
+    qc_genotypes_path,
     relatedness_check_table_path,
     remapped_and_subsetted_callset_path,
     sample_lookup_table_path,
     sex_check_table_path,
     valid_cached_reference_dataset_query_path,
     valid_reference_dataset_collection_path,
+    variant_annotations_keys_table_path,
     variant_annotations_table_path,
 )
 
@@ -33,6 +39,15 @@ class TestPaths(unittest.TestCase):
             '/seqr-reference-data/v03/GRCh38/SNV_INDEL/cached_reference_dataset_queries/clinvar_path_variants.ht',
         )
 
+    def test_binned_interval_reference_dataset_collection_path(self) -> None:
+        self.assertEqual(
+            binned_interval_reference_dataset_collection_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+            ),
+            '/seqr-reference-data/v03/GRCh38/SNV_INDEL/reference_datasets/interval_binned.ht',
+        )
+
     def test_family_table_path(self) -> None:
         self.assertEqual(
             family_table_path(
@@ -112,6 +127,16 @@ class TestPaths(unittest.TestCase):
             '/seqr-loading-temp/v03/GRCh38/SNV_INDEL/relatedness_check/ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd.ht',
         )
 
+    def test_qc_genotypes_path(self) -> None:
+        self.assertEqual(
+            qc_genotypes_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+                'gs://abc.efg/callset.vcf.gz',
+            ),
+            '/seqr-loading-temp/v03/GRCh38/SNV_INDEL/qc_genotypes/ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd.mt',
+        )
+
     def test_metadata_for_run_path(self) -> None:
         self.assertEqual(
             metadata_for_run_path(
@@ -131,6 +156,15 @@ class TestPaths(unittest.TestCase):
             '/hail-search-data/v03/GRCh38/GCNV/annotations.ht',
         )
 
+    def test_variant_annotations_keys_table_path(self) -> None:
+        self.assertEqual(
+            variant_annotations_keys_table_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+            ),
+            '/hail-search-data/v03/GRCh38/SNV_INDEL/annotations_keys.ht',
+        )
+
     def test_remapped_and_subsetted_callset_path(self) -> None:
         self.assertEqual(
             remapped_and_subsetted_callset_path(
@@ -156,7 +190,37 @@ class TestPaths(unittest.TestCase):
             imported_callset_path(
                 ReferenceGenome.GRCh38,
                 DatasetType.SNV_INDEL,
-                'gs://abc.efg/callset.vcf.gz',
+                'ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd',
             ),
             '/seqr-loading-temp/v03/GRCh38/SNV_INDEL/imported_callsets/ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd.mt',
         )
+
+    def test_imported_callset_sample_shards_path(self) -> None:
+        self.assertEqual(
+            imported_callset_sample_shards_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+                'ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd',
+            ),
+            '/seqr-loading-temp/v03/GRCh38/SNV_INDEL/imported_callsets/ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd_sample_shards.ht',
+        )
+
+    def test_project_relatedness_check_table_path(self) -> None:
+        self.assertEqual(
+            project_relatedness_check_table_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+                'gs://abc.efg/callset.vcf.gz',
+                'R0111_tgg_bblanken_wes',
+            ),
+            '/seqr-loading-temp/v03/GRCh38/SNV_INDEL/relatedness_check/R0111_tgg_bblanken_wes/ead56bb177a5de24178e1e622ce1d8beb3f8892bdae1c925d22ca0af4013d6dd.ht',
+        )
+
+    def test_partition_intervals_path(self) -> None:
+        self.assertEqual(
+            partition_intervals_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+            ),
+            '/hail-search-data/v03/GRCh38/SNV_INDEL/partition_intervals.json',
+        )
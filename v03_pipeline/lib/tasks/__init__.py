@@ -1,3 +1,6 @@
+from v03_pipeline.lib.tasks.migrate_sample_lookup_table import (
+    MigrateSampleLookupTableTask,
+)
 from v03_pipeline.lib.tasks.update_project_table import UpdateProjectTableTask
 from v03_pipeline.lib.tasks.update_sample_lookup_table import (
     UpdateSampleLookupTableTask,
@@ -7,11 +10,16 @@ from v03_pipeline.lib.tasks.update_variant_annotations_table_with_new_samples im
 )
 from v03_pipeline.lib.tasks.write_family_table import WriteFamilyTableTask
 from v03_pipeline.lib.tasks.write_metadata_for_run import WriteMetadataForRunTask
+from v03_pipeline.lib.tasks.write_project_family_tables import (
+    WriteProjectFamilyTablesTask,
+)
 
 __all__ = [
+    'MigrateSampleLookupTableTask',
     'UpdateProjectTableTask',
     'UpdateSampleLookupTableTask',
     'UpdateVariantAnnotationsTableWithNewSamplesTask',
-    'WriteMetadataForRunTask',
     'WriteFamilyTableTask',
+    'WriteMetadataForRunTask',
+    'WriteProjectFamilyTablesTask',
 ]
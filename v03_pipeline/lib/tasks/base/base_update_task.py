@@ -2,6 +2,7 @@ import hail as hl
 import luigi
 
 from v03_pipeline.lib.misc.io import write
+from v03_pipeline.lib.misc.staged_tables import has_pending_commit, recover_staged_table
 from v03_pipeline.lib.model import DatasetType, Env, ReferenceGenome, SampleType
 from v03_pipeline.lib.tasks.files import GCSorLocalFolderTarget
 
@@ -10,12 +11,29 @@ class BaseUpdateTask(luigi.Task):
     reference_genome = luigi.EnumParameter(enum=ReferenceGenome)
     dataset_type = luigi.EnumParameter(enum=DatasetType)
     sample_type = luigi.EnumParameter(enum=SampleType)
+    # NB: non-positional so that downstream tasks constructing this task
+    # positionally are unaffected, select it per task through the luigi config.
+    single_pass_write = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Estimate the partition count up front and write the table once.',
+    )
+    resumable_write = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Record written partitions so that a retried write resumes from them.',
+    )
 
     def output(self) -> luigi.Target:
         raise NotImplementedError
 
     def complete(self) -> bool:
-        return GCSorLocalFolderTarget(self.output().path).exists()
+        # NB: a table with a pending commit is completed by the next run.
+        return GCSorLocalFolderTarget(
+            self.output().path,
+        ).exists() and not has_pending_commit(self.output().path)
 
     def init_hail(self):
         # Need to use the GCP bucket as temp storage for very large callset joins
@@ -26,12 +44,26 @@ class BaseUpdateTask(luigi.Task):
 
     def run(self) -> None:
         self.init_hail()
+        recover_staged_table(self.output().path)
+        partition_intervals = self.output_partition_intervals()
         if not self.output().exists():
             ht = self.initialize_table()
         else:
-            ht = hl.read_table(self.output().path)
+            ht = hl.read_table(self.output().path, _intervals=partition_intervals)
         ht = self.update_table(ht)
-        write(ht, self.output().path)
+        write(
+            ht,
+            self.output().path,
+            self.single_pass_write,
+            resumable=self.resumable_write,
+            partition_intervals=partition_intervals,
+            resumable_input_paths=[
+                target.path for target in luigi.task.flatten(self.input())
+            ],
+        )
+
+    def output_partition_intervals(self) -> list[hl.Interval] | None:
+        return None
 
     def initialize_table(self) -> hl.Table:
         raise NotImplementedError
@@ -1,6 +1,17 @@
 import hail as hl
 import luigi
 
+from v03_pipeline.lib.misc.io import (
+    B_PER_MB,
+    MB_PER_PARTITION,
+    compute_hail_n_partitions,
+    file_size_bytes,
+)
+from v03_pipeline.lib.misc.partitions import (
+    compute_partition_intervals,
+    read_partition_intervals,
+    write_partition_intervals,
+)
 from v03_pipeline.lib.model import ReferenceDatasetCollection
 from v03_pipeline.lib.paths import (
     valid_reference_dataset_collection_path,
@@ -47,3 +58,35 @@ class BaseVariantAnnotationsTableTask(BaseUpdateTask):
 
     def update_table(self, ht: hl.Table) -> hl.Table:
         return ht
+
+    def output_partition_intervals(self) -> list[hl.Interval] | None:
+        return read_partition_intervals(self.reference_genome, self.dataset_type)
+
+    def write_partition_intervals(self) -> None:
+        # The partition intervals shared by the tables of the dataset type are
+        # derived from the annotations table, the largest of them, and are
+        # recomputed once its partitions have grown to twice the target size.
+        if (
+            'locus'
+            not in self.dataset_type.table_key_type(self.reference_genome).fields
+        ):
+            return
+        size_b = file_size_bytes(self.output().path)
+        partition_intervals = read_partition_intervals(
+            self.reference_genome,
+            self.dataset_type,
+        )
+        if (
+            partition_intervals
+            and size_b / len(partition_intervals) / B_PER_MB <= 2 * MB_PER_PARTITION
+        ):
+            return
+        write_partition_intervals(
+            self.reference_genome,
+            self.dataset_type,
+            compute_partition_intervals(
+                hl.read_table(self.output().path),
+                max(compute_hail_n_partitions(size_b), 1),
+                self.reference_genome,
+            ),
+        )
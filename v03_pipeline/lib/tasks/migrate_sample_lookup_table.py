@@ -0,0 +1,38 @@
+import hail as hl
+import luigi
+
+from v03_pipeline.lib.misc.sample_lookup import (
+    annotate_sample_counts,
+    has_indexed_sample_ids,
+    has_sample_counts,
+    index_sample_ids,
+)
+from v03_pipeline.lib.paths import sample_lookup_table_path
+from v03_pipeline.lib.tasks.base.base_update_task import BaseUpdateTask
+from v03_pipeline.lib.tasks.files import GCSorLocalTarget, HailTableTask
+
+
+class MigrateSampleLookupTableTask(BaseUpdateTask):
+    def output(self) -> luigi.Target:
+        return GCSorLocalTarget(
+            sample_lookup_table_path(
+                self.reference_genome,
+                self.dataset_type,
+            ),
+        )
+
+    def complete(self) -> bool:
+        if not super().complete():
+            return False
+        ht = hl.read_table(self.output().path)
+        return has_indexed_sample_ids(ht) and has_sample_counts(ht)
+
+    def requires(self) -> luigi.Task:
+        return HailTableTask(self.output().path)
+
+    def update_table(self, ht: hl.Table) -> hl.Table:
+        if not has_indexed_sample_ids(ht):
+            ht = index_sample_ids(self.dataset_type, ht)
+        if not has_sample_counts(ht):
+            ht = annotate_sample_counts(self.dataset_type, ht)
+        return ht
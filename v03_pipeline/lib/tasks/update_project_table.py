@@ -5,7 +5,9 @@ from v03_pipeline.lib.annotations.fields import get_fields
 from v03_pipeline.lib.misc.sample_entries import (
     filter_callset_entries,
     globalize_sample_ids,
+    has_sparse_entries,
     join_entries_hts,
+    sparsify_entries,
 )
 from v03_pipeline.lib.paths import project_table_path
 from v03_pipeline.lib.tasks.base.base_update_task import BaseUpdateTask
@@ -36,6 +38,12 @@ class UpdateProjectTableTask(BaseUpdateTask):
         default=False,
         description='Is this a fully joint-called callset.',
     )
+    sparse_entries = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Store only carrier entries, tagged with their sample index, in a new table.',
+    )
 
     def output(self) -> luigi.Target:
         return GCSorLocalTarget(
@@ -106,6 +114,12 @@ class UpdateProjectTableTask(BaseUpdateTask):
             callset_ht.entries.any(self.dataset_type.sample_entries_filter_fn),
         )
         callset_ht = globalize_sample_ids(callset_ht)
+        # NB: the layout of an existing table is kept regardless of the parameter.
+        if has_sparse_entries(ht) or ('entries' not in ht.row and self.sparse_entries):
+            callset_ht = sparsify_entries(
+                callset_ht,
+                self.dataset_type.sample_entries_filter_fn,
+            )
         # HACK: steal the type from callset_ht when ht is empty.
         # This was the least gross way
         if 'entries' not in ht.row_value:
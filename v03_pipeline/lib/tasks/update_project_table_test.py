@@ -101,3 +101,92 @@ class UpdateProjectTableTaskTest(MockedDatarootTestCase):
                 ),
             ],
         )
+
+    def test_update_project_table_task_sparse_entries(self) -> None:
+        worker = luigi.worker.Worker()
+        upt_task = UpdateProjectTableTask(
+            reference_genome=ReferenceGenome.GRCh38,
+            dataset_type=DatasetType.SNV_INDEL,
+            sample_type=SampleType.WGS,
+            callset_path=TEST_VCF,
+            project_guid='R0113_test_project',
+            project_remap_path=TEST_REMAP,
+            project_pedigree_path=TEST_PEDIGREE_3,
+            validate=False,
+            sparse_entries=True,
+        )
+        worker.add(upt_task)
+        worker.run()
+        self.assertTrue(upt_task.complete())
+        ht = hl.read_table(upt_task.output().path)
+        self.assertEqual(
+            hl.eval(ht.sample_ids),
+            ['HG00731_1', 'HG00732_1', 'HG00733_1'],
+        )
+        self.assertTrue(
+            ht.aggregate(
+                hl.agg.all(ht.entries.all(lambda e: e.GT.is_non_ref())),
+            ),
+        )
+        self.assertCountEqual(
+            ht.collect()[:2],
+            [
+                hl.Struct(
+                    locus=hl.Locus(
+                        contig='chr1',
+                        position=876499,
+                        reference_genome='GRCh38',
+                    ),
+                    alleles=['A', 'G'],
+                    filters=set(),
+                    entries=[
+                        hl.Struct(
+                            GQ=21,
+                            AB=1.0,
+                            DP=7,
+                            GT=hl.Call(alleles=[1, 1], phased=False),
+                            sample_idx=0,
+                        ),
+                        hl.Struct(
+                            GQ=24,
+                            AB=1.0,
+                            DP=8,
+                            GT=hl.Call(alleles=[1, 1], phased=False),
+                            sample_idx=1,
+                        ),
+                        hl.Struct(
+                            GQ=12,
+                            AB=1.0,
+                            DP=4,
+                            GT=hl.Call(alleles=[1, 1], phased=False),
+                            sample_idx=2,
+                        ),
+                    ],
+                ),
+                hl.Struct(
+                    locus=hl.Locus(
+                        contig='chr1',
+                        position=878314,
+                        reference_genome='GRCh38',
+                    ),
+                    alleles=['G', 'C'],
+                    filters=set(),
+                    entries=[
+                        hl.Struct(
+                            GQ=30,
+                            AB=0.3333333333333333,
+                            DP=3,
+                            GT=hl.Call(alleles=[0, 1], phased=False),
+                            sample_idx=0,
+                        ),
+                        hl.Struct(
+                            GQ=61,
+                            AB=0.6,
+                            DP=5,
+                            GT=hl.Call(alleles=[0, 1], phased=False),
+                            sample_idx=2,
+                        ),
+                    ],
+                ),
+            ],
+        )
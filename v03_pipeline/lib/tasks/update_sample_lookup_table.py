@@ -1,10 +1,16 @@
 import hail as hl
 import luigi
 
+from v03_pipeline.lib.misc.partitions import read_partition_intervals
 from v03_pipeline.lib.misc.sample_lookup import (
+    add_project_sample_ids,
     compute_callset_sample_lookup_ht,
     filter_callset_sample_ids,
-    join_sample_lookup_hts,
+    get_project_sample_ids,
+    has_indexed_sample_ids,
+    has_no_call_samples,
+    join_project_sample_lookup_hts,
+    set_project_roster,
 )
 from v03_pipeline.lib.paths import sample_lookup_table_path
 from v03_pipeline.lib.tasks.base.base_update_task import BaseUpdateTask
@@ -31,6 +37,24 @@ class UpdateSampleLookupTableTask(BaseUpdateTask):
         default=True,
         parsing=luigi.BoolParameter.EXPLICIT_PARSING,
     )
+    index_sample_ids = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Store sample ids once per project and index into them on each row.',
+    )
+    track_sample_counts = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Maintain per-row sample counts summed over every project.',
+    )
+    encode_no_calls = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Store no-call samples in place of hom-ref samples where fewer.',
+    )
 
     def output(self) -> luigi.Target:
         return GCSorLocalTarget(
@@ -80,6 +104,11 @@ class UpdateSampleLookupTableTask(BaseUpdateTask):
             )
         ]
 
+    def output_partition_intervals(self) -> list[hl.Interval] | None:
+        # NB: the sample lookup table is joined row for row with the
+        # annotations table, so is written against its partition intervals.
+        return read_partition_intervals(self.reference_genome, self.dataset_type)
+
     def initialize_table(self) -> hl.Table:
         key_type = self.dataset_type.table_key_type(self.reference_genome)
         return hl.Table.parallelize(
@@ -90,35 +119,68 @@ class UpdateSampleLookupTableTask(BaseUpdateTask):
                     field: hl.tstruct()
                     for field in self.dataset_type.sample_lookup_table_fields_and_genotype_filter_fns
                 },
+                **(
+                    {
+                        'sample_counts': hl.tstruct(
+                            **dict.fromkeys(
+                                self.dataset_type.sample_lookup_table_fields_and_genotype_filter_fns,
+                                hl.tint32,
+                            ),
+                        ),
+                    }
+                    if self.track_sample_counts
+                    else {}
+                ),
+                **({'no_call_samples': hl.tstruct()} if self.encode_no_calls else {}),
             ),
             key=key_type.fields,
             globals=hl.Struct(
                 updates=hl.empty_set(hl.tstruct(callset=hl.tstr, project_guid=hl.tstr)),
+                **(
+                    {'project_sample_ids': hl.Struct()} if self.index_sample_ids else {}
+                ),
+                **({'project_rosters': hl.Struct()} if self.encode_no_calls else {}),
             ),
         )
 
     def update_table(self, ht: hl.Table) -> hl.Table:
+        callset_sample_lookup_hts = {}
         for i, project_guid in enumerate(self.project_guids):
-            callset_mt = hl.read_matrix_table(self.input()[i].path)
+            callset_mt = hl.read_matrix_table(
+                self.input()[i].path,
+                _intervals=read_partition_intervals(
+                    self.reference_genome,
+                    self.dataset_type,
+                ),
+            )
             ht = filter_callset_sample_ids(
                 self.dataset_type,
                 ht,
                 callset_mt.cols(),
                 project_guid,
             )
-            callset_sample_lookup_ht = compute_callset_sample_lookup_ht(
+            project_sample_ids = None
+            if has_indexed_sample_ids(ht):
+                ht = add_project_sample_ids(ht, callset_mt.cols(), project_guid)
+                project_sample_ids = get_project_sample_ids(ht, project_guid)
+            if has_no_call_samples(ht):
+                ht = set_project_roster(ht, callset_mt.cols(), project_guid)
+            callset_sample_lookup_hts[project_guid] = compute_callset_sample_lookup_ht(
                 self.dataset_type,
                 callset_mt,
+                project_sample_ids,
+                has_no_call_samples(ht),
             )
-            ht = join_sample_lookup_hts(
-                self.dataset_type,
-                ht,
-                callset_sample_lookup_ht,
-                project_guid,
-            )
-            ht = ht.select_globals(
-                updates=ht.updates.add(
-                    hl.Struct(callset=self.callset_path, project_guid=project_guid),
-                ),
-            )
-        return ht
+        ht = join_project_sample_lookup_hts(
+            self.dataset_type,
+            ht,
+            callset_sample_lookup_hts,
+        )
+        return ht.annotate_globals(
+            updates=ht.updates.union(
+                {
+                    hl.Struct(callset=self.callset_path, project_guid=project_guid)
+                    for project_guid in self.project_guids
+                },
+            ),
+        )
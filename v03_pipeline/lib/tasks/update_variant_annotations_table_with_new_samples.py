@@ -6,16 +6,30 @@ import luigi
 
 from v03_pipeline.lib.annotations.enums import annotate_enums
 from v03_pipeline.lib.annotations.fields import get_fields
+from v03_pipeline.lib.misc.interval_bins import annotate_interval_bins
+from v03_pipeline.lib.misc.io import write
+from v03_pipeline.lib.misc.partitions import (
+    partition_extents,
+    read_partition_intervals,
+    touched_partition_indices,
+)
+from v03_pipeline.lib.misc.staged_tables import (
+    recover_staged_table,
+    write_touched_partitions,
+)
 from v03_pipeline.lib.model import ReferenceDatasetCollection
 from v03_pipeline.lib.paths import (
+    binned_interval_reference_dataset_collection_path,
     remapped_and_subsetted_callset_path,
     sample_lookup_table_path,
     valid_reference_dataset_collection_path,
+    variant_annotations_keys_table_path,
 )
 from v03_pipeline.lib.reference_data.gencode.mapping_gene_ids import load_gencode
 from v03_pipeline.lib.tasks.base.base_variant_annotations_table import (
     BaseVariantAnnotationsTableTask,
 )
+from v03_pipeline.lib.tasks.files import GCSorLocalFolderTarget
 from v03_pipeline.lib.tasks.update_sample_lookup_table import (
     UpdateSampleLookupTableTask,
 )
@@ -26,6 +40,26 @@ from v03_pipeline.lib.vep import run_vep
 
 GENCODE_RELEASE = 42
 VARIANTS_PER_VEP_PARTITION = 20e3
+POINT_LOOKUP_MAX_GAP = 100
+
+
+def merge_loci(loci: set[hl.Locus], max_gap: int) -> list[hl.Interval]:
+    # Sorts the loci and merges those within max_gap bases of each other into
+    # ranges, so that a cluster of new variants is a single index lookup.
+    intervals = []
+    for locus in sorted(loci, key=lambda locus: locus.global_position()):
+        if (
+            intervals
+            and intervals[-1][1].contig == locus.contig
+            and locus.position - intervals[-1][1].position <= max_gap
+        ):
+            intervals[-1][1] = locus
+        else:
+            intervals.append([locus, locus])
+    return [
+        hl.Interval(start, end, includes_start=True, includes_end=True)
+        for start, end in intervals
+    ]
 
 
 class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTableTask):
@@ -53,6 +87,22 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
         default=None,
         description='Path of hail vep config .json file',
     )
+    reference_point_lookup_ratio = luigi.FloatParameter(
+        default=0.001,
+        positional=False,
+        description='Look up new variants in reference tables by key when fewer than this fraction of their rows.',
+    )
+    max_point_lookup_variants = luigi.IntParameter(
+        default=100_000,
+        positional=False,
+        description='Scan the reference tables, regardless of their size, for more new variants than this.',
+    )
+    copy_on_write = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Rewrite only the partitions of the table touched by the callset.',
+    )
 
     def read_annotation_dependencies(self):
         annotation_dependencies = {}
@@ -66,6 +116,20 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
                 ),
             )
 
+        # The binned interval table is only used while it was built from the
+        # current interval reference table.
+        if 'interval_ht' in annotation_dependencies:
+            binned_interval_path = binned_interval_reference_dataset_collection_path(
+                self.reference_genome,
+                self.dataset_type,
+            )
+            if GCSorLocalFolderTarget(binned_interval_path).exists():
+                interval_bins_ht = hl.read_table(binned_interval_path)
+                if hl.eval(interval_bins_ht.globals) == hl.eval(
+                    annotation_dependencies['interval_ht'].globals,
+                ):
+                    annotation_dependencies['interval_bins_ht'] = interval_bins_ht
+
         if self.dataset_type.has_sample_lookup_table:
             annotation_dependencies['sample_lookup_ht'] = hl.read_table(
                 sample_lookup_table_path(
@@ -142,7 +206,94 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
             ),
         )
 
-    def update_table(self, ht: hl.Table) -> hl.Table:
+    def run(self) -> None:
+        if not self.update_touched_partitions():
+            super().run()
+        self.write_keys_table()
+        self.write_partition_intervals()
+
+    def update_touched_partitions(self) -> bool:
+        # Partitions are located by genomic position, so tables that are not
+        # keyed by locus are always rewritten in full.
+        if (
+            not self.copy_on_write
+            or 'locus'
+            not in self.dataset_type.table_key_type(self.reference_genome).fields
+        ):
+            return False
+        self.init_hail()
+        recover_staged_table(self.output().path)
+        if not self.output().exists():
+            return False
+        ht = hl.read_table(self.output().path)
+        # Reloading a project removes its samples from rows that may not be
+        # in the new callset, so every partition has to be recomputed.
+        loaded_project_guids = hl.eval(ht.updates.project_guid)
+        if loaded_project_guids & set(self.project_guids) or ht.count() == 0:
+            return False
+        callset_ht = self.read_callset_ht()
+        extents = partition_extents(self.output().path, callset_ht)
+        touched_partition_idxs = touched_partition_indices(extents, callset_ht)
+        if not touched_partition_idxs:
+            return False
+        print(
+            f'Rewriting {len(touched_partition_idxs)} of {len(extents)} partitions',
+        )
+        ht = hl.read_table(
+            self.output().path,
+            _intervals=[extents[i] for i in touched_partition_idxs],
+        )
+        if write_touched_partitions(
+            self.update_table(ht),
+            self.output().path,
+            extents,
+            touched_partition_idxs,
+        ):
+            return True
+        print('Unable to rewrite partitions in place, rewriting the full table')
+        return False
+
+    def read_keys_ht(self, ht: hl.Table) -> hl.Table:
+        # The keys table is a copy of the annotations table keys, so falls back
+        # to the annotations table itself if missing or not up to date with it.
+        path = variant_annotations_keys_table_path(
+            self.reference_genome,
+            self.dataset_type,
+        )
+        if GCSorLocalFolderTarget(path).exists():
+            keys_ht = hl.read_table(path)
+            if hl.eval(keys_ht.updates) == hl.eval(ht.updates):
+                return keys_ht
+        return ht.select().select_globals('updates')
+
+    def write_keys_table(self) -> None:
+        # Rows are never removed from the annotations table, so an up to date
+        # keys table only needs the keys of the callset added.
+        ht = hl.read_table(self.output().path)
+        keys_ht = self.read_keys_ht(
+            ht.annotate_globals(
+                updates=ht.updates.difference(
+                    {
+                        hl.Struct(callset=self.callset_path, project_guid=project_guid)
+                        for project_guid in self.project_guids
+                    },
+                ),
+            ),
+        )
+        keys_ht = keys_ht.union(self.read_callset_ht().select()).distinct()
+        write(
+            keys_ht.select_globals(updates=ht.index_globals().updates),
+            variant_annotations_keys_table_path(
+                self.reference_genome,
+                self.dataset_type,
+            ),
+        )
+
+    def read_callset_ht(self) -> hl.Table:
+        partition_intervals = read_partition_intervals(
+            self.reference_genome,
+            self.dataset_type,
+        )
         callset_hts = [
             hl.read_matrix_table(
                 remapped_and_subsetted_callset_path(
@@ -151,6 +302,7 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
                     self.callset_path,
                     project_guid,
                 ),
+                _intervals=partition_intervals,
             ).rows()
             for project_guid in self.project_guids
         ]
@@ -158,8 +310,90 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
             (lambda ht1, ht2: ht1.union(ht2, unify=True)),
             callset_hts,
         )
-        callset_ht = callset_ht.distinct()
+        return callset_ht.distinct()
 
+    def annotate_sample_lookup_table_fields(
+        self,
+        ht: hl.Table,
+        callset_ht: hl.Table,
+        annotation_dependencies: dict,
+    ) -> hl.Table:
+        # The sample lookup table only changes for variants in the callset,
+        # unless a project is being reloaded, in which case its samples may
+        # have been removed from any row.
+        fields = [
+            fn.__name__ for fn in self.dataset_type.sample_lookup_table_annotation_fns
+        ]
+        if set(hl.eval(ht.updates.project_guid)) & set(self.project_guids) or any(
+            field not in ht.row for field in fields
+        ):
+            return ht.annotate(
+                **get_fields(
+                    ht,
+                    self.dataset_type.sample_lookup_table_annotation_fns,
+                    **annotation_dependencies,
+                    **self.param_kwargs,
+                ),
+            )
+        callset_variants_ht = ht.semi_join(callset_ht)
+        callset_variants_ht = callset_variants_ht.select(
+            **get_fields(
+                callset_variants_ht,
+                self.dataset_type.sample_lookup_table_annotation_fns,
+                **annotation_dependencies,
+                **self.param_kwargs,
+            ),
+        )
+        callset_variant = callset_variants_ht[ht.key]
+        return ht.annotate(
+            **{
+                field: hl.if_else(
+                    hl.is_defined(callset_variant),
+                    callset_variant[field],
+                    ht[field],
+                )
+                for field in callset_variants_ht.row_value
+            },
+        )
+
+    def is_point_lookup(self, rdc_ht: hl.Table, new_variants_count: int) -> bool:
+        # Few new variants are cheaper to find through the reference table's
+        # on disk index than by reading it in full.
+        return (
+            'locus' in rdc_ht.key
+            and new_variants_count <= self.max_point_lookup_variants
+            and new_variants_count < self.reference_point_lookup_ratio * rdc_ht.count()
+        )
+
+    def join_reference_dataset_collection_ht(
+        self,
+        new_variants_ht: hl.Table,
+        new_variant_intervals: list[hl.Interval] | None,
+        new_variants_count: int,
+        rdc: ReferenceDatasetCollection,
+        rdc_ht: hl.Table,
+    ) -> hl.Table:
+        if new_variant_intervals is not None and self.is_point_lookup(
+            rdc_ht,
+            new_variants_count,
+        ):
+            print(
+                f'Looking up {new_variants_count} new variants in '
+                f'{len(new_variant_intervals)} ranges of {rdc.value}',
+            )
+            rdc_ht = hl.filter_intervals(
+                rdc_ht,
+                hl.literal(
+                    new_variant_intervals,
+                    hl.tarray(hl.tinterval(rdc_ht.locus.dtype)),
+                ),
+            )
+        else:
+            print(f'Scanning {rdc.value} for {new_variants_count} new variants')
+        return new_variants_ht.join(rdc_ht, 'left')
+
+    def update_table(self, ht: hl.Table) -> hl.Table:
+        callset_ht = self.read_callset_ht()
         annotation_dependencies = self.read_annotation_dependencies()
 
         # 1) Get new rows and annotate with vep
@@ -167,8 +401,16 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
         # proportional to the number of new variants.  Our default partitioning
         # will under-partition in that regard, so we split up our work
         # with a partitioning scheme local to this task.
-        new_variants_ht = callset_ht.anti_join(ht)
+        new_variants_ht = callset_ht.anti_join(self.read_keys_ht(ht))
+        new_variant_keys_ht = new_variants_ht.select()
         new_variants_count = new_variants_ht.count()
+        # Interval annotations are binned ahead of vep, which the join would
+        # otherwise have to recompute.
+        if 'interval_bins_ht' in annotation_dependencies:
+            new_variants_ht = annotate_interval_bins(
+                new_variants_ht,
+                annotation_dependencies['interval_bins_ht'],
+            )
         new_variants_ht = new_variants_ht.repartition(
             max(math.ceil(new_variants_count / VARIANTS_PER_VEP_PARTITION), 1),
         )
@@ -190,23 +432,44 @@ class UpdateVariantAnnotationsTableWithNewSamplesTask(BaseVariantAnnotationsTabl
         )
 
         # 3) Join against the reference dataset collections that are not "annotated".
-        for rdc in ReferenceDatasetCollection.for_dataset_type(self.dataset_type):
-            if rdc.requires_annotation:
-                continue
-            rdc_ht = annotation_dependencies[f'{rdc.value}_ht']
-            new_variants_ht = new_variants_ht.join(rdc_ht, 'left')
+        # The loci of the new variants are collected once, for all of the
+        # reference tables they are looked up in.
+        rdcs = [
+            rdc
+            for rdc in ReferenceDatasetCollection.for_dataset_type(self.dataset_type)
+            if not rdc.requires_annotation
+        ]
+        new_variant_intervals = None
+        if any(
+            self.is_point_lookup(
+                annotation_dependencies[f'{rdc.value}_ht'],
+                new_variants_count,
+            )
+            for rdc in rdcs
+        ):
+            new_variant_intervals = merge_loci(
+                new_variant_keys_ht.aggregate(
+                    hl.agg.collect_as_set(new_variant_keys_ht.locus),
+                ),
+                POINT_LOOKUP_MAX_GAP,
+            )
+        for rdc in rdcs:
+            new_variants_ht = self.join_reference_dataset_collection_ht(
+                new_variants_ht,
+                new_variant_intervals,
+                new_variants_count,
+                rdc,
+                annotation_dependencies[f'{rdc.value}_ht'],
+            )
 
         # 4) Union with the existing variant annotations table
         # and annotate with the sample lookup table.
         ht = ht.union(new_variants_ht, unify=True)
         if self.dataset_type.has_sample_lookup_table:
-            ht = ht.annotate(
-                **get_fields(
-                    ht,
-                    self.dataset_type.sample_lookup_table_annotation_fns,
-                    **annotation_dependencies,
-                    **self.param_kwargs,
-                ),
+            ht = self.annotate_sample_lookup_table_fields(
+                ht,
+                callset_ht,
+                annotation_dependencies,
             )
 
         # 5) Fix up the globals.
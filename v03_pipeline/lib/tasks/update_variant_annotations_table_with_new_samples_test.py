@@ -14,7 +14,9 @@ from v03_pipeline.lib.annotations.enums import (
     SV_TYPE_DETAILS,
     SV_TYPES,
 )
-from v03_pipeline.lib.misc.validation import validate_expected_contig_frequency
+from v03_pipeline.lib.annotations.fields import get_fields
+from v03_pipeline.lib.misc.interval_bins import bin_intervals
+from v03_pipeline.lib.misc.validation import validate_callset
 from v03_pipeline.lib.model import (
     CachedReferenceDatasetQuery,
     DatasetType,
@@ -23,8 +25,10 @@ from v03_pipeline.lib.model import (
     SampleType,
 )
 from v03_pipeline.lib.paths import (
+    binned_interval_reference_dataset_collection_path,
     valid_cached_reference_dataset_query_path,
     valid_reference_dataset_collection_path,
+    variant_annotations_keys_table_path,
 )
 from v03_pipeline.lib.reference_data.clinvar import (
     CLINVAR_ASSERTIONS,
@@ -33,6 +37,7 @@ from v03_pipeline.lib.reference_data.clinvar import (
 from v03_pipeline.lib.tasks.files import GCSorLocalFolderTarget
 from v03_pipeline.lib.tasks.update_variant_annotations_table_with_new_samples import (
     UpdateVariantAnnotationsTableWithNewSamplesTask,
+    merge_loci,
 )
 from v03_pipeline.lib.test.mocked_dataroot_testcase import MockedDatarootTestCase
 from v03_pipeline.var.test.vep.mock_vep_data import MOCK_VEP_DATA
@@ -117,6 +122,38 @@ class UpdateVariantAnnotationsTableWithNewSamplesTaskTest(MockedDatarootTestCase
             ),
         )
 
+    def test_merge_loci(self) -> None:
+        self.assertListEqual(
+            merge_loci(
+                {
+                    hl.Locus('chr2', 10, 'GRCh38'),
+                    hl.Locus('chr1', 250, 'GRCh38'),
+                    hl.Locus('chr1', 100, 'GRCh38'),
+                    hl.Locus('chr1', 150, 'GRCh38'),
+                    hl.Locus('chr1', 10, 'GRCh38'),
+                    hl.Locus('chr1', 351, 'GRCh38'),
+                },
+                100,
+            ),
+            [
+                hl.Interval(
+                    hl.Locus('chr1', 10, 'GRCh38'),
+                    hl.Locus('chr1', 250, 'GRCh38'),
+                    includes_end=True,
+                ),
+                hl.Interval(
+                    hl.Locus('chr1', 351, 'GRCh38'),
+                    hl.Locus('chr1', 351, 'GRCh38'),
+                    includes_end=True,
+                ),
+                hl.Interval(
+                    hl.Locus('chr2', 10, 'GRCh38'),
+                    hl.Locus('chr2', 10, 'GRCh38'),
+                    includes_end=True,
+                ),
+            ],
+        )
+
     def test_missing_pedigree(self) -> None:
         uvatwns_task = UpdateVariantAnnotationsTableWithNewSamplesTask(
             reference_genome=ReferenceGenome.GRCh38,
@@ -158,9 +195,110 @@ class UpdateVariantAnnotationsTableWithNewSamplesTaskTest(MockedDatarootTestCase
         worker.run()
         self.assertFalse(uvatwns_task.complete())
 
+    def test_annotate_sample_lookup_table_fields(self) -> None:
+        key_type = hl.tstruct(
+            locus=hl.tlocus('GRCh38'),
+            alleles=hl.tarray(hl.tstr),
+        )
+        keys = [
+            hl.Struct(
+                locus=hl.Locus('chr1', position, 'GRCh38'),
+                alleles=['A', 'C'],
+            )
+            for position in [1, 2, 3]
+        ]
+        samples_type = hl.tstruct(R0001=hl.tset(hl.tstr), R0002=hl.tset(hl.tstr))
+        sample_lookup_ht = hl.Table.parallelize(
+            [
+                {
+                    **key,
+                    'ref_samples': hl.Struct(R0001={'a'}, R0002=set()),
+                    'het_samples': hl.Struct(R0001={'b'}, R0002={'c'}),
+                    'hom_samples': hl.Struct(R0001=set(), R0002={'d'}),
+                }
+                for key in keys
+            ],
+            hl.tstruct(
+                **key_type,
+                ref_samples=samples_type,
+                het_samples=samples_type,
+                hom_samples=samples_type,
+            ),
+            key=['locus', 'alleles'],
+        )
+        # The existing gt_stats are stale, so that the rows that were
+        # recomputed can be told apart from those carried through.
+        ht = hl.Table.parallelize(
+            [{**key, 'gt_stats': hl.Struct(AC=0, AN=0, AF=0.0, hom=0)} for key in keys],
+            hl.tstruct(
+                **key_type,
+                gt_stats=hl.tstruct(
+                    AC=hl.tint32,
+                    AN=hl.tint32,
+                    AF=hl.tfloat32,
+                    hom=hl.tint32,
+                ),
+            ),
+            key=['locus', 'alleles'],
+            globals=hl.Struct(
+                updates={hl.Struct(callset='callset_1', project_guid='R0001')},
+            ),
+        )
+        callset_ht = hl.Table.parallelize(
+            keys[:2],
+            key_type,
+            key=['locus', 'alleles'],
+        )
+        annotation_dependencies = {'sample_lookup_ht': sample_lookup_ht}
+        for project_guid, recomputed_keys in [
+            ('R0002', keys[:2]),
+            # Reloading a project recomputes every row.
+            ('R0001', keys),
+        ]:
+            uvatwns_task = UpdateVariantAnnotationsTableWithNewSamplesTask(
+                reference_genome=ReferenceGenome.GRCh38,
+                dataset_type=DatasetType.SNV_INDEL,
+                sample_type=SampleType.WGS,
+                callset_path=TEST_SNV_INDEL_VCF,
+                project_guids=[project_guid],
+                project_remap_paths=[TEST_REMAP],
+                project_pedigree_paths=[TEST_PEDIGREE_3],
+            )
+            recomputed_ht = ht.annotate(
+                **get_fields(
+                    ht,
+                    DatasetType.SNV_INDEL.sample_lookup_table_annotation_fns,
+                    **annotation_dependencies,
+                    **uvatwns_task.param_kwargs,
+                ),
+            )
+            self.assertListEqual(
+                uvatwns_task.annotate_sample_lookup_table_fields(
+                    ht,
+                    callset_ht,
+                    annotation_dependencies,
+                ).collect(),
+                [
+                    (
+                        recomputed_row
+                        if row.select('locus', 'alleles') in recomputed_keys
+                        else row
+                    )
+                    for row, recomputed_row in zip(
+                        ht.collect(),
+                        recomputed_ht.collect(),
+                        strict=True,
+                    )
+                ],
+            )
+            self.assertEqual(
+                recomputed_ht.collect()[0].gt_stats,
+                hl.Struct(AC=4, AN=8, AF=0.5, hom=1),
+            )
+
     @patch(
-        'v03_pipeline.lib.tasks.write_imported_callset.validate_expected_contig_frequency',
-        partial(validate_expected_contig_frequency, min_rows_per_contig=25),
+        'v03_pipeline.lib.tasks.write_imported_callset.validate_callset',
+        partial(validate_callset, min_rows_per_contig=25),
     )
     @patch.object(ReferenceGenome, 'standard_contigs', new_callable=PropertyMock)
     @patch('v03_pipeline.lib.vep.hl.vep')
@@ -208,6 +346,20 @@ class UpdateVariantAnnotationsTableWithNewSamplesTaskTest(MockedDatarootTestCase
                 CachedReferenceDatasetQuery.GNOMAD_CODING_AND_NONCODING_VARIANTS,
             ),
         )
+        bin_intervals(
+            hl.read_table(
+                valid_reference_dataset_collection_path(
+                    ReferenceGenome.GRCh38,
+                    DatasetType.SNV_INDEL,
+                    ReferenceDatasetCollection.INTERVAL,
+                ),
+            ),
+        ).write(
+            binned_interval_reference_dataset_collection_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+            ),
+        )
         worker = luigi.worker.Worker()
         uvatwns_task_3 = UpdateVariantAnnotationsTableWithNewSamplesTask(
             reference_genome=ReferenceGenome.GRCh38,
@@ -219,6 +371,7 @@ class UpdateVariantAnnotationsTableWithNewSamplesTaskTest(MockedDatarootTestCase
             project_pedigree_paths=[TEST_PEDIGREE_3],
             validate=True,
             liftover_ref_path=TEST_LIFTOVER,
+            reference_point_lookup_ratio=1000.0,
         )
         worker.add(uvatwns_task_3)
         worker.run()
@@ -440,6 +593,14 @@ class UpdateVariantAnnotationsTableWithNewSamplesTaskTest(MockedDatarootTestCase
                 ),
             ],
         )
+        keys_ht = hl.read_table(
+            variant_annotations_keys_table_path(
+                ReferenceGenome.GRCh38,
+                DatasetType.SNV_INDEL,
+            ),
+        )
+        self.assertEqual(keys_ht.collect(), ht.select().collect())
+        self.assertEqual(hl.eval(keys_ht.updates), hl.eval(ht.updates))
 
     def test_mito_update_vat(self) -> None:
         worker = luigi.worker.Worker()
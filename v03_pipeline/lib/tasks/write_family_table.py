@@ -9,8 +9,8 @@ from v03_pipeline.lib.misc.sample_ids import subset_samples
 from v03_pipeline.lib.paths import family_table_path
 from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
 from v03_pipeline.lib.tasks.files import GCSorLocalTarget
-from v03_pipeline.lib.tasks.write_remapped_and_subsetted_callset import (
-    WriteRemappedAndSubsettedCallsetTask,
+from v03_pipeline.lib.tasks.write_project_family_tables import (
+    WriteProjectFamilyTablesTask,
 )
 
 
@@ -52,7 +52,9 @@ class WriteFamilyTableTask(BaseWriteTask):
         )
 
     def requires(self) -> luigi.Task:
-        return WriteRemappedAndSubsettedCallsetTask(
+        # NB: the tables of every family of the project are written together,
+        # reading the callset once however many of them are requested.
+        return WriteProjectFamilyTablesTask(
             self.reference_genome,
             self.dataset_type,
             self.sample_type,
@@ -63,10 +65,15 @@ class WriteFamilyTableTask(BaseWriteTask):
             self.ignore_missing_samples_when_subsetting,
             self.ignore_missing_samples_when_remapping,
             self.validate,
+            self.is_new_gcnv_joint_call,
         )
 
+    def run(self) -> None:
+        # The family table is written by the project task.
+        pass
+
     def create_table(self) -> hl.Table:
-        callset_mt = hl.read_matrix_table(self.input().path)
+        callset_mt = hl.read_matrix_table(self.requires().input().path)
         pedigree_ht = import_pedigree(self.project_pedigree_path)
         families = parse_pedigree_ht_to_families(pedigree_ht)
         family = next(
@@ -76,11 +83,7 @@ class WriteFamilyTableTask(BaseWriteTask):
         )
         callset_mt = subset_samples(
             callset_mt,
-            hl.Table.parallelize(
-                [{'s': sample_id} for sample_id in family.samples],
-                hl.tstruct(s=hl.dtype('str')),
-                key='s',
-            ),
+            set(family.samples),
             False,
         )
         ht = callset_mt.select_rows(
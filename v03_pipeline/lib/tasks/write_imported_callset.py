@@ -1,22 +1,35 @@
+import functools
+
 import hail as hl
 import luigi
 
 from v03_pipeline.lib.misc.io import (
+    callset_fingerprint,
     import_callset,
     select_relevant_fields,
     split_multi_hts,
+    vcf_shard_n_partitions,
+    write,
 )
+from v03_pipeline.lib.misc.sample_shards import shard_samples
 from v03_pipeline.lib.misc.validation import (
-    validate_expected_contig_frequency,
-    validate_sample_type,
+    sampled_partition_indices,
+    validate_callset,
+    validate_sampled_callset,
 )
 from v03_pipeline.lib.model import CachedReferenceDatasetQuery
 from v03_pipeline.lib.paths import (
     imported_callset_path,
+    imported_callset_sample_shards_path,
     valid_cached_reference_dataset_query_path,
 )
 from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
-from v03_pipeline.lib.tasks.files import CallsetTask, GCSorLocalTarget, HailTableTask
+from v03_pipeline.lib.tasks.files import (
+    CallsetTask,
+    GCSorLocalFolderTarget,
+    GCSorLocalTarget,
+    HailTableTask,
+)
 
 
 class WriteImportedCallsetTask(BaseWriteTask):
@@ -29,16 +42,44 @@ class WriteImportedCallsetTask(BaseWriteTask):
         default=True,
         parsing=luigi.BoolParameter.EXPLICIT_PARSING,
     )
+    # NB: non-positional so that downstream tasks constructing this task
+    # positionally are unaffected, set it through the luigi config.
+    samples_per_shard = luigi.OptionalIntParameter(
+        default=None,
+        positional=False,
+        description='Also write the callset entries in shards of this many samples.',
+    )
+
+    @functools.cached_property
+    def callset_fingerprint(self) -> str:
+        # NB: the imported callset is cached by content, so that a callset
+        # delivered again under a new path is not imported again.
+        return callset_fingerprint(self.callset_path)
 
     def output(self) -> luigi.Target:
         return GCSorLocalTarget(
             imported_callset_path(
                 self.reference_genome,
                 self.dataset_type,
-                self.callset_path,
+                self.callset_fingerprint,
+            ),
+        )
+
+    def sample_shards_output(self) -> luigi.Target:
+        return GCSorLocalTarget(
+            imported_callset_sample_shards_path(
+                self.reference_genome,
+                self.dataset_type,
+                self.callset_fingerprint,
             ),
         )
 
+    def complete(self) -> bool:
+        return super().complete() and (
+            not self.samples_per_shard
+            or GCSorLocalFolderTarget(self.sample_shards_output().path).exists()
+        )
+
     def requires(self) -> list[luigi.Task]:
         requirements = []
         if self.filters_path:
@@ -62,14 +103,7 @@ class WriteImportedCallsetTask(BaseWriteTask):
             CallsetTask(self.callset_path),
         ]
 
-    def create_table(self) -> hl.MatrixTable:
-        mt = import_callset(
-            self.callset_path,
-            self.reference_genome,
-            self.dataset_type,
-            self.filters_path,
-        )
-        mt = select_relevant_fields(mt, self.dataset_type)
+    def split_and_filter_callset(self, mt: hl.MatrixTable) -> hl.MatrixTable:
         if self.dataset_type.has_multi_allelic_variants:
             mt = split_multi_hts(mt)
         if self.dataset_type.can_run_validation:
@@ -80,19 +114,65 @@ class WriteImportedCallsetTask(BaseWriteTask):
                     mt.locus.contig,
                 ),
             )
-        if self.validate and self.dataset_type.can_run_validation:
-            validate_expected_contig_frequency(mt, self.reference_genome)
-            coding_and_noncoding_ht = hl.read_table(
-                valid_cached_reference_dataset_query_path(
-                    self.reference_genome,
-                    self.dataset_type,
-                    CachedReferenceDatasetQuery.GNOMAD_CODING_AND_NONCODING_VARIANTS,
+        return mt
+
+    def create_table(self) -> hl.MatrixTable:
+        mt = import_callset(
+            self.callset_path,
+            self.reference_genome,
+            self.dataset_type,
+            self.filters_path,
+        )
+        mt = select_relevant_fields(mt, self.dataset_type)
+        if not (self.validate and self.dataset_type.can_run_validation):
+            return self.split_and_filter_callset(mt)
+        coding_and_noncoding_ht = hl.read_table(
+            valid_cached_reference_dataset_query_path(
+                self.reference_genome,
+                self.dataset_type,
+                CachedReferenceDatasetQuery.GNOMAD_CODING_AND_NONCODING_VARIANTS,
+            ),
+        )
+        # Fails fast on a sample of the callset before the full callset is
+        # read, the partitions are sampled before the multiallelic split as
+        # it renumbers them.  The whole callset is a single shard when its
+        # files are not partitioned alike when imported on their own.
+        n_partitions = mt.n_partitions()
+        shard_n_partitions = (
+            vcf_shard_n_partitions(self.callset_path, self.reference_genome)
+            if 'vcf' in self.callset_path
+            else []
+        )
+        if sum(shard_n_partitions) != n_partitions:
+            shard_n_partitions = [n_partitions]
+        sampled_partition_idxs = sampled_partition_indices(shard_n_partitions)
+        if sampled_partition_idxs:
+            validate_sampled_callset(
+                self.split_and_filter_callset(
+                    mt._filter_partitions(sampled_partition_idxs),  # noqa: SLF001
                 ),
-            )
-            validate_sample_type(
-                mt,
+                len(sampled_partition_idxs) / n_partitions,
                 coding_and_noncoding_ht,
                 self.reference_genome,
                 self.sample_type,
             )
+        mt = self.split_and_filter_callset(mt)
+        validate_callset(
+            mt,
+            coding_and_noncoding_ht,
+            self.reference_genome,
+            self.sample_type,
+        )
         return mt
+
+    def run(self) -> None:
+        if not GCSorLocalFolderTarget(self.output().path).exists():
+            super().run()
+        if self.samples_per_shard:
+            write(
+                shard_samples(
+                    hl.read_matrix_table(self.output().path),
+                    self.samples_per_shard,
+                ),
+                self.sample_shards_output().path,
+            )
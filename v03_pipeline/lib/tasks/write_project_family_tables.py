@@ -0,0 +1,189 @@
+import functools
+import os
+import uuid
+
+import hail as hl
+import luigi
+
+from v03_pipeline.lib.annotations.fields import get_fields
+from v03_pipeline.lib.misc.io import import_pedigree, write_single_pass
+from v03_pipeline.lib.misc.pedigree import parse_pedigree_ht_to_families
+from v03_pipeline.lib.misc.sample_entries import globalize_sample_ids
+from v03_pipeline.lib.model import Env
+from v03_pipeline.lib.paths import family_table_path
+from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
+from v03_pipeline.lib.tasks.files import GCSorLocalFolderTarget, GCSorLocalTarget
+from v03_pipeline.lib.tasks.write_remapped_and_subsetted_callset import (
+    WriteRemappedAndSubsettedCallsetTask,
+)
+
+
+class WriteProjectFamilyTablesTask(BaseWriteTask):
+    # Writes the family table of every family of the project, reading the
+    # callset once rather than once per family.
+    callset_path = luigi.Parameter()
+    project_guid = luigi.Parameter()
+    project_remap_path = luigi.Parameter()
+    project_pedigree_path = luigi.Parameter()
+    ignore_missing_samples_when_subsetting = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+    )
+    ignore_missing_samples_when_remapping = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+    )
+    validate = luigi.BoolParameter(
+        default=True,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+    )
+    is_new_gcnv_joint_call = luigi.BoolParameter(
+        default=False,
+        description='Is this a fully joint-called callset.',
+    )
+    _loaded_family_guids = None
+
+    @functools.cached_property
+    def pedigree_family_guids(self) -> list[str]:
+        return sorted(
+            family.family_guid
+            for family in parse_pedigree_ht_to_families(
+                import_pedigree(self.project_pedigree_path),
+            )
+        )
+
+    @property
+    def family_guids(self) -> list[str]:
+        # The families loaded into the remapped callset, those that failed its
+        # checks are not written.  Until it is written, every family of the
+        # pedigree is expected.
+        if self._loaded_family_guids is None:
+            if not self.requires().complete():
+                return self.pedigree_family_guids
+            self._loaded_family_guids = sorted(
+                hl.eval(hl.read_matrix_table(self.input().path).families).keys(),
+            )
+        return self._loaded_family_guids
+
+    def output(self) -> list[luigi.Target]:
+        return [
+            GCSorLocalTarget(
+                family_table_path(
+                    self.reference_genome,
+                    self.dataset_type,
+                    family_guid,
+                ),
+            )
+            for family_guid in self.family_guids
+        ]
+
+    def complete(self) -> bool:
+        return self.requires().complete() and all(
+            GCSorLocalFolderTarget(output.path).exists()
+            and hl.eval(
+                hl.read_table(output.path).updates.contains(self.callset_path),
+            )
+            for output in self.output()
+        )
+
+    def requires(self) -> luigi.Task:
+        return WriteRemappedAndSubsettedCallsetTask(
+            self.reference_genome,
+            self.dataset_type,
+            self.sample_type,
+            self.callset_path,
+            self.project_guid,
+            self.project_remap_path,
+            self.project_pedigree_path,
+            self.ignore_missing_samples_when_subsetting,
+            self.ignore_missing_samples_when_remapping,
+            self.validate,
+        )
+
+    def create_table(self) -> hl.Table:
+        # Collects the entries of every family in a single pass over the
+        # callset, with a row per family and variant keyed by family guid
+        # first, so that each family's rows may be read on their own.
+        callset_mt = hl.read_matrix_table(self.input().path)
+        callset_mt = callset_mt.annotate_cols(
+            family_guid=hl.literal(
+                {
+                    sample_id: family_guid
+                    for family_guid, sample_ids in hl.eval(
+                        callset_mt.families,
+                    ).items()
+                    for sample_id in sample_ids
+                },
+            ).get(callset_mt.s),
+        )
+        ht = callset_mt.select_rows(
+            filters=callset_mt.filters.difference(self.dataset_type.excluded_filters),
+            family_entries=hl.agg.group_by(
+                callset_mt.family_guid,
+                hl.sorted(
+                    hl.agg.collect(
+                        hl.struct(
+                            s=callset_mt.s,
+                            **get_fields(
+                                callset_mt,
+                                self.dataset_type.genotype_entry_annotation_fns,
+                                **self.param_kwargs,
+                            ),
+                        ),
+                    ),
+                    key=lambda e: e.s,
+                ),
+            ),
+        ).rows()
+        ht = ht.annotate(
+            family_entries=hl.array(ht.family_entries)
+            .map(
+                lambda item: hl.struct(family_guid=item[0], entries=item[1]),
+            )
+            .filter(
+                lambda family: family.entries.any(
+                    self.dataset_type.sample_entries_filter_fn,
+                ),
+            ),
+        )
+        ht = ht.explode('family_entries')
+        ht = ht.transmute(**ht.family_entries)
+        return ht.key_by('family_guid', *ht.key.dtype.fields)
+
+    def run(self) -> None:
+        self.init_hail()
+        checkpoint_path = os.path.join(Env.HAIL_TMPDIR, f'{uuid.uuid4()}.ht')
+        self.create_table().write(checkpoint_path)
+        skipped_family_guids = set(self.pedigree_family_guids) - set(
+            self.family_guids,
+        )
+        if skipped_family_guids:
+            print(
+                f'Skipping {len(skipped_family_guids)} families that failed the '
+                f'callset checks: {sorted(skipped_family_guids)}',
+            )
+        key = self.dataset_type.table_key_type(self.reference_genome).fields
+        for family_guid, output in zip(self.family_guids, self.output(), strict=True):
+            family_ht = hl.read_table(
+                checkpoint_path,
+                _intervals=[
+                    hl.Interval(
+                        hl.Struct(family_guid=family_guid),
+                        hl.Struct(family_guid=family_guid),
+                        includes_end=True,
+                        point_type=hl.tstruct(family_guid=hl.tstr),
+                    ),
+                ],
+            )
+            # NB: the rows of a family are sorted by the rest of the key.
+            family_ht = family_ht._key_by_assert_sorted(*key)  # noqa: SLF001
+            family_ht = family_ht.select('filters', 'entries')
+            family_ht = globalize_sample_ids(family_ht)
+            family_ht = family_ht.select_globals(
+                sample_ids=family_ht.sample_ids,
+                sample_type=self.sample_type.value,
+                updates={self.callset_path},
+            )
+            # The family's partitions of the checkpoint are already sized to
+            # its rows, so each family table is written once as read.
+            write_single_pass(family_ht, output.path, keep_partitioning=True)
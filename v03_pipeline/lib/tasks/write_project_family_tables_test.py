@@ -0,0 +1,110 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import hail as hl
+import luigi.worker
+
+from v03_pipeline.lib.model import DatasetType, ReferenceGenome, SampleType
+from v03_pipeline.lib.paths import family_table_path
+from v03_pipeline.lib.tasks.write_family_table import WriteFamilyTableTask
+from v03_pipeline.lib.tasks.write_project_family_tables import (
+    WriteProjectFamilyTablesTask,
+)
+from v03_pipeline.lib.test.mocked_dataroot_testcase import MockedDatarootTestCase
+
+TEST_SNV_INDEL_VCF = 'v03_pipeline/var/test/callsets/1kg_30variants.vcf'
+TEST_REMAP = 'v03_pipeline/var/test/remaps/test_remap_1.tsv'
+TEST_PEDIGREE_4 = 'v03_pipeline/var/test/pedigrees/test_pedigree_4.tsv'
+
+
+class WriteProjectFamilyTablesTaskTest(MockedDatarootTestCase):
+    def test_snv_write_project_family_tables_task(self) -> None:
+        worker = luigi.worker.Worker()
+        wpft_task = WriteProjectFamilyTablesTask(
+            reference_genome=ReferenceGenome.GRCh38,
+            dataset_type=DatasetType.SNV_INDEL,
+            sample_type=SampleType.WGS,
+            callset_path=TEST_SNV_INDEL_VCF,
+            project_guid='R0114_project4',
+            project_remap_path=TEST_REMAP,
+            project_pedigree_path=TEST_PEDIGREE_4,
+            validate=False,
+        )
+        worker.add(wpft_task)
+        worker.run()
+        self.assertTrue(wpft_task.complete())
+        self.assertEqual(len(wpft_task.output()), 13)
+        hts = {
+            family_guid: hl.read_table(output.path)
+            for family_guid, output in zip(
+                wpft_task.family_guids,
+                wpft_task.output(),
+                strict=True,
+            )
+        }
+
+        # The family tables match those written one family at a time.
+        for family_guid in ['123_1', 'efg_1']:
+            wft_task = WriteFamilyTableTask(
+                reference_genome=ReferenceGenome.GRCh38,
+                dataset_type=DatasetType.SNV_INDEL,
+                sample_type=SampleType.WGS,
+                callset_path=TEST_SNV_INDEL_VCF,
+                project_guid='R0114_project4',
+                project_remap_path=TEST_REMAP,
+                project_pedigree_path=TEST_PEDIGREE_4,
+                family_guid=family_guid,
+                validate=False,
+            )
+            ht = wft_task.create_table()
+            self.assertEqual(
+                hts[family_guid].globals.collect(),
+                ht.globals.collect(),
+            )
+            self.assertEqual(hts[family_guid].collect(), ht.collect())
+        self.assertEqual(
+            hts['123_1'].globals.collect(),
+            [
+                hl.Struct(
+                    sample_ids=['NA19675_1'],
+                    sample_type=SampleType.WGS.value,
+                    updates={TEST_SNV_INDEL_VCF},
+                ),
+            ],
+        )
+
+    @patch('v03_pipeline.lib.tasks.write_remapped_and_subsetted_callset.Env')
+    def test_write_project_family_tables_task_failed_sex_check_family(
+        self,
+        mock_env: unittest.mock.Mock,
+    ) -> None:
+        mock_env.CHECK_SEX_AND_RELATEDNESS = True
+        worker = luigi.worker.Worker()
+        wpft_task = WriteProjectFamilyTablesTask(
+            reference_genome=ReferenceGenome.GRCh38,
+            dataset_type=DatasetType.SNV_INDEL,
+            sample_type=SampleType.WGS,
+            callset_path=TEST_SNV_INDEL_VCF,
+            project_guid='R0114_project4',
+            project_remap_path=TEST_REMAP,
+            project_pedigree_path=TEST_PEDIGREE_4,
+            validate=False,
+        )
+        worker.add(wpft_task)
+        worker.run()
+        self.assertTrue(wpft_task.complete())
+        # NB: the family that failed the sex check is not written.
+        self.assertEqual(len(wpft_task.output()), 12)
+        mt = hl.read_matrix_table(wpft_task.input().path)
+        (failed_family_guid,) = hl.eval(mt.family_guids_failed_sex_check)
+        self.assertNotIn(failed_family_guid, wpft_task.family_guids)
+        self.assertFalse(
+            os.path.exists(
+                family_table_path(
+                    ReferenceGenome.GRCh38,
+                    DatasetType.SNV_INDEL,
+                    failed_family_guid,
+                ),
+            ),
+        )
@@ -0,0 +1,63 @@
+import hail as hl
+import luigi
+
+from v03_pipeline.lib.methods.qc_genotypes import extract_qc_genotypes
+from v03_pipeline.lib.methods.sex_check import x_contig_intervals
+from v03_pipeline.lib.model import CachedReferenceDatasetQuery, Env
+from v03_pipeline.lib.paths import (
+    qc_genotypes_path,
+    valid_cached_reference_dataset_query_path,
+)
+from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
+from v03_pipeline.lib.tasks.files import GCSorLocalTarget, HailTableTask
+from v03_pipeline.lib.tasks.write_imported_callset import WriteImportedCallsetTask
+
+
+class WriteQCGenotypesTask(BaseWriteTask):
+    callset_path = luigi.Parameter()
+
+    def output(self) -> luigi.Target:
+        return GCSorLocalTarget(
+            qc_genotypes_path(
+                self.reference_genome,
+                self.dataset_type,
+                self.callset_path,
+            ),
+        )
+
+    def requires(self) -> luigi.Task:
+        requirements = [
+            WriteImportedCallsetTask(
+                self.reference_genome,
+                self.dataset_type,
+                self.sample_type,
+                self.callset_path,
+            ),
+        ]
+        if Env.ACCESS_PRIVATE_DATASETS:
+            requirements = [
+                *requirements,
+                HailTableTask(
+                    valid_cached_reference_dataset_query_path(
+                        self.reference_genome,
+                        self.dataset_type,
+                        CachedReferenceDatasetQuery.GNOMAD_QC,
+                    ),
+                ),
+            ]
+        return requirements
+
+    def create_table(self) -> hl.MatrixTable:
+        callset_mt = hl.read_matrix_table(self.input()[0].path)
+        return extract_qc_genotypes(
+            callset_mt,
+            (
+                hl.read_table(self.input()[1].path)
+                if Env.ACCESS_PRIVATE_DATASETS
+                else None
+            ),
+            hl.read_matrix_table(
+                self.input()[0].path,
+                _intervals=x_contig_intervals(self.reference_genome.hl_reference),
+            ),
+        )
@@ -1,21 +1,36 @@
 import hail as hl
 import luigi
 
-from v03_pipeline.lib.methods.relatedness import call_relatedness
-from v03_pipeline.lib.model import CachedReferenceDatasetQuery, Env
+from v03_pipeline.lib.methods.relatedness import call_relatedness_on_qc_sites
+from v03_pipeline.lib.misc.io import does_file_exist, import_pedigree, import_remap
+from v03_pipeline.lib.misc.pedigree import Family, parse_pedigree_ht_to_families
 from v03_pipeline.lib.paths import (
+    project_relatedness_check_table_path,
     relatedness_check_table_path,
-    valid_cached_reference_dataset_query_path,
 )
 from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
-from v03_pipeline.lib.tasks.files import GCSorLocalTarget, HailTableTask
-from v03_pipeline.lib.tasks.write_imported_callset import WriteImportedCallsetTask
+from v03_pipeline.lib.tasks.files import GCSorLocalTarget, RawFileTask
+from v03_pipeline.lib.tasks.write_qc_genotypes import WriteQCGenotypesTask
 
 
 class WriteRelatednessCheckTableTask(BaseWriteTask):
     callset_path = luigi.Parameter()
+    # NB: when a project is passed, only the pairs within its families are
+    # compared, and the table is written per project.
+    project_guid = luigi.OptionalParameter(default=None, positional=False)
+    project_remap_path = luigi.OptionalParameter(default=None, positional=False)
+    project_pedigree_path = luigi.OptionalParameter(default=None, positional=False)
 
     def output(self) -> luigi.Target:
+        if self.project_guid:
+            return GCSorLocalTarget(
+                project_relatedness_check_table_path(
+                    self.reference_genome,
+                    self.dataset_type,
+                    self.callset_path,
+                    self.project_guid,
+                ),
+            )
         return GCSorLocalTarget(
             relatedness_check_table_path(
                 self.reference_genome,
@@ -26,29 +41,40 @@ class WriteRelatednessCheckTableTask(BaseWriteTask):
 
     def requires(self) -> luigi.Task:
         requirements = [
-            WriteImportedCallsetTask(
+            WriteQCGenotypesTask(
                 self.reference_genome,
                 self.dataset_type,
                 self.sample_type,
                 self.callset_path,
             ),
         ]
-        if Env.ACCESS_PRIVATE_DATASETS:
+        if self.project_guid:
             requirements = [
                 *requirements,
-                HailTableTask(
-                    valid_cached_reference_dataset_query_path(
-                        self.reference_genome,
-                        self.dataset_type,
-                        CachedReferenceDatasetQuery.GNOMAD_QC,
-                    ),
-                ),
+                RawFileTask(self.project_pedigree_path),
             ]
         return requirements
 
+    def read_callset_families(self) -> set[Family]:
+        # The pedigree holds remapped sample ids, the relatedness check table
+        # holds the sample ids of the callset.
+        pedigree_ht = import_pedigree(self.project_pedigree_path)
+        if does_file_exist(self.project_remap_path):
+            project_remap_ht = import_remap(self.project_remap_path)
+            callset_ids = hl.dict(
+                {r.seqr_id: r.s for r in project_remap_ht.collect()},
+            )
+            pedigree_ht = pedigree_ht.annotate(
+                **{
+                    field: callset_ids.get(pedigree_ht[field], pedigree_ht[field])
+                    for field in ['s', 'maternal_s', 'paternal_s']
+                },
+            )
+        return parse_pedigree_ht_to_families(pedigree_ht)
+
     def create_table(self) -> hl.Table:
-        callset_mt = hl.read_matrix_table(self.input()[0].path)
-        return call_relatedness(
-            callset_mt,
-            hl.read_table(self.input()[1].path) if len(self.input()) > 1 else None,
+        qc_mt = hl.read_matrix_table(self.input()[0].path)
+        return call_relatedness_on_qc_sites(
+            qc_mt.filter_rows(qc_mt.relatedness_site),
+            self.read_callset_families() if self.project_guid else None,
         )
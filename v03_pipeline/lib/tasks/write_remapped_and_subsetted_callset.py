@@ -9,10 +9,15 @@ from v03_pipeline.lib.misc.family_loading_failures import (
 from v03_pipeline.lib.misc.io import does_file_exist, import_pedigree, import_remap
 from v03_pipeline.lib.misc.pedigree import parse_pedigree_ht_to_families
 from v03_pipeline.lib.misc.sample_ids import remap_sample_ids, subset_samples
+from v03_pipeline.lib.misc.sample_shards import read_sample_shards
 from v03_pipeline.lib.model import Env
 from v03_pipeline.lib.paths import remapped_and_subsetted_callset_path
 from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
-from v03_pipeline.lib.tasks.files import GCSorLocalTarget, RawFileTask
+from v03_pipeline.lib.tasks.files import (
+    GCSorLocalFolderTarget,
+    GCSorLocalTarget,
+    RawFileTask,
+)
 from v03_pipeline.lib.tasks.write_imported_callset import WriteImportedCallsetTask
 from v03_pipeline.lib.tasks.write_relatedness_check_table import (
     WriteRelatednessCheckTableTask,
@@ -37,6 +42,14 @@ class WriteRemappedAndSubsettedCallsetTask(BaseWriteTask):
         default=True,
         parsing=luigi.BoolParameter.EXPLICIT_PARSING,
     )
+    # NB: non-positional so that downstream tasks constructing this task
+    # positionally are unaffected, set it through the luigi config.
+    pedigree_relatedness_check = luigi.BoolParameter(
+        default=False,
+        parsing=luigi.BoolParameter.EXPLICIT_PARSING,
+        positional=False,
+        description='Compare only the pairs of samples within the families of the project.',
+    )
 
     def output(self) -> luigi.Target:
         return GCSorLocalTarget(
@@ -74,6 +87,15 @@ class WriteRemappedAndSubsettedCallsetTask(BaseWriteTask):
                     self.dataset_type,
                     self.sample_type,
                     self.callset_path,
+                    **(
+                        {
+                            'project_guid': self.project_guid,
+                            'project_remap_path': self.project_remap_path,
+                            'project_pedigree_path': self.project_pedigree_path,
+                        }
+                        if self.pedigree_relatedness_check
+                        else {}
+                    ),
                 ),
                 WriteSexCheckTableTask(
                     self.reference_genome,
@@ -84,27 +106,45 @@ class WriteRemappedAndSubsettedCallsetTask(BaseWriteTask):
             ]
         return requirements
 
+    def read_callset_mt(self, pedigree_ht: hl.Table) -> hl.MatrixTable:
+        # With a sample sharded layout, only the shards of the project's
+        # samples, by callset or by remapped id, are read.
+        sample_shards_target = self.requires()[0].sample_shards_output()
+        if not GCSorLocalFolderTarget(sample_shards_target.path).exists():
+            return hl.read_matrix_table(self.input()[0].path)
+        sample_ids = set(pedigree_ht.s.collect())
+        if does_file_exist(self.project_remap_path):
+            sample_ids |= set(import_remap(self.project_remap_path).s.collect())
+        return read_sample_shards(sample_shards_target.path, sample_ids)
+
     def create_table(self) -> hl.MatrixTable:
-        callset_mt = hl.read_matrix_table(self.input()[0].path)
         pedigree_ht = import_pedigree(self.input()[1].path)
+        callset_mt = self.read_callset_mt(pedigree_ht)
+        # The sample ids are localized once, the remapping, missing sample
+        # and subsetting checks all run against them.
+        callset_sample_ids = callset_mt.s.collect()
 
         # Remap, but only if the remap file is present!
         remap_lookup = hl.empty_dict(hl.tstr, hl.tstr)
         if does_file_exist(self.project_remap_path):
             project_remap_ht = import_remap(self.project_remap_path)
+            collected_remap = project_remap_ht.collect()
             callset_mt = remap_sample_ids(
                 callset_mt,
                 project_remap_ht,
                 self.ignore_missing_samples_when_remapping,
+                callset_sample_ids,
+                collected_remap,
             )
-            remap_lookup = hl.dict(
-                {r.s: r.seqr_id for r in project_remap_ht.collect()},
-            )
+            remap = {r.s: r.seqr_id for r in collected_remap}
+            remap_lookup = hl.dict(remap)
+            callset_sample_ids = [remap.get(s, s) for s in callset_sample_ids]
 
         families = parse_pedigree_ht_to_families(pedigree_ht)
         families_failed_missing_samples = get_families_failed_missing_samples(
             callset_mt,
             families,
+            callset_sample_ids,
         )
         families_failed_relatedness_check = set()
         families_failed_sex_check = set()
@@ -137,16 +177,9 @@ class WriteRemappedAndSubsettedCallsetTask(BaseWriteTask):
 
         mt = subset_samples(
             callset_mt,
-            hl.Table.parallelize(
-                [
-                    {'s': sample_id}
-                    for family in loadable_families
-                    for sample_id in family.samples
-                ],
-                hl.tstruct(s=hl.dtype('str')),
-                key='s',
-            ),
+            {sample_id for family in loadable_families for sample_id in family.samples},
             self.ignore_missing_samples_when_subsetting,
+            callset_sample_ids,
         )
         return mt.select_globals(
             family_guids_failed_missing_samples=(
@@ -1,11 +1,11 @@
 import hail as hl
 import luigi
 
-from v03_pipeline.lib.methods.sex_check import call_sex
+from v03_pipeline.lib.methods.sex_check import call_sex, filter_to_x_contigs
 from v03_pipeline.lib.paths import sex_check_table_path
 from v03_pipeline.lib.tasks.base.base_write_task import BaseWriteTask
 from v03_pipeline.lib.tasks.files import GCSorLocalTarget
-from v03_pipeline.lib.tasks.write_imported_callset import WriteImportedCallsetTask
+from v03_pipeline.lib.tasks.write_qc_genotypes import WriteQCGenotypesTask
 
 
 class WriteSexCheckTableTask(BaseWriteTask):
@@ -22,7 +22,7 @@ class WriteSexCheckTableTask(BaseWriteTask):
 
     def requires(self) -> luigi.Task:
         return [
-            WriteImportedCallsetTask(
+            WriteQCGenotypesTask(
                 self.reference_genome,
                 self.dataset_type,
                 self.sample_type,
@@ -31,5 +31,5 @@ class WriteSexCheckTableTask(BaseWriteTask):
         ]
 
     def create_table(self) -> hl.Table:
-        callset_mt = hl.read_matrix_table(self.input()[0].path)
-        return call_sex(callset_mt)
+        qc_mt = filter_to_x_contigs(hl.read_matrix_table(self.input()[0].path))
+        return call_sex(qc_mt.filter_rows(qc_mt.sex_check_site))